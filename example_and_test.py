@@ -5,6 +5,7 @@ import pstats
 
 from metrics.portfolio import Portfolio
 from optimizer import Optimizer
+from warmup import WarmUp
 
 POSITIONS = dict(BANEP=200,
                  MFON=55,
@@ -31,11 +32,18 @@ CASH = 308_463
 DATE = '2018-04-20'
 
 
-def trading():
-    """Распечатка всей аналитики, необходимой для управления портфелем"""
+def trading(warm_up: bool = False):
+    """Распечатка всей аналитики, необходимой для управления портфелем
+
+    Если warm_up, то данные и ML-модели портфеля загружаются в фоновом потоке, а оптимизатор запускается после
+    окончания прогрева
+    """
+    background = WarmUp(POSITIONS, DATE).start() if warm_up else None
     port = Portfolio(date=DATE,
                      cash=CASH,
                      positions=POSITIONS)
+    if background is not None:
+        background.wait()
     optimizer = Optimizer(port)
     print(optimizer.portfolio)
     print(optimizer.dividends_metrics)
@@ -9,6 +9,7 @@ from local.dividends import dohod_ru
 from local.dividends import smart_lab_ru
 from local.dividends.sqlite import DividendsDataManager
 from local.dividends.sqlite import STATISTICS_START
+from local.dividends.sqlite import tickers_dividends
 from web.labels import DIVIDENDS
 from web.labels import TICKER
 
@@ -33,11 +34,11 @@ def smart_lab_status(tickers: tuple):
     """
     df = smart_lab_ru.dividends_smart_lab()
     result = ([], [])
-    for i in range(len(df)):
-        date = df.index[i]
-        ticker = df.iloc[i][TICKER]
-        value = df.iloc[i][DIVIDENDS]
-        local_data = DividendsDataManager(ticker).value
+    if df.empty:
+        return result
+    local_dividends = tickers_dividends(tuple(df[TICKER].unique()))
+    for date, ticker, value in zip(df.index, df[TICKER], df[DIVIDENDS]):
+        local_data = local_dividends[ticker].dropna()
         if (date not in local_data.index) or (local_data[date] != value):
             if ticker in tickers:
                 result[0].append(ticker)
@@ -1,12 +1,13 @@
 """Реализация менеджера данных для дивидендов и вспомогательные функции"""
-import functools
 import sqlite3
 
 import pandas as pd
 from pandas.io.sql import DatabaseError
 
 from settings import DATA_PATH
+from utils import derived
 from utils.aggregation import monthly_aggregation_func
+from utils.batch_manager import BatchDataManager
 from utils.data_manager import AbstractDataManager
 from web.labels import DATE
 from web.labels import TICKER
@@ -21,6 +22,9 @@ class DividendsDataManager(AbstractDataManager):
 
     Данные загружаются из локальной базы данных и сохраняются в общем формате DataManager
     """
+    # Данные загружаются из локальной базы, поэтому обновляются и в автономном режиме
+    is_remote = False
+
     def __init__(self, ticker: str):
         super().__init__(DIVIDENDS_CATEGORY, ticker)
 
@@ -48,15 +52,27 @@ class DividendsDataManager(AbstractDataManager):
         super().download_update()
 
 
-@functools.lru_cache(maxsize=1)
+def _tickers_dividends_inputs(tickers: tuple):
+    """Входы сводной информации по дивидендам - пакетный менеджер дивидендов тикеров"""
+    return [BatchDataManager(DividendsDataManager, tickers)]
+
+
+@derived.dataset(_tickers_dividends_inputs)
 def tickers_dividends(tickers: tuple):
-    """Сводная информация по дивидендам для заданных тикеров"""
-    frames = (DividendsDataManager(ticker).value for ticker in tickers)
-    df = pd.concat(frames, axis='columns')
-    df.columns.name = TICKER
-    return df
+    """Сводная информация по дивидендам для заданных тикеров
+
+    Результат пересчитывается только после изменения дивидендов одного из тикеров
+    """
+    df = BatchDataManager(DividendsDataManager, tickers).frame()
+    return df.rename_axis(columns=TICKER)
+
+
+def _monthly_dividends_inputs(tickers: tuple, last_date: pd.Timestamp):
+    """Входы месячных дивидендов - сводная информация по дивидендам тикеров"""
+    return [(tickers_dividends, (tickers,))]
 
 
+@derived.dataset(_monthly_dividends_inputs)
 def monthly_dividends(tickers: tuple, last_date: pd.Timestamp):
     """Возвращает ряды данных по месячным дивидендам для кортежа тикеров
 
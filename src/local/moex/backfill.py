@@ -0,0 +1,161 @@
+"""Поиск пропусков в историях котировок и точечная дозагрузка недостающих дат
+
+Даты сохраненной истории сравниваются с торговыми сессиями utils.trading_calendar между первой и последней датой
+истории. Пропущенные сессии объединяются в периоды, которые загружаются с сервера ISS запросами с параметрами from и
+till по всем тикерам аналогам, а найденные строки вставляются в историю с проверкой совпадения с уже сохраненными
+данными. Поэтому ремонт истории стоит нескольких запросов вместо полной перезагрузки всех аналогов. Пропуски, за которые
+на ISS нет торгов, например при приостановке торгов, остаются в истории и загружаются повторно при следующем запуске:
+python -m local.moex.backfill [тикер ...] [--category категория] [--dry-run]
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import settings
+from local.moex import iss_quotes
+from local.moex import iss_quotes_t2
+from utils import trading_calendar
+from utils.data_file import load_catalog
+from utils.data_manager import deferred_refresh
+
+# Менеджеры котировок по категориям данных
+MANAGERS = {iss_quotes.QUOTES_CATEGORY: iss_quotes.QuotesDataManager,
+            iss_quotes_t2.QUOTES_CATEGORY: iss_quotes_t2.QuotesT2DataManager}
+# Сервер ISS отдает историю блоками по 100 строк, поэтому близкие пропуски загружаются одним периодом, если в него
+# попадает не больше этого количества сессий
+BLOCK_SESSIONS = 100
+COLUMNS = ['CATEGORY', 'TICKER', 'GAPS', 'MISSING', 'PERIODS', 'ROWS', 'ERROR']
+
+
+def find_gaps(index: pd.DatetimeIndex, sessions: pd.DatetimeIndex = None):
+    """Пропущенные торговые сессии между первой и последней датой истории
+
+    Parameters
+    ----------
+    index
+        Даты истории котировок
+    sessions
+        Торговые сессии между первой и последней датой истории - по умолчанию из календаря торговых сессий
+
+    Returns
+    -------
+    list
+        Пары (первая дата, последняя дата) для каждой серии идущих подряд пропущенных сессий в порядке возрастания
+    """
+    if len(index) == 0:
+        return []
+    if sessions is None:
+        sessions = trading_calendar.sessions_range(index[0], index[-1])
+    missing = sessions.difference(index)
+    if len(missing) == 0:
+        return []
+    positions = sessions.get_indexer(missing)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(positions) != 1) + 1])
+    ends = np.concatenate([starts[1:] - 1, [len(missing) - 1]])
+    return [(missing[start], missing[end]) for start, end in zip(starts, ends)]
+
+
+def count_sessions(sessions: pd.DatetimeIndex, start: pd.Timestamp, end: pd.Timestamp):
+    """Количество торговых сессий с start по end включительно"""
+    return sessions.searchsorted(end, side='right') - sessions.searchsorted(start)
+
+
+def gap_periods(gaps: list, sessions: pd.DatetimeIndex, block: int = BLOCK_SESSIONS):
+    """Объединяет соседние пропуски в периоды загрузки, если в период попадает не больше block торговых сессий
+
+    Returns
+    -------
+    list
+        Пары (начало, конец) периодов загрузки включительно
+    """
+    periods = []
+    for start, end in gaps:
+        if periods and count_sessions(sessions, periods[-1][0], end) <= block:
+            periods[-1] = (periods[-1][0], end)
+        else:
+            periods.append((start, end))
+    return periods
+
+
+def backfill(manager, dry_run: bool = False):
+    """Находит пропуски в истории котировок и вставляет в нее котировки, загруженные за периоды пропусков
+
+    Parameters
+    ----------
+    manager
+        Менеджер котировок с методами download_range и splice
+    dry_run
+        Если True, то пропуски только находятся без загрузки данных
+
+    Returns
+    -------
+    tuple
+        Количество пропусков, пропущенных сессий, периодов загрузки и вставленных строк
+    """
+    index = manager.value.index
+    if len(index) == 0:
+        return 0, 0, 0, 0
+    sessions = trading_calendar.sessions_range(index[0], index[-1])
+    gaps = find_gaps(index, sessions)
+    periods = gap_periods(gaps, sessions)
+    missing = sum(count_sessions(sessions, start, end) for start, end in gaps)
+    if dry_run or not periods:
+        return len(gaps), missing, len(periods), 0
+    if settings.DATA_OFFLINE:
+        raise ValueError(f'Загрузка пропусков {manager.data_category} -> {manager.data_name} невозможна в автономном '
+                         f'режиме')
+    frames = [manager.download_range(start, end) for start, end in periods]
+    rows = manager.splice(pd.concat(frames))
+    return len(gaps), missing, len(periods), rows
+
+
+def backfill_all(tickers: tuple = None, categories: tuple = tuple(MANAGERS), dry_run: bool = False):
+    """Ремонтирует истории котировок тикеров
+
+    Ошибка загрузки одной серии не прерывает ремонт остальных. Котировки не обновляются по расписанию
+
+    Parameters
+    ----------
+    tickers
+        Тикеры - по умолчанию все сохраненные тикеры категории
+    categories
+        Категории котировок
+    dry_run
+        Если True, то пропуски только находятся без загрузки данных
+
+    Returns
+    -------
+    pd.DataFrame
+        В строках серии, в столбцах категория, тикер, количество пропусков, пропущенных сессий, периодов загрузки,
+        вставленных строк и описание ошибки
+    """
+    rows = []
+    for data_category in categories:
+        saved = load_catalog(data_category)['NAME'].tolist()
+        for ticker in tickers or saved:
+            if ticker not in saved:
+                continue
+            with deferred_refresh():
+                manager = MANAGERS[data_category](ticker)
+            try:
+                result = backfill(manager, dry_run)
+            except Exception as exception:
+                rows.append((data_category, ticker, None, None, None, None,
+                             f'{exception.__class__.__name__}: {exception}'))
+            else:
+                rows.append((data_category, ticker, *result, None))
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Поиск и дозагрузка пропусков в историях котировок')
+    parser.add_argument('tickers', nargs='*', help='тикеры - по умолчанию все сохраненные')
+    parser.add_argument('--category', choices=list(MANAGERS), action='append', help='категории котировок')
+    parser.add_argument('--dry-run', action='store_true', help='только найти пропуски')
+    args = parser.parse_args()
+    report = backfill_all(tuple(args.tickers), tuple(args.category or MANAGERS), args.dry_run)
+    report = report[(report['GAPS'] != 0) | report['ERROR'].notna()]
+    print(report.to_string())
+    print(f'\nСерий с пропусками - {len(report)}\n'
+          f'Вставлено строк - {report["ROWS"].sum()}')
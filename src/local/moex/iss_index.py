@@ -19,9 +19,16 @@ class IndexDataManager(AbstractDataManager):
 
         Последнее значение используется для проверки стыковки данных
         """
-        last_date = self.value.index[-1]
+        last_date = self.last_index
         return moex.index(last_date)
 
+    async def download_all_async(self):
+        return await moex.index_async()
+
+    async def download_update_async(self):
+        last_date = self.last_index
+        return await moex.index_async(last_date)
+
 
 def index():
     """
@@ -1,9 +1,10 @@
 """Менеджер данных по котировкам и вспомогательные функции"""
-import functools
-
 import pandas as pd
 
+from local.moex import quotes_panel
 from local.moex.iss_securities_info import aliases
+from utils import blocking
+from utils import telemetry
 from utils.data_manager import AbstractDataManager
 from web import moex
 from web.labels import CLOSE_PRICE
@@ -37,12 +38,64 @@ class QuotesDataManager(AbstractDataManager):
 
     def download_update(self):
         ticker = self.data_name
-        last_date = self.value.index[-1]
+        last_date = self.last_index
         return moex.quotes(ticker, last_date)
 
+    async def download_all_async(self):
+        """Одновременно загружает истории котировок всех тикеров аналогов"""
+        aliases_tickers = await blocking.run(aliases, self.data_name)
+        frames = await telemetry.gather(*[moex.quotes_async(ticker) for ticker in aliases_tickers])
+        df = pd.concat(frames).reset_index()
+        df = df.loc[df.groupby(DATE)[VOLUME].idxmax()]
+        return df.set_index(DATE)
+
+    async def download_update_async(self):
+        last_date = self.last_index
+        return await moex.quotes_async(self.data_name, last_date)
+
+    def download_range(self, start: pd.Timestamp, end: pd.Timestamp):
+        """Загружает котировки всех тикеров аналогов за период с start по end включительно
+
+        Если на одну дату приходится несколько результатов торгов, то выбирается с максимальным оборотом. Если торгов
+        в этот период не было, то возвращается пустой DataFrame
+        """
+        frames = [moex.quotes(ticker, start, end) for ticker in aliases(self.data_name)]
+        frames = [df for df in frames if not df.empty]
+        if not frames:
+            return pd.DataFrame(columns=[CLOSE_PRICE, VOLUME], index=pd.DatetimeIndex([], name=DATE), dtype=float)
+        df = pd.concat(frames).reset_index()
+        df = df.loc[df.groupby(DATE)[VOLUME].idxmax()]
+        return df.set_index(DATE)
+
+    def create(self):
+        """Создает локальные данные с нуля и записывает их в панель котировок"""
+        super().create()
+        quotes_panel.refresh(self)
+
+    def update(self):
+        """Обновляет локальные данные и записывает их в панель котировок"""
+        super().update()
+        quotes_panel.refresh(self)
+
+    def splice(self, df_new):
+        """Вставляет новые строки внутрь сохраненных данных и записывает их в панель котировок"""
+        rows = super().splice(df_new)
+        if rows:
+            quotes_panel.refresh(self)
+        return rows
+
+    async def create_async(self):
+        """Асинхронно создает локальные данные с нуля и записывает их в панель котировок"""
+        await super().create_async()
+        quotes_panel.refresh(self)
+
+    async def update_async(self):
+        """Асинхронно обновляет локальные данные и записывает их в панель котировок"""
+        await super().update_async()
+        quotes_panel.refresh(self)
+
 
-@functools.lru_cache(maxsize=None)
-def quotes(ticker: str):
+def quotes(ticker: str, as_of=None):
     """
     Возвращает данные по котировкам из локальной версии данных, при необходимости обновляя их
 
@@ -53,6 +106,9 @@ def quotes(ticker: str):
     ----------
     ticker
         Тикер для которого необходимо получить данные
+    as_of
+        Момент времени, на который нужно получить сохраненную версию котировок - epoch, arrow.Arrow или дата. По
+        умолчанию актуальные котировки
 
     Returns
     -------
@@ -61,10 +117,11 @@ def quotes(ticker: str):
         В столбцах [CLOSE, VOLUME] цена закрытия и оборот в штуках.
     """
     data = QuotesDataManager(ticker)
-    return data.value
+    if as_of is None:
+        return data.value
+    return data.read(as_of=as_of)
 
 
-@functools.lru_cache(maxsize=1)
 def prices(tickers: tuple):
     """
     Возвращает историю цен закрытия по набору тикеров из локальных данных, при необходимости обновляя их
@@ -79,12 +136,10 @@ def prices(tickers: tuple):
     pandas.DataFrame
         В строках даты торгов
     """
-    df = pd.concat([quotes(ticker)[CLOSE_PRICE] for ticker in tickers], axis=1)
-    df.columns = tickers
+    df = quotes_panel.panel_frame(QuotesDataManager, tickers, CLOSE_PRICE)
     return df
 
 
-@functools.lru_cache(maxsize=1)
 def volumes(tickers: tuple):
     """
     Возвращает историю объемов торгов по набору тикеров из локальных данных, при необходимости обновляя их.
@@ -99,8 +154,7 @@ def volumes(tickers: tuple):
     pandas.DataFrame
         В строках даты торгов
     """
-    df = pd.concat([quotes(ticker)[VOLUME] for ticker in tickers], axis=1)
-    df.columns = tickers
+    df = quotes_panel.panel_frame(QuotesDataManager, tickers, VOLUME)
     return df
 
 
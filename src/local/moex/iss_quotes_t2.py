@@ -3,17 +3,21 @@ import functools
 
 import numpy as np
 import pandas as pd
-from pandas.tseries import offsets
 
 import local
 from local import dividends
 from local import moex
+from local.moex import quotes_panel
 from utils import aggregation
+from utils import blocking
 from utils import data_manager
+from utils import derived
+from utils import telemetry
+from utils import trading_calendar
+from utils.batch_manager import BatchDataManager
 from web import moex
 from web.labels import CLOSE_PRICE
 from web.labels import DATE
-from web.labels import TICKER
 from web.labels import VOLUME
 
 QUOTES_CATEGORY = 'quotes_t2'
@@ -46,18 +50,74 @@ class QuotesT2DataManager(data_manager.AbstractDataManager):
     def download_update(self):
         """Загружает историю котировок в режиме T+2 начиная с последней имеющейся даты"""
         ticker = self.data_name
-        last_date = self.value.index[-1]
+        last_date = self.last_index
         return moex.quotes_t2(ticker, last_date)
 
+    async def download_all_async(self):
+        """Одновременно загружает истории котировок в режиме T+2 всех тикеров аналогов"""
+        aliases_tickers = await blocking.run(local.moex.aliases, self.data_name)
+        frames = await telemetry.gather(*[moex.quotes_t2_async(ticker) for ticker in aliases_tickers])
+        df = pd.concat(frames).reset_index()
+        df = df.loc[df.groupby(DATE)[VOLUME].idxmax()]
+        return df.set_index(DATE)
+
+    async def download_update_async(self):
+        """Асинхронно загружает историю котировок в режиме T+2 начиная с последней имеющейся даты"""
+        last_date = self.last_index
+        return await moex.quotes_t2_async(self.data_name, last_date)
+
+    def download_range(self, start: pd.Timestamp, end: pd.Timestamp):
+        """Загружает котировки всех тикеров аналогов за период с start по end включительно
+
+        Если на одну дату приходится несколько результатов торгов, то выбирается с максимальным оборотом. Если торгов
+        в этот период не было, то возвращается пустой DataFrame
+        """
+        frames = [moex.quotes_t2(ticker, start, end) for ticker in local.moex.aliases(self.data_name)]
+        frames = [df for df in frames if not df.empty]
+        if not frames:
+            return pd.DataFrame(columns=[CLOSE_PRICE, VOLUME], index=pd.DatetimeIndex([], name=DATE), dtype=float)
+        df = pd.concat(frames).reset_index()
+        df = df.loc[df.groupby(DATE)[VOLUME].idxmax()]
+        return df.set_index(DATE)
+
+    def create(self):
+        """Создает локальные данные с нуля и записывает их в панель котировок"""
+        super().create()
+        quotes_panel.refresh(self)
 
-@functools.lru_cache(maxsize=None)
-def quotes_t2(ticker: str):
+    def update(self):
+        """Обновляет локальные данные и записывает их в панель котировок"""
+        super().update()
+        quotes_panel.refresh(self)
+
+    def splice(self, df_new):
+        """Вставляет новые строки внутрь сохраненных данных и записывает их в панель котировок"""
+        rows = super().splice(df_new)
+        if rows:
+            quotes_panel.refresh(self)
+        return rows
+
+    async def create_async(self):
+        """Асинхронно создает локальные данные с нуля и записывает их в панель котировок"""
+        await super().create_async()
+        quotes_panel.refresh(self)
+
+    async def update_async(self):
+        """Асинхронно обновляет локальные данные и записывает их в панель котировок"""
+        await super().update_async()
+        quotes_panel.refresh(self)
+
+
+def quotes_t2(ticker: str, as_of=None):
     """Возвращает данные по котировкам в режиме T+2 из локальной версии данных, при необходимости обновляя их
 
     Parameters
     ----------
     ticker
         Тикер для которого необходимо получить данные
+    as_of
+        Момент времени, на который нужно получить сохраненную версию котировок - epoch, arrow.Arrow или дата. По
+        умолчанию актуальные котировки
 
     Returns
     -------
@@ -66,10 +126,11 @@ def quotes_t2(ticker: str):
         В столбцах [CLOSE, VOLUME] цена закрытия и оборот в штуках
     """
     data = QuotesT2DataManager(ticker)
-    return data.value
+    if as_of is None:
+        return data.value
+    return data.read(as_of=as_of)
 
 
-@functools.lru_cache(maxsize=1)
 def prices_t2(tickers: tuple):
     """Возвращает историю цен закрытия в режиме T+2 по набору тикеров из локальных данных, при необходимости обновляя их
 
@@ -83,13 +144,10 @@ def prices_t2(tickers: tuple):
     pandas.DataFrame
         В строках даты торгов
     """
-    df = pd.concat([quotes_t2(ticker)[CLOSE_PRICE] for ticker in tickers], axis=1)
-    df.columns = tickers
-    df.columns.name = TICKER
+    df = quotes_panel.panel_frame(QuotesT2DataManager, tickers, CLOSE_PRICE)
     return df
 
 
-@functools.lru_cache(maxsize=1)
 def volumes_t2(tickers: tuple):
     """Возвращает историю объемов торгов в режиме T+2 для тикеров из локальных данных, при необходимости обновляя их
 
@@ -103,8 +161,7 @@ def volumes_t2(tickers: tuple):
     pandas.DataFrame
         В строках даты торгов
     """
-    df = pd.concat([quotes_t2(ticker)[VOLUME] for ticker in tickers], axis=1)
-    df.columns = tickers
+    df = quotes_panel.panel_frame(QuotesT2DataManager, tickers, VOLUME)
     return df
 
 
@@ -112,20 +169,26 @@ def t2_shift(date, index):
     """Рассчитывает эксдивидендную дату для режима T-2 на основании даты закрытия реестра
 
     Если дата не содержится индексе цен, то необходимо найти предыдущую из индекса цен. После этого взять
-    сдвинутую на 1 назад дату. Если дата находится в будущем за пределом истории котировок, то достаточно
-    сдвинуть на 1 бизнес дня назад - упрощенный подход, который может не корректно работать из-за праздников
+    сдвинутую на 1 назад дату. Если дата находится в будущем за пределом истории котировок, то сдвиг осуществляется
+    по календарю торговых сессий MOEX с учетом праздников
     """
     if date <= index[-1]:
         position = index.get_loc(date, 'ffill')
         return index[position - T2]
-    # Выходной гарантированно заменяем бизнес днем
-    next_b_day = date + offsets.BDay()
-    return next_b_day - (T2 + 1) * offsets.BDay()
+    return trading_calendar.shift(date, -T2)
+
 
+def _log_returns_inputs(tickers: tuple, last_date: pd.Timestamp):
+    """Входы доходностей с учетом дивидендов - котировки в режиме T+2 и сводная информация по дивидендам тикеров"""
+    return [BatchDataManager(QuotesT2DataManager, tickers), (dividends.dividends, (tickers,))]
 
+
+@derived.dataset(_log_returns_inputs)
 def log_returns_with_div(tickers: tuple, last_date: pd.Timestamp):
     """Ряды логарифмов месячных доходностей с учетом дивидендов для набора тикеров до указанной даты
 
+    Результат пересчитывается только после изменения котировок или дивидендов одного из тикеров
+
     Parameters
     ----------
     tickers
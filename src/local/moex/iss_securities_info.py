@@ -1,6 +1,5 @@
 """Сохраняет, обновляет и загружает локальную версию информации об акциях"""
-from functools import lru_cache
-
+from utils import derived
 from utils.data_manager import AbstractDataManager
 from web import moex
 from web.labels import COMPANY_NAME, REG_NUMBER, LOT_SIZE
@@ -22,6 +21,11 @@ class SecuritiesInfoDataManager(AbstractDataManager):
         """Загружает одним запросом информацию о всех тикерах"""
         return moex.securities_info()[[COMPANY_NAME, REG_NUMBER, LOT_SIZE]]
 
+    async def download_all_async(self):
+        """Асинхронно загружает одним запросом информацию о всех тикерах"""
+        df = await moex.securities_info_async()
+        return df[[COMPANY_NAME, REG_NUMBER, LOT_SIZE]]
+
     def download_update(self):
         """Отсутствует возможность частичного обновления данных """
         super().download_update()
@@ -45,7 +49,12 @@ def securities_info(tickers: tuple):
     return data.value.loc[tickers, :]
 
 
-@lru_cache(maxsize=1)
+def _lot_size_inputs(tickers: tuple):
+    """Входы размеров лотов - информация обо всех акциях"""
+    return [SecuritiesInfoDataManager()]
+
+
+@derived.dataset(_lot_size_inputs)
 def lot_size(tickers: tuple):
     """Возвращает размеры лотов для тикеров
 
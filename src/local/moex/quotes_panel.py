@@ -0,0 +1,101 @@
+"""Панели цен закрытия и объемов торгов по всем тикерам, которые обновляются менеджерами котировок"""
+import pandas as pd
+
+import settings
+from utils import series_cache
+from utils.batch_manager import VERSION_COLUMNS
+from utils.batch_manager import BatchDataManager
+from utils.panel import Panel
+from web.labels import CLOSE_PRICE
+from web.labels import DATE
+from web.labels import TICKER
+from web.labels import VOLUME
+
+FIELDS = (CLOSE_PRICE, VOLUME)
+
+
+def content_version(data_hash, rows):
+    """Версия котировок тикера в панели - хэш основного файла данных и количество строк
+
+    Не меняется при обновлении без новых строк. Пока новые строки дописываются в сегменты журнала, хэш основного
+    файла не меняется, а количество строк растет. Если данных нет, то None
+    """
+    if data_hash is None:
+        return None
+    return [data_hash, int(rows)]
+
+
+def _appended_start(metadata: dict, version: list, old_version):
+    """Первая дата строк, дописанных в сегменты журнала после версии old_version, или None, если данные изменились
+    иначе и тикер нужно записать в панель целиком"""
+    if not isinstance(old_version, list) or old_version[0] != version[0] or version[1] <= old_version[1]:
+        return None
+    rows = version[1] - old_version[1]
+    for segment in reversed(metadata.get('segments', [])):
+        rows -= segment['rows']
+        if rows == 0:
+            return pd.Timestamp(segment['first'])
+        if rows < 0:
+            return None
+    return None
+
+
+def refresh(manager):
+    """Записывает в панель котировки, сохраненные менеджером данных
+
+    Панель называется по категории данных менеджера. Если содержимое данных не изменилось, то панель не
+    перезаписывается, а если в данные только дописаны строки, то в панель записываются только они
+    """
+    panel = Panel(manager.data_category, FIELDS)
+    metadata = manager.metadata
+    version = content_version(metadata['hash'], metadata['rows'])
+    old_version = panel.version(manager.data_name)
+    if old_version == version:
+        return
+    start = _appended_start(metadata, version, old_version)
+    if start is None:
+        panel.update(manager.data_name, manager.value, version)
+    else:
+        panel.append(manager.data_name, manager.tail(start), version)
+
+
+def panel_frame(manager_class, tickers: tuple, field: str):
+    """Значения поля котировок для набора тикеров из панели
+
+    Отсутствующие и устаревшие котировки тикеров обновляются пакетным менеджером данных, а тикеры, которые
+    отсутствуют в панели или загружены из другой версии данных, записываются в нее. Версии котировок берутся из
+    каталога данных, поэтому файлы тикеров открываются только для записи в панель. Результат хранится в общем кэше
+    серий до обновления котировок любого из тикеров
+
+    Parameters
+    ----------
+    manager_class
+        Класс менеджера котировок, принимающий тикер в качестве единственного параметра
+    tickers
+        Кортеж тикеров
+    field
+        Поле котировок - цена закрытия или объем
+
+    Returns
+    -------
+    pd.DataFrame
+        В строках даты торгов хотя бы одного из тикеров, в столбцах тикеры
+    """
+    batch = BatchDataManager(manager_class, tickers)
+    key = ('panel', str(settings.DATA_PATH), batch.data_category, field, tickers)
+    versions = batch.versions
+    version = tuple(versions.values())
+    df = series_cache.CACHE.get(key, version)
+    if df is not None:
+        return df
+    panel = Panel(batch.data_category, FIELDS)
+    for (_, ticker), ticker_version in versions.items():
+        ticker_version = dict(zip(VERSION_COLUMNS, ticker_version))
+        if panel.version(ticker) != content_version(ticker_version['HASH'], ticker_version['ROWS']):
+            refresh(manager_class(ticker))
+            panel = Panel(batch.data_category, FIELDS)
+    df = panel.frame(field, tickers)
+    df.index.name = DATE
+    df.columns.name = TICKER
+    series_cache.CACHE.put(key, version, df)
+    return df
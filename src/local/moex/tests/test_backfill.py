@@ -0,0 +1,78 @@
+import pathlib
+
+import pandas as pd
+import pytest
+
+import settings
+from local.moex import backfill
+from utils import trading_calendar
+from utils.data_manager import AbstractDataManager
+from web.labels import CLOSE_PRICE, DATE, VOLUME
+
+SESSIONS = pd.bdate_range('2018-03-01', '2018-03-30').difference(trading_calendar.HOLIDAYS)
+MISSING = pd.DatetimeIndex(['2018-03-06', '2018-03-07', '2018-03-13', '2018-03-27'])
+
+
+@pytest.fixture(autouse=True)
+def make_temp_dir(tmpdir, monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_PATH', pathlib.Path(tmpdir.mkdir('test_backfill')))
+
+
+def quotes(dates):
+    values = [float(date.day) for date in dates]
+    return pd.DataFrame({CLOSE_PRICE: values, VOLUME: values}, index=pd.DatetimeIndex(dates, name=DATE))
+
+
+class DataManager(AbstractDataManager):
+    def __init__(self, ticker):
+        self.requests = []
+        super().__init__('backfill', ticker)
+
+    def download_all(self):
+        return quotes(SESSIONS.difference(MISSING))
+
+    def download_update(self):
+        return self.download_all()
+
+    def download_range(self, start, end):
+        self.requests.append((start, end))
+        dates = SESSIONS[(SESSIONS >= start) & (SESSIONS <= end)]
+        return quotes(dates.difference(pd.DatetimeIndex(['2018-03-27'])))
+
+
+def test_find_gaps():
+    assert pd.Timestamp('2018-03-08') not in SESSIONS
+    gaps = backfill.find_gaps(SESSIONS.difference(MISSING))
+    assert gaps == [(pd.Timestamp('2018-03-06'), pd.Timestamp('2018-03-07')),
+                    (pd.Timestamp('2018-03-13'), pd.Timestamp('2018-03-13')),
+                    (pd.Timestamp('2018-03-27'), pd.Timestamp('2018-03-27'))]
+    assert backfill.find_gaps(SESSIONS) == []
+    assert backfill.find_gaps(pd.DatetimeIndex([])) == []
+
+
+def test_gap_periods():
+    gaps = backfill.find_gaps(SESSIONS.difference(MISSING), SESSIONS)
+    assert backfill.gap_periods(gaps, SESSIONS) == [(pd.Timestamp('2018-03-06'), pd.Timestamp('2018-03-27'))]
+    assert backfill.gap_periods(gaps, SESSIONS, block=5) == [(pd.Timestamp('2018-03-06'), pd.Timestamp('2018-03-13')),
+                                                             (pd.Timestamp('2018-03-27'), pd.Timestamp('2018-03-27'))]
+
+
+def test_backfill():
+    manager = DataManager('AKRN')
+    assert backfill.backfill(manager, dry_run=True) == (3, 4, 1, 0)
+    assert manager.requests == []
+    assert backfill.backfill(manager) == (3, 4, 1, 3)
+    assert manager.requests == [(pd.Timestamp('2018-03-06'), pd.Timestamp('2018-03-27'))]
+    assert manager.value.index.equals(SESSIONS.difference(pd.DatetimeIndex(['2018-03-27'])))
+    assert manager.value.loc['2018-03-13', CLOSE_PRICE] == 13.0
+    assert backfill.find_gaps(DataManager('AKRN').value.index) == [(pd.Timestamp('2018-03-27'),
+                                                                    pd.Timestamp('2018-03-27'))]
+
+
+def test_backfill_offline(monkeypatch):
+    manager = DataManager('AKRN')
+    monkeypatch.setattr(settings, 'DATA_OFFLINE', True)
+    assert backfill.backfill(manager, dry_run=True) == (3, 4, 1, 0)
+    with pytest.raises(ValueError) as error:
+        backfill.backfill(manager)
+    assert 'автономном режиме' in str(error.value)
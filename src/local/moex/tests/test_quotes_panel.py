@@ -0,0 +1,95 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import settings
+from local.moex import quotes_panel
+from utils import catalog
+from utils.data_file import DataFile
+from utils.data_manager import AbstractDataManager
+from utils.panel import Panel
+from web.labels import CLOSE_PRICE, DATE, VOLUME
+
+DATES = pd.bdate_range('2018-01-01', periods=10, name=DATE)
+
+
+@pytest.fixture(name='writes')
+def make_temp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_PATH', Path(tmp_path))
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('quotes',))
+    writes = []
+    update, append = Panel.update, Panel.append
+
+    def spy_update(self, ticker, df, version=None):
+        writes.append(('update', len(df)))
+        update(self, ticker, df, version)
+
+    def spy_append(self, ticker, df, version=None):
+        writes.append(('append', len(df)))
+        append(self, ticker, df, version)
+
+    monkeypatch.setattr(Panel, 'update', spy_update)
+    monkeypatch.setattr(Panel, 'append', spy_append)
+    return writes
+
+
+def quotes(dates):
+    return pd.DataFrame({CLOSE_PRICE: range(len(dates)), VOLUME: 10.0}, index=dates, dtype=float)
+
+
+class DataManager(AbstractDataManager):
+    def __init__(self, ticker):
+        super().__init__('quotes', ticker)
+
+    def download_all(self):
+        return quotes(DATES[:6])
+
+    def download_update(self):
+        return quotes(DATES[:6])
+
+
+def test_refresh_appends_tail(writes):
+    manager = DataManager('AKRN')
+    quotes_panel.refresh(manager)
+    assert writes == [('update', 6)]
+    DataFile('quotes', 'AKRN').append(quotes(DATES)[6:8])
+    quotes_panel.refresh(DataManager('AKRN'))
+    DataFile('quotes', 'AKRN').append(quotes(DATES)[8:])
+    quotes_panel.refresh(DataManager('AKRN'))
+    assert writes == [('update', 6), ('append', 2), ('append', 2)]
+    df = Panel('quotes', quotes_panel.FIELDS).frame(CLOSE_PRICE, ('AKRN',))
+    assert df['AKRN'].tolist() == list(range(6)) + [6.0, 7.0, 8.0, 9.0]
+
+
+def test_refresh_skips_unchanged(writes):
+    quotes_panel.refresh(DataManager('AKRN'))
+    DataFile('quotes', 'AKRN').append(quotes(DATES)[:0])
+    quotes_panel.refresh(DataManager('AKRN'))
+    assert writes == [('update', 6)]
+
+
+def test_refresh_rewrites_changed(writes):
+    quotes_panel.refresh(DataManager('AKRN'))
+    DataFile('quotes', 'AKRN').value = quotes(DATES[:4])
+    quotes_panel.refresh(DataManager('AKRN'))
+    assert writes == [('update', 6), ('update', 4)]
+
+
+def test_panel_frame(writes):
+    df = quotes_panel.panel_frame(DataManager, ('AKRN', 'GAZP'), VOLUME)
+    assert df.shape == (6, 2)
+    assert writes == [('update', 6), ('update', 6)]
+    assert quotes_panel.panel_frame(DataManager, ('AKRN', 'GAZP'), VOLUME) is df
+    DataFile('quotes', 'AKRN').append(quotes(DATES)[6:])
+    df = quotes_panel.panel_frame(DataManager, ('AKRN', 'GAZP'), VOLUME)
+    assert writes == [('update', 6), ('update', 6), ('append', 4)]
+    assert df['AKRN'].notna().sum() == 10
+    assert df['GAZP'].notna().sum() == 6
+
+
+def test_panel_frame_not_in_catalog(writes):
+    df = quotes_panel.panel_frame(DataManager, ('AKRN',), CLOSE_PRICE)
+    catalog.remove('quotes', 'AKRN')
+    assert quotes_panel.panel_frame(DataManager, ('AKRN',), CLOSE_PRICE) is df
+    assert writes == [('update', 6)]
@@ -0,0 +1,229 @@
+"""План обновления локальных данных без его выполнения
+
+Перечисляет серии, которые будут созданы или обновлены при следующем запуске local.refresh, количество запросов
+страниц к серверу ISS и ML-модели, которые будут обучены заново для заданного портфеля, с причинами переобучения.
+Время работы оценивается по медианному времени таких же действий в телеметрии. Данные не загружаются и модели не
+обучаются, поэтому план можно строить в торговые часы, а тяжелую работу перенести на ночь:
+python -m local.plan [тикер ...] [--date дата] [--workers потоки]
+"""
+import argparse
+import math
+
+import arrow
+import pandas as pd
+
+import settings
+from local import refresh
+from local.moex import iss_quotes
+from local.moex import iss_quotes_t2
+from local.moex.iss_index import INDEX_NAME
+from local.moex.iss_securities_info import SECURITIES_INFO_MANE
+from utils import catalog
+from utils import telemetry
+from utils import trading_calendar
+from utils.data_file import load_catalog
+from utils.data_manager import MARKET_TIME_ZONE
+from utils.data_manager import deferred_refresh
+
+# Количество строк в одной странице ответа сервера ISS
+ISS_PAGE_ROWS = 100
+# Данные, которые загружаются с ISS постранично
+ISS_PAGED = (iss_quotes.QUOTES_CATEGORY, iss_quotes_t2.QUOTES_CATEGORY, INDEX_NAME)
+# Данные, которые загружаются с ISS одним запросом
+ISS_SINGLE = (SECURITIES_INFO_MANE,)
+SERIES_COLUMNS = ['CATEGORY', 'NAME', 'ACTION', 'ISS_PAGES', 'SECONDS']
+MODELS_COLUMNS = ['NAME', 'ACTION', 'REASONS', 'SECONDS']
+
+
+def _manager_class(data_category, data_name: str):
+    """Класс менеджера серии данных"""
+    if data_category is None:
+        return refresh.ROOT_MANAGERS[data_name]
+    return refresh.TICKER_MANAGERS[data_category]
+
+
+def iss_pages(storage_key: str, rows: int, action: str):
+    """Ожидаемое количество запросов к серверу ISS
+
+    Parameters
+    ----------
+    storage_key
+        Категория данных, а для данных в корне глобальной директории - их название
+    rows
+        Ожидаемое количество загружаемых строк
+    action
+        Действие - create или update. При создании котировок по тикеру дополнительно запрашиваются тикеры аналоги
+
+    Returns
+    -------
+    int
+        Количество страниц с данными и завершающая пустая страница для постраничной загрузки
+    """
+    if storage_key in ISS_SINGLE:
+        return 1
+    if storage_key not in ISS_PAGED:
+        return 0
+    pages = math.ceil(rows / ISS_PAGE_ROWS) + 1
+    if action == 'create' and storage_key != INDEX_NAME:
+        pages += 1
+    return pages
+
+
+def _expected_rows(entry, median_rows, action: str, today: pd.Timestamp):
+    """Ожидаемое количество загружаемых строк
+
+    При обновлении загружаются торговые сессии с последней сохраненной даты, а при создании - вся история, размер
+    которой оценивается по сохраненной версии серии или медиане серий той же категории. Для данных без индекса дат
+    объем обновления не оценивается
+    """
+    if action == 'update':
+        if pd.isna(entry['LAST']):
+            return 0
+        return len(trading_calendar.sessions_range(entry['LAST'], today))
+    if entry is not None and pd.notna(entry['ROWS']):
+        return int(entry['ROWS'])
+    if pd.notna(median_rows):
+        return int(median_rows)
+    return 0
+
+
+def seconds_estimates():
+    """Медианное время действий по данным телеметрии
+
+    Returns
+    -------
+    tuple of pd.Series
+        Медианное время действия с ключом (категория данных, действие) и медианное время любых действий с ключом
+        категории. Для данных в корне глобальной директории вместо категории используется название данных
+    """
+    df = telemetry.load()
+    df = df[df['error'].isna()]
+    storage_key = df['category'].where(df['category'].notna(), df['name'])
+    by_action = df['seconds'].groupby([storage_key, df['action']]).median()
+    by_key = df['seconds'].groupby(storage_key).median()
+    return by_action, by_key
+
+
+def _estimate(estimates: tuple, storage_key: str, action: str):
+    """Оценка времени действия - NaN, если в телеметрии нет таких данных"""
+    by_action, by_key = estimates
+    if (storage_key, action) in by_action.index:
+        return by_action[(storage_key, action)]
+    return by_key.get(storage_key, float('nan'))
+
+
+def plan_series(priority=()):
+    """Серии, которые будут созданы или обновлены, в порядке обновления
+
+    Серии отбираются по полному каталогу данных, который при необходимости сверяется с директорией данных. Серия
+    создается, только если в корне глобальной директории нет ее файла данных. Объем и время обновления серий,
+    менеджеры которых всегда загружают данные с начала, оцениваются как при создании. В автономном режиме серии,
+    загружаемые из интернета, не обновляются, а только выдают предупреждение
+
+    Parameters
+    ----------
+    priority
+        Тикеры, данные по которым обновляются раньше остальных тикеров
+
+    Returns
+    -------
+    pd.DataFrame
+        В строках серии, в столбцах категория, название, действие - create, update или warn, ожидаемое количество
+        запросов к ISS и оценка времени в секундах
+    """
+    root, tickers = refresh.stale_specs(priority)
+    df = load_catalog()
+    saved = dict(zip(catalog.specs(df), df.to_dict('records')))
+    median_rows = df.groupby('CATEGORY')['ROWS'].median()
+    today = pd.Timestamp(arrow.now().to(MARKET_TIME_ZONE).date())
+    estimates = seconds_estimates()
+    rows = []
+    for data_category, data_name in root + tickers:
+        storage_key = data_category or data_name
+        manager_class = _manager_class(data_category, data_name)
+        entry = saved.get((data_category, data_name))
+        if settings.DATA_OFFLINE and manager_class.is_remote:
+            rows.append((data_category, data_name, 'warn', 0, 0.0))
+            continue
+        action = 'create' if entry is None else 'update'
+        download = 'create' if manager_class.update_from_scratch else action
+        expected_rows = _expected_rows(entry, median_rows.get(data_category), download, today)
+        rows.append((data_category, data_name, action, iss_pages(storage_key, expected_rows, download),
+                     _estimate(estimates, storage_key, download)))
+    return pd.DataFrame(rows, columns=SERIES_COLUMNS)
+
+
+def plan_models(positions: tuple, date: pd.Timestamp):
+    """ML-модели, которые будут обучены заново для портфеля
+
+    Parameters
+    ----------
+    positions
+        Кортеж тикеров портфеля
+    date
+        Дата, для которой составляется прогноз
+
+    Returns
+    -------
+    pd.DataFrame
+        В строках модели, в столбцах название, действие - create, причины переобучения - absent, positions, date,
+        params или schedule, и оценка времени в секундах
+    """
+    import ml
+
+    estimates = seconds_estimates()
+    rows = []
+    for manager_class in (ml.ReturnsMLDataManager, ml.DividendsMLDataManager):
+        with deferred_refresh():
+            manager = manager_class(positions, date)
+        if manager.value is None:
+            reasons = ['absent']
+        else:
+            reasons = manager.retrain_reasons
+            if not reasons and manager.next_update < arrow.now():
+                reasons = ['schedule']
+        if reasons:
+            rows.append((manager.data_name, 'create', ', '.join(reasons),
+                         _estimate(estimates, manager.data_name, 'create')))
+    return pd.DataFrame(rows, columns=MODELS_COLUMNS)
+
+
+def wall_time(series: pd.DataFrame, models: pd.DataFrame, workers: int = None):
+    """Оценка времени выполнения плана в секундах
+
+    Данные в корне глобальной директории и данные по тикерам обновляются в пуле потоков по очереди, а модели
+    обучаются последовательно. Действия без оценки в телеметрии не учитываются
+
+    Parameters
+    ----------
+    series
+        План обновления серий
+    models
+        План обучения моделей
+    workers
+        Количество потоков - по умолчанию settings.DATA_REFRESH_WORKERS
+    """
+    workers = workers or settings.DATA_REFRESH_WORKERS
+    is_root = series['CATEGORY'].isna()
+    root_seconds = series.loc[is_root, 'SECONDS'].sum() / min(workers, max(is_root.sum(), 1))
+    tickers_seconds = series.loc[~is_root, 'SECONDS'].sum() / workers
+    return root_seconds + tickers_seconds + models['SECONDS'].sum()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='План обновления локальных данных без его выполнения')
+    parser.add_argument('tickers', nargs='*', help='тикеры портфеля - для них проверяется необходимость обучения '
+                                                   'моделей')
+    parser.add_argument('--date', help='дата прогноза моделей - по умолчанию сегодня')
+    parser.add_argument('--workers', type=int, help='количество потоков - по умолчанию из настроек')
+    args = parser.parse_args()
+    series_plan = plan_series(tuple(args.tickers))
+    models_plan = pd.DataFrame(columns=MODELS_COLUMNS)
+    if args.tickers:
+        models_plan = plan_models(tuple(sorted(args.tickers)), pd.Timestamp(args.date or arrow.now().date()))
+    print(series_plan.to_string())
+    print(f'\n{models_plan.to_string()}')
+    print(f'\nСерий - {len(series_plan)}\n'
+          f'Запросов к ISS - {series_plan["ISS_PAGES"].sum()}\n'
+          f'Моделей - {len(models_plan)}\n'
+          f'Оценка времени - {wall_time(series_plan, models_plan, args.workers):.1f} с')
@@ -0,0 +1,199 @@
+"""Параллельное обновление всех локальных данных, время обновления которых наступило
+
+Менеджеры данных обновляют данные при создании, поэтому первый запуск после публикации итогов торгов обновляет тикеры
+по одному. Планировщик заранее находит по каталогу данных устаревшие серии и обновляет их в ограниченном пуле потоков -
+сначала общие данные в корне глобальной директории, а потом данные по тикерам, начиная с тикеров портфеля. Запуск по
+расписанию, например из cron после 19.45 MSK, избавляет остальные команды от ожидания загрузки данных. В режиме
+--async серии обновляются в одном цикле событий с помощью асинхронных методов менеджеров:
+python -m local.refresh [тикер ...] [--workers потоки] [--async]
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import settings
+from local.dividends.comony_ru import CONOMY_NAME, ConomyDataManager
+from local.dividends.dohod_ru import DOHOD_CATEGORY, DohodDataManager
+from local.dividends.smart_lab_ru import SMART_LAB_NAME, SmartLabDataManager
+from local.dividends.sqlite import DIVIDENDS_CATEGORY, DividendsDataManager
+from local.local_cpi import CPI_NAME, CPIDataManager
+from local.moex import iss_quotes, iss_quotes_t2
+from local.moex.iss_index import INDEX_NAME, IndexDataManager
+from local.moex.iss_securities_info import SECURITIES_INFO_MANE, SecuritiesInfoDataManager
+from utils.data_file import DataFile
+from utils.data_manager import open_async
+from utils.data_manager import stale_data_specs
+
+# Менеджеры данных в корне глобальной директории по названиям данных
+ROOT_MANAGERS = {INDEX_NAME: IndexDataManager,
+                 CPI_NAME: CPIDataManager,
+                 SECURITIES_INFO_MANE: SecuritiesInfoDataManager,
+                 SMART_LAB_NAME: SmartLabDataManager}
+# Менеджеры данных по тикерам по категориям данных
+TICKER_MANAGERS = {iss_quotes.QUOTES_CATEGORY: iss_quotes.QuotesDataManager,
+                   iss_quotes_t2.QUOTES_CATEGORY: iss_quotes_t2.QuotesT2DataManager,
+                   DIVIDENDS_CATEGORY: DividendsDataManager,
+                   DOHOD_CATEGORY: DohodDataManager,
+                   CONOMY_NAME: ConomyDataManager}
+COLUMNS = ['CATEGORY', 'NAME', 'SECONDS', 'ERROR']
+
+
+def _is_known(data_category, data_name: str):
+    """Есть ли менеджер для серии данных"""
+    if data_category is None:
+        return data_name in ROOT_MANAGERS
+    return data_category in TICKER_MANAGERS
+
+
+def _is_missing(data_name: str):
+    """Нет ли на диске сохраненных данных в корне глобальной директории
+
+    Проверяются метаданные и файл данных, а не каталог, поэтому существующие данные не создаются заново, даже если
+    каталог отстал от директории данных
+    """
+    data_file = DataFile(None, data_name)
+    return data_file.metadata is None or not data_file.data_path.exists()
+
+
+def stale_specs(priority=()):
+    """Серии данных, которые нужно создать или обновить, в порядке обновления
+
+    Устаревшие серии отбираются по полному каталогу данных, который при необходимости сверяется с директорией данных,
+    поэтому отбираются серии, время планового обновления которых наступило. Данные в корне глобальной директории,
+    файлов которых еще нет, добавляются для создания
+
+    Parameters
+    ----------
+    priority
+        Тикеры, данные по которым обновляются раньше остальных тикеров, например тикеры портфеля
+
+    Returns
+    -------
+    tuple
+        Перечни пар (категория данных, название данных) для данных в корне глобальной директории и для данных по
+        тикерам
+    """
+    specs = [spec for spec in stale_data_specs() if _is_known(*spec)]
+    specs.extend((None, name) for name in ROOT_MANAGERS if (None, name) not in specs and _is_missing(name))
+    root = [spec for spec in specs if spec[0] is None]
+    tickers = sorted((spec for spec in specs if spec[0] is not None), key=lambda spec: spec[1] not in priority)
+    return root, tickers
+
+
+def refresh_series(data_category, data_name: str):
+    """Создает менеджер данных, который при необходимости обновляет данные, и замеряет время
+
+    Returns
+    -------
+    tuple
+        Категория данных, название данных, время работы в секундах и описание ошибки или None
+    """
+    start = time.perf_counter()
+    error = None
+    manager_class, *args = _manager_args(data_category, data_name)
+    try:
+        manager_class(*args)
+    except Exception as exception:
+        error = f'{exception.__class__.__name__}: {exception}'
+    return data_category, data_name, time.perf_counter() - start, error
+
+
+def _manager_args(data_category, data_name: str):
+    """Класс менеджера и параметры его конструктора для серии данных"""
+    if data_category is None:
+        return (ROOT_MANAGERS[data_name],)
+    return TICKER_MANAGERS[data_category], data_name
+
+
+async def refresh_series_async(data_category, data_name: str, semaphore: asyncio.Semaphore):
+    """Асинхронный вариант refresh_series - количество одновременно обновляемых серий ограничено семафором"""
+    async with semaphore:
+        start = time.perf_counter()
+        error = None
+        try:
+            await open_async(*_manager_args(data_category, data_name))
+        except Exception as exception:
+            error = f'{exception.__class__.__name__}: {exception}'
+        return data_category, data_name, time.perf_counter() - start, error
+
+
+async def refresh_async(priority=(), limit: int = None):
+    """Асинхронный вариант refresh, в котором серии обновляются в одном цикле событий
+
+    Parameters
+    ----------
+    priority
+        Тикеры, данные по которым обновляются раньше остальных тикеров, например тикеры портфеля
+    limit
+        Количество одновременно обновляемых серий - по умолчанию settings.DATA_ASYNC_REQUESTS
+
+    Returns
+    -------
+    pd.DataFrame
+        В строках серии в порядке обновления, в столбцах категория, название, время обновления в секундах и описание
+        ошибки
+    """
+    root, tickers = stale_specs(priority)
+    semaphore = asyncio.Semaphore(limit or settings.DATA_ASYNC_REQUESTS)
+    rows = []
+    for specs in (root, tickers):
+        rows.extend(await asyncio.gather(*[refresh_series_async(*spec, semaphore) for spec in specs]))
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def run_async(coroutine):
+    """Выполняет корутину в новом цикле событий - блокирующие запросы выполняются в пуле потоков utils.blocking"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def refresh(priority=(), workers: int = None):
+    """Обновляет все устаревшие серии данных в пуле потоков
+
+    Сначала обновляются данные в корне глобальной директории, так как от них зависит создание данных по тикерам,
+    а потом данные по тикерам. Ошибка обновления одной серии не прерывает обновление остальных
+
+    Parameters
+    ----------
+    priority
+        Тикеры, данные по которым обновляются раньше остальных тикеров, например тикеры портфеля
+    workers
+        Количество потоков - по умолчанию settings.DATA_REFRESH_WORKERS
+
+    Returns
+    -------
+    pd.DataFrame
+        В строках серии в порядке обновления, в столбцах категория, название, время обновления в секундах и описание
+        ошибки
+    """
+    root, tickers = stale_specs(priority)
+    rows = []
+    with ThreadPoolExecutor(max_workers=workers or settings.DATA_REFRESH_WORKERS) as executor:
+        for specs in (root, tickers):
+            rows.extend(executor.map(lambda spec: refresh_series(*spec), specs))
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Параллельное обновление устаревших локальных данных')
+    parser.add_argument('tickers', nargs='*', help='тикеры портфеля, которые обновляются в первую очередь')
+    parser.add_argument('--workers', type=int, help='количество потоков - по умолчанию из настроек')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='обновлять в цикле событий')
+    args = parser.parse_args()
+    wall_time = time.perf_counter()
+    if args.use_async:
+        report = run_async(refresh_async(tuple(args.tickers), args.workers))
+    else:
+        report = refresh(tuple(args.tickers), args.workers)
+    wall_time = time.perf_counter() - wall_time
+    print(report.to_string())
+    print(f'\nОбновлено серий - {len(report)}\n'
+          f'Ошибок - {report["ERROR"].notna().sum()}\n'
+          f'Суммарное время обновления - {report["SECONDS"].sum():.1f} с\n'
+          f'Время работы - {wall_time:.1f} с')
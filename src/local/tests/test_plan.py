@@ -0,0 +1,99 @@
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import settings
+from local import plan
+from local import refresh
+from utils import catalog
+from utils import telemetry
+from utils.data_file import DataFile
+
+OLD = time.time() - 7 * 24 * 60 * 60
+
+
+class RemoteManager:
+    update_from_scratch = False
+    is_remote = True
+
+
+class ScratchManager:
+    update_from_scratch = True
+    is_remote = True
+
+
+class LocalManager:
+    update_from_scratch = False
+    is_remote = False
+
+
+@pytest.fixture(autouse=True)
+def make_catalog(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_PATH', Path(tmp_path))
+    monkeypatch.setattr(settings, 'DATA_TTL', dict())
+    monkeypatch.setattr(refresh, 'ROOT_MANAGERS', dict(cpi=LocalManager, securities_info=ScratchManager))
+    monkeypatch.setattr(refresh, 'TICKER_MANAGERS', dict(quotes=RemoteManager, dividends=ScratchManager))
+    index = pd.bdate_range('2018-01-01', periods=250)
+    for spec in [(None, 'securities_info'), ('quotes', 'AKRN'), ('quotes', 'GAZP'), ('dividends', 'GAZP')]:
+        DataFile(*spec).value = pd.Series(1.0, index=index)
+        catalog.record(*spec, dict(DataFile(*spec).metadata, last_update=OLD), 0)
+
+
+def test_iss_pages():
+    assert plan.iss_pages('quotes', 0, 'update') == 1
+    assert plan.iss_pages('quotes', 250, 'update') == 4
+    assert plan.iss_pages('quotes', 250, 'create') == 5
+    assert plan.iss_pages(plan.INDEX_NAME, 250, 'create') == 4
+    assert plan.iss_pages('securities_info', 1000, 'create') == 1
+    assert plan.iss_pages('cpi', 1000, 'create') == 0
+
+
+def test_plan_series():
+    df = plan.plan_series(priority=('GAZP',))
+    assert df.columns.tolist() == plan.SERIES_COLUMNS
+    assert list(zip(df['CATEGORY'], df['NAME'], df['ACTION'], df['ISS_PAGES'])) == [
+        (None, 'securities_info', 'update', 1),
+        (None, 'cpi', 'create', 0),
+        ('dividends', 'GAZP', 'update', 0),
+        ('quotes', 'GAZP', 'update', df['ISS_PAGES'].iloc[-1]),
+        ('quotes', 'AKRN', 'update', df['ISS_PAGES'].iloc[-1])]
+    assert df['ISS_PAGES'].iloc[-1] > 1
+    assert df['SECONDS'].isna().all()
+
+
+def test_plan_series_saved_not_in_catalog():
+    DataFile(None, 'cpi').value = pd.Series(1.0, index=pd.bdate_range('2018-01-01', periods=250))
+    catalog.remove(None, 'cpi')
+    df = plan.plan_series()
+    assert len(df) == 4
+    assert 'cpi' not in df['NAME'].tolist()
+
+
+def test_plan_series_offline(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_OFFLINE', True)
+    df = plan.plan_series()
+    assert df['ACTION'].tolist() == ['warn', 'create', 'warn', 'warn', 'warn']
+    assert df.loc[df['ACTION'] == 'warn', 'ISS_PAGES'].sum() == 0
+
+
+def test_seconds_estimates(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_TELEMETRY', True)
+    for seconds, action, error in [(1.0, 'update', None), (3.0, 'update', None), (10.0, 'create', None),
+                                   (100.0, 'update', 'ValueError: ошибка')]:
+        telemetry.write(dict(category='quotes', name='AKRN', action=action, seconds=seconds, error=error))
+    telemetry.write(dict(category='dividends', name='AKRN', action='create', seconds=10.0, error=None))
+    telemetry.write(dict(category=None, name='cpi', action='update', seconds=5.0, error=None))
+    df = plan.plan_series()
+    assert pd.isna(df['SECONDS'].iloc[0])
+    assert df['SECONDS'].iloc[1:].tolist() == [5.0, 10.0, 2.0, 2.0]
+
+
+def test_wall_time():
+    series = pd.DataFrame([(None, 'cpi', 'update', 0, 4.0), (None, 'index', 'update', 0, 2.0),
+                           ('quotes', 'AKRN', 'update', 1, 6.0), ('quotes', 'GAZP', 'update', 1, float('nan'))],
+                          columns=plan.SERIES_COLUMNS)
+    models = pd.DataFrame([('Mean', 'create', 'date', 3.0)], columns=plan.MODELS_COLUMNS)
+    assert plan.wall_time(series, models, workers=2) == 3.0 + 3.0 + 3.0
+    assert plan.wall_time(series, models, workers=1) == 6.0 + 6.0 + 3.0
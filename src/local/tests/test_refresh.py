@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import settings
+from local import refresh
+from utils import catalog
+from utils.data_file import DataFile
+
+OLD = time.time() - 7 * 24 * 60 * 60
+
+
+@pytest.fixture(name='calls')
+def make_managers(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_PATH', Path(tmp_path))
+    monkeypatch.setattr(settings, 'DATA_TTL', dict())
+    calls = []
+    lock = threading.Lock()
+
+    def make_manager(data_category):
+        def manager(data_name=None):
+            with lock:
+                calls.append((data_category, data_name, threading.current_thread().name))
+            if data_name == 'BROKEN':
+                raise ValueError('ошибка загрузки')
+        return manager
+
+    monkeypatch.setattr(refresh, 'ROOT_MANAGERS', dict(cpi=lambda: make_manager(None)('cpi'),
+                                                       securities_info=lambda: None))
+    monkeypatch.setattr(refresh, 'TICKER_MANAGERS', dict(quotes=make_manager('quotes'),
+                                                         dividends=make_manager('dividends')))
+    for spec in [(None, 'securities_info'), ('quotes', 'AKRN'), ('quotes', 'GAZP'), ('quotes', 'BROKEN'),
+                 ('dividends', 'GAZP'), ('quotes', 'FRESH'), ('unknown', 'AKRN')]:
+        DataFile(*spec).value = pd.Series([1.0])
+        if spec[1] != 'FRESH':
+            catalog.record(*spec, dict(DataFile(*spec).metadata, last_update=OLD), 0)
+    return calls
+
+
+def test_stale_specs(calls):
+    root, tickers = refresh.stale_specs(priority=('GAZP',))
+    assert root == [(None, 'securities_info'), (None, 'cpi')]
+    assert tickers == [('dividends', 'GAZP'), ('quotes', 'GAZP'), ('quotes', 'AKRN'), ('quotes', 'BROKEN')]
+
+
+def test_stale_specs_saved_root(calls):
+    DataFile(None, 'cpi').value = pd.Series([1.0])
+    catalog.remove(None, 'cpi')
+    catalog.mark_complete()
+    root, _ = refresh.stale_specs()
+    assert root == [(None, 'securities_info')]
+
+
+def test_stale_specs_partial_catalog(calls):
+    catalog.clear()
+    root, tickers = refresh.stale_specs(priority=('GAZP',))
+    assert root == [(None, 'cpi')]
+    assert tickers == []
+
+
+def test_refresh(calls):
+    report = refresh.refresh(priority=('GAZP',), workers=2)
+    assert report.columns.tolist() == refresh.COLUMNS
+    assert list(zip(report['CATEGORY'], report['NAME']))[:3] == [(None, 'securities_info'), (None, 'cpi'),
+                                                                 ('dividends', 'GAZP')]
+    assert len(report) == 6
+    assert (report['SECONDS'] >= 0).all()
+    errors = report.set_index('NAME')['ERROR'].dropna()
+    assert errors.to_dict() == dict(BROKEN='ValueError: ошибка загрузки')
+    assert calls[0][:2] == (None, 'cpi')
+    assert sorted(call[1] for call in calls[1:]) == ['AKRN', 'BROKEN', 'GAZP', 'GAZP']
+
+
+def test_refresh_async(calls, monkeypatch):
+    class FakeManager:
+        def __init__(self, data_name='cpi'):
+            self.data_name = data_name
+
+        async def refresh_async(self):
+            await asyncio.sleep(0)
+            calls.append(self.data_name)
+            if self.data_name == 'BROKEN':
+                raise ValueError('ошибка загрузки')
+
+    monkeypatch.setattr(refresh, 'ROOT_MANAGERS', dict(cpi=FakeManager, securities_info=FakeManager))
+    monkeypatch.setattr(refresh, 'TICKER_MANAGERS', dict(quotes=FakeManager, dividends=FakeManager))
+    report = refresh.run_async(refresh.refresh_async(priority=('GAZP',), limit=2))
+    assert list(zip(report['CATEGORY'], report['NAME']))[:3] == [(None, 'securities_info'), (None, 'cpi'),
+                                                                 ('dividends', 'GAZP')]
+    assert sorted(calls[:2]) == ['cpi', 'cpi']
+    assert sorted(calls[2:]) == ['AKRN', 'BROKEN', 'GAZP', 'GAZP']
+    assert report.set_index('NAME')['ERROR'].dropna().to_dict() == dict(BROKEN='ValueError: ошибка загрузки')
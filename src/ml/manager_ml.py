@@ -25,6 +25,8 @@ class MLDataManager(AbstractDataManager):
     is_unique = False
     is_monotonic = False
     update_from_scratch = True
+    # Модель обучается на локальных данных, поэтому обновляется и в автономном режиме
+    is_remote = False
 
     def __init__(self, positions: tuple, date: pd.Timestamp, model_class, file_name: str):
         self._positions = positions
@@ -39,13 +41,30 @@ class MLDataManager(AbstractDataManager):
         super().download_update()
 
     @property
-    def next_update(self):
-        """Время следующего планового обновления данных - arrow в часовом поясе MOEX"""
-        if self._positions != self.value.positions or self._date != self.value.date:
-            return arrow.now().shift(days=-1)
+    def retrain_reasons(self):
+        """Причины, по которым модель нужно обучить заново без учета расписания обновления
+
+        Returns
+        -------
+        list
+            Изменившиеся характеристики сохраненной модели - positions, date и params
+        """
+        reasons = []
+        if self._positions != self.value.positions:
+            reasons.append('positions')
+        if self._date != self.value.date:
+            reasons.append('date')
         model_params = self._model_class.PARAMS
         for outer_key in model_params:
             for inner_key in model_params[outer_key]:
                 if model_params[outer_key][inner_key] != self.value.params[outer_key][inner_key]:
-                    return arrow.now().shift(days=-1)
+                    reasons.append('params')
+                    return reasons
+        return reasons
+
+    @property
+    def next_update(self):
+        """Время следующего планового обновления данных - arrow в часовом поясе MOEX"""
+        if self.retrain_reasons:
+            return arrow.now().shift(days=-1)
         return super().next_update
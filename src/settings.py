@@ -11,6 +11,67 @@ pd.set_option('display.width', None)
 # Путь к данным - данные состоящие из нескольких серий хранятся в отдельных директориях внутри базовой директории
 DATA_PATH = Path(__file__).parents[1] / 'data'
 
+# Форматы хранения локальных данных по категориям - pickle (по умолчанию), feather или parquet
+# Для данных в корне глобальной директории данных категорией считается их название
+# После изменения формата существующие данные можно преобразовать с помощью utils.migrate
+DATA_FORMATS = dict(quotes='feather',
+                    quotes_t2='feather')
+
+# Сжатие локальных данных по категориям - gzip, bz2, lzma, lz4 или zstd (для двух последних нужны пакеты lz4 и
+# zstandard). По умолчанию без сжатия. Для выбора можно воспользоваться utils.storage_benchmark
+DATA_COMPRESSION = dict()
+
+# Категории данных, для которых новые строки при обновлении дописываются в отдельные файлы без перезаписи всей истории
+DATA_JOURNALS = ('quotes', 'quotes_t2', 'MCFTRR')
+
+# Категории данных, для которых при изменении существующих строк сохраняются снимки предыдущих значений для загрузки
+# данных на момент в прошлом
+DATA_SNAPSHOTS = ('quotes', 'quotes_t2', 'dividends')
+
+# Количество последних версий, которые хранятся в метаданных серии и ее снимков для загрузки данных на момент в
+# прошлом, - более ранние версии отбрасываются
+DATA_VERSIONS = 250
+
+# Категории данных, которые хранятся по календарным годам - обновление затрагивает только файл последнего года, а
+# загрузка диапазона дат - только файлы годов из диапазона
+DATA_PARTITIONS = ()
+
+# Категории данных, которые хранятся в компактном представлении - цены в float32, объемы в целых беззнаковых типах и
+# даты в виде номеров дней. При загрузке значения приводятся к исходным типам
+DATA_COMPACT_DTYPES = ()
+# Допустимая относительная ошибка при сохранении значений в float32 - колонки с большей ошибкой хранятся без изменений
+DATA_COMPACT_TOLERANCE = 1e-6
+
+# Холодное хранилище архивов с неиспользуемыми сериями данных, которые удалены из глобальной директории данных
+DATA_ARCHIVE_PATH = Path(__file__).parents[1] / 'archive'
+# Количество дней без обращений, после которого серия данных может быть перенесена в архив
+DATA_GC_DAYS = 90
+# Категории с копиями данных внешних сайтов, которые переносятся в архив только по давности обращений. Серии остальных
+# категорий дополнительно должны относиться к тикерам, которых нет среди торгуемых в securities_info
+DATA_GC_CACHES = ('dohod.ru', 'conomy', 'smart-lab')
+
+# Количество потоков для параллельного обновления локальных данных с помощью local.refresh
+DATA_REFRESH_WORKERS = 8
+# Количество серий, одновременно обновляемых в цикле событий в режиме --async, и размер пула потоков utils.blocking,
+# в котором асинхронные функции загрузки выполняют синхронные запросы
+DATA_ASYNC_REQUESTS = 32
+
+# Автономный режим - локальные данные не загружаются из интернета, а вместо обновления устаревших данных выдается
+# предупреждение utils.data_manager.StaleDataWarning. Если данных нет, то возникает ошибка
+DATA_OFFLINE = False
+# Сроки свежести данных в днях по категориям - по истечении срока данные обновляются. Данные категорий со сроком None
+# обновляются только по явному вызову update, а категорий без срока - после каждой торговой сессии MOEX
+DATA_TTL = dict(securities_info=7,
+                cpi=30,
+                dividends=None)
+
+# Запись телеметрии создания и обновления серий данных в глобальную директорию данных - сводка по последнему запуску
+# python -m utils.telemetry
+DATA_TELEMETRY = True
+
+# Бюджет памяти в байтах для общего кэша загруженных серий данных
+DATA_CACHE_BYTES = 512 * 2 ** 20
+
 # Путь к отчетам
 REPORTS_PATH = Path(__file__).parents[1] / 'reports'
 
@@ -0,0 +1,55 @@
+import datetime
+import threading
+from collections import OrderedDict
+
+import pytest
+
+import warmup
+
+
+@pytest.fixture(name='calls')
+def make_steps(monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def step(name):
+        def call(tickers, date):
+            release.wait(5)
+            calls.append((name, tickers, date, threading.current_thread().name))
+            if name == 'broken':
+                raise ValueError('ошибка загрузки')
+        return call
+
+    steps = OrderedDict((name, step(name)) for name in ['prices', 'broken', 'models'])
+    monkeypatch.setattr(warmup, 'STEPS', steps)
+    calls.append(release)
+    return calls
+
+
+def test_run(calls):
+    calls.pop().set()
+    report = warmup.WarmUp(dict(GAZP=1, AKRN=2), '2018-07-24').run()
+    assert report.columns.tolist() == warmup.COLUMNS
+    assert report['STEP'].tolist() == ['prices', 'broken', 'models']
+    assert report.set_index('STEP')['ERROR'].dropna().to_dict() == dict(broken='ValueError: ошибка загрузки')
+    assert (report['SECONDS'] >= 0).all()
+    assert [call[1:3] for call in calls] == [(('AKRN', 'GAZP'), datetime.date(2018, 7, 24))] * 3
+
+
+def test_no_models(calls):
+    calls.pop().set()
+    report = warmup.WarmUp(('GAZP',), '2018-07-24', models=False).run()
+    assert report['STEP'].tolist() == ['prices', 'broken']
+
+
+def test_start(calls):
+    release = calls.pop()
+    warm_up = warmup.WarmUp(('GAZP',), '2018-07-24')
+    assert not warm_up.done
+    assert warm_up.start().start() is warm_up
+    assert not warm_up.done
+    assert warm_up.wait(0.01).empty
+    release.set()
+    assert len(warm_up.wait()) == 3
+    assert warm_up.done
+    assert {call[3] for call in calls} == {'warm-up'}
@@ -0,0 +1,112 @@
+"""Атомарная запись файлов и блокировки для совместной работы нескольких процессов с директорией данных
+
+Файлы записываются во временный файл в той же директории, который затем переименовывается, поэтому читатели никогда
+не видят частично записанный файл. Для согласованного изменения нескольких файлов используются рекомендательные
+блокировки fcntl.flock: запись под исключительной блокировкой, чтение - под разделяемой. Блокировки повторно входимы
+внутри процесса. Разделяемая блокировка не повышается до исключительной: fcntl.flock меняет режим неатомарно, и
+между снятием разделяемой и захватом исключительной блокировки файлы может изменить другой процесс, поэтому
+прочитанное под разделяемой блокировкой состояние устарело бы. Код, который может изменить файлы, захватывает
+исключительную блокировку с самого начала. На платформах без fcntl блокировки действуют только между потоками одного
+процесса
+"""
+import contextlib
+import json
+import os
+import threading
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Расширение файлов блокировок
+LOCK_EXTENSION = '.lock'
+# Расширение временных файлов, которые переименовываются после записи
+TEMP_EXTENSION = '.tmp'
+
+
+def _temp_path(path: Path):
+    """Уникальный для процесса и потока временный файл рядом с заданным"""
+    return path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}{TEMP_EXTENSION}')
+
+
+def write_bytes(path: Path, data: bytes):
+    """Атомарно записывает байты в файл"""
+    temp_path = _temp_path(path)
+    try:
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+
+def write_json(path: Path, obj):
+    """Атомарно записывает объект в формате json"""
+    write_bytes(path, json.dumps(obj).encode())
+
+
+class _FileLock:
+    """Повторно входимая блокировка файла для потоков процесса и других процессов
+
+    Внутри исключительной блокировки можно захватывать разделяемую, но не наоборот
+    """
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+        self._is_exclusive = False
+
+    def acquire(self, shared: bool):
+        """Захватывает блокировку - исключительная блокировка внутри разделяемой вызывает RuntimeError"""
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self._path, 'a')
+            self._is_exclusive = not shared
+            if fcntl is not None:
+                fcntl.flock(self._file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        elif not shared and not self._is_exclusive:
+            self._thread_lock.release()
+            raise RuntimeError(f'Нельзя повысить разделяемую блокировку {self._path} до исключительной')
+        self._depth += 1
+
+    def release(self):
+        """Освобождает блокировку"""
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+
+_LOCKS = {}
+_LOCKS_GUARD = threading.Lock()
+
+
+@contextlib.contextmanager
+def lock(path: Path, shared: bool = False):
+    """Рекомендательная блокировка файла
+
+    Parameters
+    ----------
+    path
+        Путь к файлу блокировки - создается при необходимости
+    shared
+        Разделяемая блокировка для чтения или исключительная для записи
+    """
+    with _LOCKS_GUARD:
+        file_lock = _LOCKS.setdefault(str(path), _FileLock(path))
+    file_lock.acquire(shared)
+    try:
+        yield
+    finally:
+        file_lock.release()
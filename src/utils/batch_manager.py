@@ -0,0 +1,166 @@
+"""Пакетный менеджер данных одной категории для набора тикеров
+
+Отдельный менеджер данных при создании читает метаданные своей серии и проверяет ее свежесть, поэтому портфель из N
+тикеров стоит N открытий файлов еще до загрузки значений. Пакетный менеджер определяет отсутствующие и устаревшие серии
+одним запросом к каталогу данных, создает менеджеры только для них и обновляет их в пуле потоков, а сводную таблицу
+значений всех тикеров хранит в общем кэше серий до обновления любого из них
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import settings
+from utils import data_manager
+from utils import series_cache
+from utils.data_file import DataFile
+from utils.data_file import load_catalog
+
+# Поля каталога, которые меняются только при изменении содержимого серии
+VERSION_COLUMNS = ['HASH', 'SEGMENTS', 'ROWS', 'LAST']
+
+
+class BatchDataManager:
+    """Данные одной категории для набора тикеров
+
+    При создании отсутствующие и устаревшие серии создаются или обновляются менеджерами данных тикеров, если
+    обновление не отложено с помощью data_manager.deferred_refresh. Время обновления и версии серий соответствуют
+    каталогу данных на момент первого обращения к ним или последнего обновления серий менеджером
+
+    Parameters
+    ----------
+    manager_class
+        Класс менеджера данных, принимающий тикер в качестве единственного параметра
+    tickers
+        Кортеж тикеров
+    """
+
+    def __init__(self, manager_class, tickers: tuple):
+        if not tickers:
+            raise ValueError('Пустой набор тикеров')
+        self._manager_class = manager_class
+        self._tickers = tuple(tickers)
+        self._catalog = None
+        with data_manager.deferred_refresh():
+            self._data_category = manager_class(self._tickers[0]).data_category
+        if not data_manager.is_refresh_deferred():
+            self.refresh()
+
+    def __str__(self):
+        return (f'{self.__class__.__name__}(category={self._data_category}, '
+                f'tickers={len(self._tickers)})')
+
+    @property
+    def data_category(self):
+        """Категория данных"""
+        return self._data_category
+
+    @property
+    def tickers(self):
+        """Кортеж тикеров"""
+        return self._tickers
+
+    def _entries(self):
+        """Записи каталога для тикеров в порядке тикеров - для отсутствующих серий значения NaN
+
+        Записи загружаются одним запросом при первом обращении и после обновления серий. Сохраненные серии, которых
+        нет в каталоге, например скопированные в директорию данных вручную, регистрируются в нем
+        """
+        if self._catalog is None:
+            df = load_catalog(self._data_category, self._tickers).set_index('NAME')
+            if self._register(pd.Index(self._tickers).unique().difference(df.index)):
+                df = load_catalog(self._data_category, self._tickers).set_index('NAME')
+            self._catalog = df.reindex(index=pd.Index(self._tickers))
+        return self._catalog
+
+    def _register(self, tickers: pd.Index):
+        """Регистрирует в каталоге сохраненные серии тикеров и возвращает True, если такие серии были"""
+        registered = False
+        for ticker in tickers:
+            data = DataFile(self._data_category, ticker)
+            if data.metadata is not None:
+                data.register()
+                registered = True
+        return registered
+
+    @property
+    def last_updates(self):
+        """Время обновления серий тикеров - epoch или NaN, если серии нет"""
+        return self._entries()['LAST_UPDATE'].astype(float)
+
+    @property
+    def stale(self):
+        """Кортеж уникальных тикеров, серии которых отсутствуют или устарели по расписанию их категории"""
+        last_updates = self.last_updates
+        threshold = data_manager.stale_threshold(self._data_category)
+        is_stale = last_updates.isna()
+        if threshold is not None:
+            is_stale |= last_updates <= threshold
+        return tuple(last_updates.index[is_stale].unique())
+
+    def refresh(self):
+        """Создает или обновляет отсутствующие и устаревшие серии в пуле потоков
+
+        Дополнительные условия обновления, которые реализованы в менеджерах данных, проверяются только для
+        устаревших по расписанию серий
+
+        Returns
+        -------
+        tuple
+            Тикеры, менеджеры данных которых были созданы для обновления
+        """
+        stale = self.stale
+        if len(stale) == 1:
+            self._manager_class(stale[0])
+        elif stale:
+            workers = min(len(stale), settings.DATA_REFRESH_WORKERS)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(self._manager_class, stale))
+        if stale:
+            self._catalog = None
+        return stale
+
+    @property
+    def versions(self):
+        """Версии содержимого серий по данным каталога
+
+        Returns
+        -------
+        dict
+            Ключи - (категория, тикер), значения - хэш основного файла, количество сегментов и строк и последнее
+            значение индекса
+        """
+        df = self._entries()[VERSION_COLUMNS].astype(object)
+        df = df.where(df.notna(), None)
+        return {(self._data_category, ticker): tuple(row) for ticker, row in zip(df.index, df.itertuples(False))}
+
+    def frame(self, column=None):
+        """Сводная таблица значений серий тикеров
+
+        Результат хранится в общем кэше серий до изменения содержимого серии любого из тикеров и не должен изменяться
+        на месте
+
+        Parameters
+        ----------
+        column
+            Колонка данных тикеров, если данные являются DataFrame, - для данных в виде pd.Series None
+
+        Returns
+        -------
+        pd.DataFrame
+            В строках объединенный индекс данных тикеров, в столбцах тикеры
+        """
+        key = ('batch', str(settings.DATA_PATH), self._data_category, column, self._tickers)
+        version = tuple(self.versions.values())
+        df = series_cache.CACHE.get(key, version)
+        if df is not None:
+            return df
+        frames = []
+        for ticker in self._tickers:
+            value = DataFile(self._data_category, ticker).read(columns=None if column is None else [column])
+            if column is not None:
+                value = value[column]
+            frames.append(value)
+        df = pd.concat(frames, axis='columns')
+        df.columns = list(self._tickers)
+        series_cache.CACHE.put(key, version, df)
+        return df
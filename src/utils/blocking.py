@@ -0,0 +1,31 @@
+"""Пул потоков для блокирующих запросов в асинхронных вариантах загрузки данных
+
+Загрузка данных использует синхронный urllib, поэтому асинхронные варианты функций загрузки не выполняют асинхронных
+HTTP-запросов, а запускают синхронные запросы в общем для процесса пуле потоков. Размер пула задается явно
+settings.DATA_ASYNC_REQUESTS и не зависит от пула по умолчанию цикла событий, поэтому одновременно выполняется не больше
+запросов, чем задано в настройках, в любом цикле событий
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+from utils import telemetry
+
+_EXECUTOR = None
+_LOCK = threading.Lock()
+
+
+def executor():
+    """Общий пул потоков для блокирующих запросов - создается при первом обращении"""
+    global _EXECUTOR
+    with _LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=settings.DATA_ASYNC_REQUESTS, thread_name_prefix='blocking')
+        return _EXECUTOR
+
+
+async def run(func, *args):
+    """Выполняет блокирующую функцию в пуле потоков - измерения телеметрии относятся к текущей серии"""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(executor(), telemetry.bind(func), *args)
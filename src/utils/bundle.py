@@ -0,0 +1,199 @@
+"""Перенос локальных данных между компьютерами в виде единого архива
+
+Архив содержит файлы данных, сегменты, снимки и метаданные всех серий из каталога, который перед сохранением
+сверяется с директорией данных, а также описание с версией формата архива и хэшами всех файлов. При загрузке архив
+целиком распаковывается во временную директорию и проверяется, и только после этого серии по одной атомарно
+заменяются под блокировкой, а каталог обновляется:
+python -m utils.bundle export архив [категория ...]
+python -m utils.bundle import архив
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+from pathlib import PurePosixPath
+
+import settings
+from utils import compression
+from utils import verify
+from utils.data_file import DataFile
+from utils.data_file import reconcile_catalog
+from utils.data_file import yield_data_specs
+
+# Версия формата архива - архивы более новых версий не загружаются
+BUNDLE_VERSION = 1
+# Файл с описанием содержимого архива
+MANIFEST = 'manifest.json'
+# Режимы записи архива для поддерживаемых алгоритмов сжатия
+TAR_MODES = {None: 'w',
+             compression.GZIP: 'w:gz',
+             compression.BZ2: 'w:bz2',
+             compression.LZMA: 'w:xz'}
+# Уровень сжатия gzip - максимальный уровень в несколько раз медленнее при практически том же размере архива
+GZIP_LEVEL = 6
+
+
+def _add_bytes(tar: tarfile.TarFile, name: str, data: bytes):
+    """Добавляет в архив файл с заданным содержимым"""
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = time.time()
+    tar.addfile(info, io.BytesIO(data))
+
+
+def _archive_name(path: Path):
+    """Путь к файлу внутри архива относительно глобальной директории данных"""
+    return path.relative_to(settings.DATA_PATH).as_posix()
+
+
+def export_bundle(path, storage_keys=None, codec_name: str = compression.GZIP, specs=None):
+    """Сохраняет локальные данные в архив
+
+    Файлы каждой серии читаются под исключительной блокировкой, так как перечитывание метаданных может создать их
+    для данных, сохраненных до появления метаданных, поэтому попадают в архив в согласованном состоянии. Если
+    серии не заданы, то каталог сначала сверяется с директорией данных, поэтому в архив попадают и серии, которых в
+    нем не было
+
+    Parameters
+    ----------
+    path
+        Путь к архиву
+    storage_keys
+        Перечень категорий, которые нужно сохранить. Для данных в корне глобальной директории - их названия.
+        Если None, то сохраняются все данные
+    codec_name
+        Алгоритм сжатия архива - None, gzip, bz2 или lzma
+    specs
+        Пары (категория данных, название данных) для сохранения - по умолчанию все серии в директории данных
+
+    Returns
+    -------
+    dict
+        Описание содержимого архива
+    """
+    if codec_name not in TAR_MODES:
+        raise ValueError(f'Архив не поддерживает сжатие {codec_name}')
+    path = Path(path)
+    if specs is None:
+        reconcile_catalog()
+        specs = list(yield_data_specs())
+    series = []
+    temp_path = path.with_name(f'.{path.name}.tmp')
+    options = dict(compresslevel=GZIP_LEVEL) if codec_name == compression.GZIP else dict()
+    with tarfile.open(str(temp_path), TAR_MODES[codec_name], **options) as tar:
+        for data_category, data_name in specs:
+            data_file = DataFile(data_category, data_name)
+            if storage_keys is not None and data_file.storage_key not in storage_keys:
+                continue
+            files = []
+            with data_file.lock():
+                data_file.reload()
+                paths = [file_path for file_path, _ in data_file.files()] + [data_file.metadata_path]
+                for file_path in paths:
+                    data = file_path.read_bytes()
+                    name = _archive_name(file_path)
+                    _add_bytes(tar, name, data)
+                    files.append(dict(file=name, size=len(data), sha1=hashlib.sha1(data).hexdigest()))
+            series.append(dict(category=data_category,
+                               name=data_name,
+                               last_update=data_file.last_update,
+                               files=files))
+        manifest = dict(version=BUNDLE_VERSION, created=time.time(), series=series)
+        _add_bytes(tar, MANIFEST, json.dumps(manifest).encode())
+    os.replace(str(temp_path), str(path))
+    return manifest
+
+
+def _is_safe(name: str):
+    """Находится ли файл архива внутри директории распаковки"""
+    path = PurePosixPath(name)
+    return not path.is_absolute() and '..' not in path.parts
+
+
+def _extract(path: Path, folder: Path):
+    """Распаковывает архив и проверяет версию и хэши всех файлов из описания"""
+    with tarfile.open(str(path)) as tar:
+        for member in tar:
+            if not member.isfile() or not _is_safe(member.name):
+                raise ValueError(f'Недопустимый файл в архиве {member.name}')
+            target = folder / member.name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(tar.extractfile(member).read())
+    manifest_path = folder / MANIFEST
+    if not manifest_path.exists():
+        raise ValueError(f'В архиве {path} нет описания содержимого')
+    manifest = json.loads(manifest_path.read_text())
+    if manifest['version'] > BUNDLE_VERSION:
+        raise ValueError(f'Версия архива {manifest["version"]} новее поддерживаемой {BUNDLE_VERSION}')
+    for series in manifest['series']:
+        for file in series['files']:
+            file_path = folder / file['file']
+            if not file_path.exists() or hashlib.sha1(file_path.read_bytes()).hexdigest() != file['sha1']:
+                raise ValueError(f'Поврежден файл архива {file["file"]}')
+    return manifest
+
+
+def _install(folder: Path, series: dict):
+    """Атомарно заменяет файлы серии под блокировкой - метаданные заменяются последними"""
+    data_file = DataFile(series['category'], series['name'])
+    names = [file['file'] for file in series['files']]
+    new_paths = {settings.DATA_PATH / name for name in names}
+    with data_file.lock():
+        data_file.reload()
+        old_paths = [file_path for file_path, _ in data_file.files()]
+        for name in names:
+            target = settings.DATA_PATH / name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(str(folder / name), str(target))
+        for old_path in old_paths:
+            if old_path not in new_paths and old_path.exists():
+                old_path.unlink()
+        data_file.reload()
+        data_file.register()
+
+
+def import_bundle(path):
+    """Загружает локальные данные из архива
+
+    Архив распаковывается рядом с глобальной директорией данных и полностью проверяется до изменения данных. Серии
+    из архива заменяют существующие, остальные серии не изменяются. После загрузки серии проверяются по каталогу
+
+    Parameters
+    ----------
+    path
+        Путь к архиву
+
+    Returns
+    -------
+    list
+        Пары (категория данных, название данных) для загруженных серий
+    """
+    settings.DATA_PATH.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix='.bundle-', dir=str(settings.DATA_PATH.parent)) as folder:
+        manifest = _extract(Path(path), Path(folder))
+        for series in manifest['series']:
+            _install(Path(folder), series)
+    specs = [(series['category'], series['name']) for series in manifest['series']]
+    problems = [problem for problem in verify.verify() if problem[:2] in specs]
+    if problems:
+        raise ValueError(f'Загруженные данные не соответствуют каталогу: {problems}')
+    return specs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Перенос локальных данных в виде архива')
+    parser.add_argument('command', choices=['export', 'import'], help='сохранить данные в архив или загрузить')
+    parser.add_argument('path', help='путь к архиву')
+    parser.add_argument('storage_keys', nargs='*', help='категории данных для сохранения - по умолчанию все')
+    parser.add_argument('--compression', default=compression.GZIP, help='сжатие архива - gzip, bz2 или lzma')
+    args = parser.parse_args()
+    if args.command == 'export':
+        result = export_bundle(args.path, args.storage_keys or None, args.compression)
+        print(f'Сохранено серий данных - {len(result["series"])}')
+    else:
+        print(f'Загружено серий данных - {len(import_bundle(args.path))}')
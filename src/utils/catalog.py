@@ -0,0 +1,224 @@
+"""Каталог всех серий локальных данных в базе SQLite в глобальной директории данных
+
+Для каждой серии хранятся формат, сжатие, размер на диске, количество строк, границы индекса, время обновления и хэш
+содержимого. Запись в каталоге обновляется в отдельной транзакции при каждом изменении метаданных серии, поэтому
+перечень данных и их свежесть можно получить без обхода директорий и загрузки файлов
+Отдельно хранится время последней загрузки значения каждой серии, которое не сбрасывается при пересоздании каталога
+Запись об отдельной серии может появиться в каталоге раньше, чем он будет заполнен по всем сериям в директории данных,
+поэтому полнота каталога отмечается отдельно после его сверки с директорией данных
+"""
+import atexit
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+import settings
+
+# Файл каталога в глобальной директории данных
+CATALOG_FILE = 'catalog.db'
+# Время ожидания блокировки базы другим процессом в секундах
+TIMEOUT = 30
+COLUMNS = ('CATEGORY', 'NAME', 'FORMAT', 'COMPRESSION', 'SIZE', 'ROWS', 'FIRST', 'LAST', 'LAST_UPDATE', 'HASH',
+           'SEGMENTS', 'SNAPSHOTS')
+SCHEMA = ('CREATE TABLE IF NOT EXISTS series ('
+          'CATEGORY TEXT NOT NULL, NAME TEXT NOT NULL, FORMAT TEXT, COMPRESSION TEXT, SIZE INTEGER, ROWS INTEGER, '
+          'FIRST TEXT, LAST TEXT, LAST_UPDATE REAL, HASH TEXT, SEGMENTS INTEGER, SNAPSHOTS INTEGER, '
+          'PRIMARY KEY (CATEGORY, NAME))')
+ACCESS_SCHEMA = ('CREATE TABLE IF NOT EXISTS access ('
+                 'CATEGORY TEXT NOT NULL, NAME TEXT NOT NULL, LAST_ACCESS REAL, PRIMARY KEY (CATEGORY, NAME))')
+STATE_SCHEMA = 'CREATE TABLE IF NOT EXISTS state (KEY TEXT NOT NULL PRIMARY KEY, VALUE TEXT)'
+# Ключ отметки о том, что в каталоге есть все серии директории данных
+COMPLETE_KEY = 'complete'
+# Время загрузки серий, которое еще не записано в каталог, по директориям данных
+_PENDING_ACCESS = dict()
+_ACCESS_LOCK = threading.Lock()
+
+
+def path(data_path=None):
+    """Путь к файлу каталога в директории данных - по умолчанию в глобальной"""
+    return (data_path or settings.DATA_PATH) / CATALOG_FILE
+
+
+def exists(data_path=None):
+    """Создан ли каталог"""
+    return path(data_path).exists()
+
+
+def _connect(data_path=None):
+    """Соединение с базой каталога - база и таблица создаются при необходимости"""
+    (data_path or settings.DATA_PATH).mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(str(path(data_path)), timeout=TIMEOUT)
+    connection.execute(SCHEMA)
+    connection.execute(ACCESS_SCHEMA)
+    connection.execute(STATE_SCHEMA)
+    return connection
+
+
+def _category_key(data_category):
+    """Данные в корне глобальной директории хранятся с пустой категорией"""
+    return data_category or ''
+
+
+def record(data_category, data_name: str, metadata: dict, size: int, data_path=None):
+    """Сохраняет в каталоге описание серии данных
+
+    Parameters
+    ----------
+    data_category
+        Категория данных - None для данных в корне глобальной директории
+    data_name
+        Название серии данных
+    metadata
+        Метаданные серии из DataFile
+    size
+        Суммарный размер файлов серии в байтах
+    data_path
+        Директория данных - по умолчанию глобальная
+    """
+    row = (_category_key(data_category), data_name, metadata['format'], metadata.get('compression'), size,
+           metadata['rows'], _bound(metadata['first']), _bound(metadata['last']), metadata['last_update'],
+           metadata['hash'], len(metadata.get('segments', [])), len(metadata.get('snapshots', [])))
+    connection = _connect(data_path)
+    try:
+        with connection:
+            connection.execute(f'INSERT OR REPLACE INTO series VALUES ({", ".join("?" * len(COLUMNS))})', row)
+    finally:
+        connection.close()
+
+
+def _bound(value):
+    """Граница индекса в виде строки"""
+    if value is None:
+        return None
+    return str(value)
+
+
+def touch(data_category, data_name: str, last_access: float = None):
+    """Запоминает время загрузки значения серии данных - по умолчанию текущее
+
+    Время накапливается в памяти и записывается в каталог одной транзакцией перед чтением каталога или при
+    завершении процесса, чтобы не замедлять загрузку данных
+    """
+    with _ACCESS_LOCK:
+        pending = _PENDING_ACCESS.setdefault(settings.DATA_PATH, dict())
+        pending[(_category_key(data_category), data_name)] = last_access or time.time()
+
+
+def flush_access():
+    """Записывает в каталоги накопленное время загрузки серий данных"""
+    with _ACCESS_LOCK:
+        pending_access = list(_PENDING_ACCESS.items())
+        _PENDING_ACCESS.clear()
+    for data_path, pending in pending_access:
+        if not data_path.exists():
+            continue
+        connection = _connect(data_path)
+        try:
+            with connection:
+                connection.executemany('INSERT OR REPLACE INTO access VALUES (?, ?, ?)',
+                                       [key + (last_access,) for key, last_access in pending.items()])
+        finally:
+            connection.close()
+
+
+atexit.register(flush_access)
+
+
+def remove(data_category, data_name: str, data_path=None):
+    """Удаляет серию данных и время ее загрузки из каталога"""
+    with _ACCESS_LOCK:
+        pending = _PENDING_ACCESS.get(data_path or settings.DATA_PATH, dict())
+        pending.pop((_category_key(data_category), data_name), None)
+    connection = _connect(data_path)
+    try:
+        with connection:
+            for table in ('series', 'access'):
+                connection.execute(f'DELETE FROM {table} WHERE CATEGORY = ? AND NAME = ?',
+                                   (_category_key(data_category), data_name))
+    finally:
+        connection.close()
+
+
+def clear():
+    """Удаляет все записи каталога и отметку о его полноте - время загрузки серий сохраняется"""
+    connection = _connect()
+    try:
+        with connection:
+            connection.execute('DELETE FROM series')
+            connection.execute('DELETE FROM state WHERE KEY = ?', (COMPLETE_KEY,))
+    finally:
+        connection.close()
+
+
+def is_complete(data_path=None):
+    """Есть ли в каталоге все серии директории данных - False, пока каталог не сверен с директорией"""
+    if not exists(data_path):
+        return False
+    connection = _connect(data_path)
+    try:
+        row = connection.execute('SELECT VALUE FROM state WHERE KEY = ?', (COMPLETE_KEY,)).fetchone()
+    finally:
+        connection.close()
+    return row is not None
+
+
+def mark_complete(data_path=None):
+    """Отмечает, что в каталоге есть все серии директории данных"""
+    connection = _connect(data_path)
+    try:
+        with connection:
+            connection.execute('INSERT OR REPLACE INTO state VALUES (?, ?)', (COMPLETE_KEY, str(time.time())))
+    finally:
+        connection.close()
+
+
+def entries(data_category=None, where: str = None, params: tuple = (), data_path=None):
+    """Записи каталога
+
+    Parameters
+    ----------
+    data_category
+        Категория данных - если None, то записи всех категорий
+    where
+        Дополнительное условие отбора на языке SQL с параметрами в виде ?, например 'LAST_UPDATE < ?'
+    params
+        Значения параметров условия отбора
+    data_path
+        Директория данных - по умолчанию глобальная
+
+    Returns
+    -------
+    pd.DataFrame
+        В строках серии данных, отсортированные по категории и названию, в столбцах COLUMNS и время последней
+        загрузки значения LAST_ACCESS. Для данных в корне глобальной директории категория None
+    """
+    flush_access()
+    conditions = []
+    if data_category is not None:
+        conditions.append('CATEGORY = ?')
+        params = (data_category,) + tuple(params)
+    if where is not None:
+        conditions.append(f'({where})')
+    query = 'SELECT series.*, access.LAST_ACCESS FROM series LEFT JOIN access USING (CATEGORY, NAME)'
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY CATEGORY, NAME'
+    connection = _connect(data_path)
+    try:
+        rows = connection.execute(query, params).fetchall()
+    finally:
+        connection.close()
+    df = pd.DataFrame(rows, columns=COLUMNS + ('LAST_ACCESS',))
+    df['CATEGORY'] = [category or None for category in df['CATEGORY']]
+    return df
+
+
+def specs(df: pd.DataFrame):
+    """Пары (категория данных, название данных) для записей каталога"""
+    return list(zip(df['CATEGORY'], df['NAME']))
+
+
+if __name__ == '__main__':
+    print(entries())
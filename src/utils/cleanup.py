@@ -0,0 +1,162 @@
+"""Перенос неиспользуемых серий данных в холодное хранилище и объединение сегментов
+
+Неиспользуемыми считаются серии, к которым давно не обращались, - копии данных внешних сайтов и данные тикеров,
+которых нет среди торгуемых в securities_info. Они сохраняются в сжатый архив в settings.DATA_ARCHIVE_PATH, который
+можно загрузить обратно с помощью utils.bundle, и удаляются из глобальной директории данных. Для оставшихся серий
+дописанные сегменты объединяются с основными данными:
+python -m utils.cleanup [--days дни] [--dry-run]
+"""
+import argparse
+import time
+
+import settings
+from utils import bundle
+from utils import catalog
+from utils import compression
+from utils.data_file import DataFile
+from utils.data_file import load_catalog
+from utils.data_file import reconcile_catalog
+from utils.data_file import walk_data_specs
+
+# Название серии с информацией о торгуемых тикерах
+SECURITIES_INFO = 'securities_info'
+# Количество секунд в сутках
+DAY = 24 * 60 * 60
+
+
+def traded_tickers():
+    """Тикеры из локальной версии securities_info без обновления данных - None, если данных нет"""
+    value = DataFile(None, SECURITIES_INFO).value
+    if value is None:
+        return None
+    return set(value.index)
+
+
+def last_access(df):
+    """Время последнего обращения к сериям из записей каталога - epoch
+
+    Обращением считается загрузка значения или обновление данных. Время доступа к файлам не используется, так как
+    оно изменяется при проверке и переносе данных
+    """
+    return df['LAST_ACCESS'].fillna(0).combine(df['LAST_UPDATE'].fillna(0), max)
+
+
+def dead_specs(days: int = None, now: float = None):
+    """Серии данных, которые можно перенести в архив
+
+    Parameters
+    ----------
+    days
+        Количество дней без обращений - по умолчанию settings.DATA_GC_DAYS
+    now
+        Текущий момент времени - epoch
+
+    Returns
+    -------
+    list
+        Пары (категория данных, название данных). Данные в корне глобальной директории, кроме копий данных внешних
+        сайтов, не переносятся. Если нет локальной версии securities_info, то переносятся только копии данных
+        внешних сайтов
+    """
+    if days is None:
+        days = settings.DATA_GC_DAYS
+    threshold = (now or time.time()) - days * DAY
+    tickers = traded_tickers()
+    df = load_catalog()
+    specs = []
+    for data_category, data_name, access in zip(df['CATEGORY'], df['NAME'], last_access(df)):
+        is_cache = (data_category or data_name) in settings.DATA_GC_CACHES
+        is_delisted = data_category is not None and tickers is not None and data_name not in tickers
+        if (is_cache or is_delisted) and access < threshold:
+            specs.append((data_category, data_name))
+    return specs
+
+
+def _scan_time():
+    """Время обхода глобальной директории данных в секундах"""
+    start = time.perf_counter()
+    walk_data_specs()
+    return time.perf_counter() - start
+
+
+def _disk_size(specs: list):
+    """Суммарный размер файлов серий на диске в байтах - по файлам, а не по записям каталога"""
+    size = 0
+    for spec in specs:
+        size += sum(path.stat().st_size for path, _ in DataFile(*spec).files() if path.exists())
+    return size
+
+
+def _remove_folders(specs: list):
+    """Удаляет файлы блокировок серий и опустевшие директории тикеров"""
+    folders = set()
+    for data_category, data_name in specs:
+        data_file = DataFile(data_category, data_name)
+        if data_file.lock_path.exists():
+            data_file.lock_path.unlink()
+        if data_category is not None:
+            folders.add(settings.DATA_PATH / data_name)
+    for folder in folders:
+        if folder.exists() and not any(folder.iterdir()):
+            folder.rmdir()
+
+
+def collect(days: int = None, dry_run: bool = False):
+    """Переносит неиспользуемые серии в архив и объединяет сегменты оставшихся серий
+
+    Каталог сначала сверяется с директорией данных, поэтому серии, которых в нем нет, тоже проверяются. Освобожденное
+    место считается по размеру файлов на диске
+
+    Parameters
+    ----------
+    days
+        Количество дней без обращений - по умолчанию settings.DATA_GC_DAYS
+    dry_run
+        Только найти серии для переноса и объединения без изменения данных
+
+    Returns
+    -------
+    dict
+        Перенесенные в архив и объединенные серии, путь к архиву, освобожденное место в байтах и время обхода
+        директории данных до и после в секундах
+    """
+    scan_before = _scan_time()
+    reconcile_catalog()
+    df = load_catalog()
+    specs = catalog.specs(df)
+    dead = dead_specs(days)
+    journaled = [spec for spec, segments in zip(specs, df['SEGMENTS']) if segments and spec not in dead]
+    result = dict(archived=dead, compacted=journaled, archive=None, reclaimed=0,
+                  scan_before=scan_before, scan_after=scan_before)
+    if dry_run:
+        result['reclaimed'] = _disk_size(dead)
+        return result
+    total_before = _disk_size(dead + journaled)
+    if dead:
+        settings.DATA_ARCHIVE_PATH.mkdir(parents=True, exist_ok=True)
+        path = settings.DATA_ARCHIVE_PATH / f'archive-{time.strftime("%Y%m%d-%H%M%S")}.tar.xz'
+        bundle.export_bundle(path, codec_name=compression.LZMA, specs=dead)
+        for spec in dead:
+            DataFile(*spec).remove()
+        _remove_folders(dead)
+        result['archive'] = path
+    for spec in journaled:
+        DataFile(*spec).compact()
+    result['reclaimed'] = total_before - _disk_size(dead + journaled)
+    result['scan_after'] = _scan_time()
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Перенос неиспользуемых серий данных в архив')
+    parser.add_argument('--days', type=int, help='количество дней без обращений - по умолчанию из настроек')
+    parser.add_argument('--dry-run', action='store_true', help='только показать серии без изменения данных')
+    args = parser.parse_args()
+    report = collect(args.days, args.dry_run)
+    for data_category, data_name in report['archived']:
+        print(f'{data_category} -> {data_name}')
+    print(f'Перенесено в архив серий - {len(report["archived"])}\n'
+          f'Архив - {report["archive"]}\n'
+          f'Объединены сегменты серий - {len(report["compacted"])}\n'
+          f'Освобождено байт - {report["reclaimed"]}\n'
+          f'Время обхода директории данных - {report["scan_before"]:.3f} с до и {report["scan_after"]:.3f} с после')
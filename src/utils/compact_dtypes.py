@@ -0,0 +1,204 @@
+"""Компактное представление числовых данных для хранения
+
+Цены сохраняются в float32, если относительная ошибка не превышает допустимую, целые неотрицательные значения, например
+объемы, - в uint32 или uint64, а индекс из дат без времени - в виде номеров дней в int32. Исходные типы запоминаются,
+поэтому при загрузке значения приводятся к ним обратно. Отчет о максимальной ошибке для сохраненных данных:
+python -m utils.compact_dtypes [категория ...]
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import settings
+from utils import data_file as data_files
+
+# Название колонки, в которой хранится pd.Series
+SERIES_KEY = '__series__'
+# Название колонки с номерами дней, которая заменяет индекс из дат
+DAYS_COLUMN = '__days__'
+# Признак индекса, сохраненного в виде номеров дней
+DAYS_INDEX = 'days'
+UINT32_MAX = np.iinfo(np.uint32).max
+INT32_MIN, INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+# Максимальное целое число, которое точно представимо в float64
+FLOAT_INTEGER_MAX = 2 ** 53
+
+
+def _compact_array(values: np.ndarray, tolerance: float):
+    """Компактное представление массива и относительная ошибка преобразования
+
+    Returns
+    -------
+    tuple
+        Массив в компактном типе или исходный, если компактного представления нет, и максимальная относительная ошибка
+    """
+    kind = values.dtype.kind
+    if kind not in 'fiu' or values.dtype.itemsize <= 4 or not len(values):
+        return values, 0.0
+    is_integral = kind in 'iu' or (np.isfinite(values).all() and (np.mod(values, 1) == 0).all())
+    if is_integral and values.min() >= 0 and values.max() <= FLOAT_INTEGER_MAX:
+        return values.astype(np.uint32 if values.max() <= UINT32_MAX else np.uint64), 0.0
+    if kind == 'i':
+        if INT32_MIN <= values.min() and values.max() <= INT32_MAX:
+            return values.astype(np.int32), 0.0
+        return values, 0.0
+    if kind == 'u':
+        return values, 0.0
+    with np.errstate(over='ignore', invalid='ignore'):
+        compact = values.astype(np.float32)
+        nonzero = values != 0
+        errors = np.abs(compact[nonzero].astype(np.float64) / values[nonzero] - 1)
+    errors = errors[~np.isnan(errors)]
+    error = float(errors.max()) if len(errors) else 0.0
+    if error > tolerance:
+        return values, error
+    return compact, error
+
+
+def _is_days(index: pd.Index):
+    """Состоит ли индекс из дат без времени и часового пояса"""
+    return (isinstance(index, pd.DatetimeIndex) and index.tz is None and len(index) > 0
+            and not index.hasnans and (index == index.normalize()).all())
+
+
+def compact(value, tolerance: float = None):
+    """Преобразует pd.Series или pd.DataFrame в компактное представление
+
+    Индекс из дат без времени заменяется колонкой DAYS_COLUMN с номерами дней, а pd.Series при этом превращается в
+    pd.DataFrame с колонкой SERIES_KEY
+
+    Parameters
+    ----------
+    value
+        Значение для преобразования - значения других типов не преобразуются
+    tolerance
+        Допустимая относительная ошибка для преобразования в float32 - по умолчанию settings.DATA_COMPACT_TOLERANCE
+
+    Returns
+    -------
+    tuple
+        Компактное значение и описание преобразования для восстановления - вид и название значения, исходные типы,
+        тип и название индекса и максимальная ошибка. Если значение не преобразовывалось, то описание None
+    """
+    if not isinstance(value, (pd.Series, pd.DataFrame)):
+        return value, None
+    if tolerance is None:
+        tolerance = settings.DATA_COMPACT_TOLERANCE
+    is_series = isinstance(value, pd.Series)
+    frame = value.to_frame(SERIES_KEY) if is_series else value
+    dtypes = dict()
+    max_error = 0.0
+    columns = dict()
+    for column in frame.columns:
+        array, error = _compact_array(frame[column].values, tolerance)
+        if array.dtype != frame[column].dtype:
+            dtypes[column] = str(frame[column].dtype)
+            max_error = max(max_error, error)
+        columns[column] = array
+    index_type = DAYS_INDEX if _is_days(value.index) else None
+    if not dtypes and index_type is None:
+        return value, None
+    info = dict(kind='series' if is_series else 'frame',
+                name=value.name if is_series else None,
+                dtypes=dtypes,
+                index=index_type,
+                index_name=value.index.name,
+                max_error=max_error)
+    if index_type == DAYS_INDEX:
+        columns[DAYS_COLUMN] = value.index.values.astype('datetime64[D]').astype(np.int32)
+        return pd.DataFrame(columns, columns=list(frame.columns) + [DAYS_COLUMN]), info
+    if is_series:
+        return pd.Series(columns[SERIES_KEY], index=value.index, name=value.name), info
+    return pd.DataFrame(columns, index=value.index, columns=frame.columns), info
+
+
+def columns_to_read(info, columns):
+    """Колонки, которые нужно загрузить из компактного представления для получения заданных колонок"""
+    if info is None or columns is None:
+        return columns
+    if info['kind'] == 'series':
+        return None
+    if info['index'] == DAYS_INDEX:
+        return list(columns) + [DAYS_COLUMN]
+    return columns
+
+
+def restore(value, info):
+    """Восстанавливает исходные типы значения в компактном представлении
+
+    Parameters
+    ----------
+    value
+        Значение в компактном представлении, возможно только с частью колонок
+    info
+        Описание преобразования, полученное из compact, или None, если значение не преобразовывалось
+    """
+    if info is None:
+        return value
+    dtypes = info['dtypes']
+    if isinstance(value, pd.Series):
+        return value.astype(dtypes[SERIES_KEY]) if SERIES_KEY in dtypes else value
+    index = value.index
+    if info['index'] == DAYS_INDEX:
+        index = pd.DatetimeIndex(value[DAYS_COLUMN].values.astype('datetime64[D]'), name=info['index_name'])
+    columns = [column for column in value.columns if column != DAYS_COLUMN]
+    arrays = dict()
+    for column in columns:
+        array = value[column].values
+        arrays[column] = array.astype(dtypes[column]) if column in dtypes else array
+    if info['kind'] == 'series':
+        return pd.Series(arrays[SERIES_KEY], index=index, name=info['name'])
+    return pd.DataFrame(arrays, index=index, columns=columns)
+
+
+def report(storage_keys=('quotes', 'quotes_t2'), tolerance: float = None):
+    """Отчет о компактном представлении сохраненных данных без их изменения
+
+    Parameters
+    ----------
+    storage_keys
+        Категории данных. Для данных в корне глобальной директории - их названия
+    tolerance
+        Допустимая относительная ошибка для преобразования в float32 - по умолчанию settings.DATA_COMPACT_TOLERANCE
+
+    Returns
+    -------
+    pd.DataFrame
+        В строках категории, в столбцах количество серий, максимальная относительная ошибка, объем памяти в исходном и
+        компактном представлении в килобайтах и их отношение
+    """
+    rows = dict()
+    df = data_files.load_catalog()
+    for data_category, data_name in zip(df['CATEGORY'], df['NAME']):
+        data_file = data_files.DataFile(data_category, data_name)
+        if data_file.storage_key not in storage_keys:
+            continue
+        value = data_file.value
+        compact_value, info = compact(value, tolerance)
+        row = rows.setdefault(data_file.storage_key, dict(SERIES=0, MAX_ERROR=0.0, SIZE_KB=0.0, COMPACT_KB=0.0))
+        row['SERIES'] += 1
+        if info is not None:
+            row['MAX_ERROR'] = max(row['MAX_ERROR'], info['max_error'])
+        row['SIZE_KB'] += _memory(value) / 1024
+        row['COMPACT_KB'] += _memory(compact_value) / 1024
+    result = pd.DataFrame.from_dict(rows, orient='index', columns=['SERIES', 'MAX_ERROR', 'SIZE_KB', 'COMPACT_KB'])
+    result['RATIO'] = result['COMPACT_KB'] / result['SIZE_KB']
+    return result
+
+
+def _memory(value):
+    """Объем памяти значения вместе с индексом в байтах"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True))
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Отчет о компактном представлении сохраненных данных')
+    parser.add_argument('storage_keys', nargs='*', help='категории данных - по умолчанию котировки')
+    parser.add_argument('--tolerance', type=float, help='допустимая относительная ошибка для float32')
+    args = parser.parse_args()
+    print(report(tuple(args.storage_keys) or ('quotes', 'quotes_t2'), args.tolerance))
@@ -0,0 +1,93 @@
+"""Алгоритмы сжатия файлов локальных данных
+
+gzip, bz2 и lzma входят в стандартную библиотеку, для lz4 и zstd необходимы пакеты lz4 и zstandard
+"""
+import bz2
+import functools
+import gzip
+import lzma
+
+try:
+    from lz4 import frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP = 'gzip'
+BZ2 = 'bz2'
+LZMA = 'lzma'
+LZ4 = 'lz4'
+ZSTD = 'zstd'
+
+
+class Codec:
+    """Алгоритм сжатия с расширением, которое добавляется к названию файла
+
+    Parameters
+    ----------
+    name
+        Название алгоритма или None для хранения без сжатия
+    extension
+        Расширение сжатого файла
+    compress
+        Функция сжатия байтов
+    decompress
+        Функция распаковки байтов
+    is_available
+        Установлены ли необходимые библиотеки
+    """
+
+    def __init__(self, name, extension: str, compress, decompress, is_available: bool = True):
+        self.name = name
+        self.extension = extension
+        self.compress = compress
+        self.decompress = decompress
+        self.is_available = is_available
+
+    def __str__(self):
+        return f'{self.__class__.__name__}(name={self.name})'
+
+
+def _same_bytes(data: bytes):
+    """Хранение без сжатия"""
+    return data
+
+
+def _zstd_compress(data: bytes):
+    return zstandard.ZstdCompressor().compress(data)
+
+
+def _zstd_decompress(data: bytes):
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+CODECS = {
+    None: Codec(None, '', _same_bytes, _same_bytes),
+    GZIP: Codec(GZIP, '.gz', functools.partial(gzip.compress, compresslevel=6), gzip.decompress),
+    BZ2: Codec(BZ2, '.bz2', bz2.compress, bz2.decompress),
+    LZMA: Codec(LZMA, '.xz', lzma.compress, lzma.decompress),
+    LZ4: Codec(LZ4, '.lz4',
+               lz4_frame and lz4_frame.compress, lz4_frame and lz4_frame.decompress,
+               lz4_frame is not None),
+    ZSTD: Codec(ZSTD, '.zst', _zstd_compress, _zstd_decompress, zstandard is not None),
+}
+
+
+def get_codec(name):
+    """Возвращает алгоритм сжатия по названию и проверяет наличие необходимых библиотек"""
+    try:
+        codec = CODECS[name]
+    except KeyError:
+        raise ValueError(f'Неизвестный алгоритм сжатия {name}')
+    if not codec.is_available:
+        raise ImportError(f'Для алгоритма сжатия {name} необходимо установить дополнительный пакет')
+    return codec
+
+
+def available_codecs():
+    """Алгоритмы сжатия, для которых установлены необходимые библиотеки, включая хранение без сжатия"""
+    return [codec for codec in CODECS.values() if codec.is_available]
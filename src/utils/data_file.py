@@ -1,12 +1,170 @@
 """Хранение локальных данных"""
+import hashlib
+import json
+import time
 
-import pickle
+import numpy as np
+import pandas as pd
 
 import settings
+from utils import atomic
+from utils import catalog
+from utils import compact_dtypes
+from utils import compression
+from utils import data_formats
+from utils import series_cache
 from utils.data import Data
 
-PICKLE_VERSION = pickle.HIGHEST_PROTOCOL
-DATA_FILE_EXTENSION = f'.pickle{PICKLE_VERSION}'
+# Расширение файла с метаданными, который хранится рядом с файлом данных
+METADATA_EXTENSION = '.meta.json'
+# Метка в названии файлов с дописанными к основным данным строками
+SEGMENT_MARKER = '.delta-'
+# Количество дописанных сегментов, после которого они объединяются с основными данными
+MAX_SEGMENTS = 20
+# Метка в названии файлов со снимками предыдущих значений данных
+SNAPSHOT_MARKER = '.snapshot-'
+# Метка в названии файлов с данными за отдельный календарный год
+PARTITION_MARKER = '.year-'
+# Множители для смешивания хэшей строк с их номерами в хэше содержимого
+ROW_MIX = np.uint64(0x9E3779B97F4A7C15)
+ROW_MULTIPLIER = np.uint64(0xBF58476D1CE4E5B9)
+# Модуль суммы хэшей строк
+DIGEST_MODULUS = 2 ** 64
+
+
+def index_bound(value):
+    """Преобразует значение индекса в формат, пригодный для хранения в json"""
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return str(value)
+
+
+def encode(data_format, codec, data: Data):
+    """Сериализует объект Data в заданном формате и сжимает"""
+    return codec.compress(data_format.dumps(data))
+
+
+def decode_file(path, data_format, codec, columns=None):
+    """Загружает объект Data из файла в заданном формате и с заданным сжатием
+
+    Файлы без сжатия загружаются напрямую, что позволяет колоночным форматам отображать их в память
+    """
+    if codec.name is None:
+        return data_format.load(path, columns)
+    return data_format.loads(codec.decompress(path.read_bytes()), columns)
+
+
+def decode_value(path, data_format, codec, info=None, columns=None):
+    """Загружает значение из файла и восстанавливает исходные типы, если оно хранится в компактном представлении
+
+    Parameters
+    ----------
+    info
+        Описание компактного представления из метаданных файла или None, если значение хранится без изменений
+    """
+    value = decode_file(path, data_format, codec, compact_dtypes.columns_to_read(info, columns)).value
+    return compact_dtypes.restore(value, info)
+
+
+def is_prefix(old_value, new_value):
+    """Являются ли старые данные начальными строками новых"""
+    if old_value is new_value:
+        return True
+    if not isinstance(new_value, (pd.Series, pd.DataFrame)) or type(old_value) is not type(new_value):
+        return False
+    if len(old_value) > len(new_value):
+        return False
+    return new_value.iloc[:len(old_value)].equals(old_value)
+
+
+def content_digest(value, start: int = 0):
+    """Хэш содержимого строк значения, который можно наращивать при дописывании строк
+
+    Хэши строк вместе с индексом смешиваются с номерами строк, начиная с start, и суммируются по модулю 2 ** 64,
+    поэтому хэш значения равен сумме по модулю хэша начальных строк и хэша дописанных строк, посчитанного с номера
+    первой дописанной строки
+
+    Returns
+    -------
+    int or None
+        Хэш содержимого или None для значений, которые не являются pd.Series или pd.DataFrame
+    """
+    if not isinstance(value, (pd.Series, pd.DataFrame)):
+        return None
+    hashes = pd.util.hash_pandas_object(value, index=True).to_numpy(dtype=np.uint64)
+    positions = np.arange(start, start + len(hashes), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        return int(((hashes ^ (positions * ROW_MIX)) * ROW_MULTIPLIER).sum(dtype=np.uint64))
+
+
+def appended_digest(metadata: dict, value):
+    """Хэш содержимого после дописывания строк к данным с заданными метаданными - None, если его нельзя посчитать"""
+    tail = content_digest(value, metadata['rows'] or 0)
+    if metadata.get('content') is None or tail is None:
+        return None
+    return (metadata['content'] + tail) % DIGEST_MODULUS
+
+
+def add_version(versions: list, version: list):
+    """Добавляет версию, если она отличается от последней, и оставляет settings.DATA_VERSIONS последних версий"""
+    if not versions or versions[-1] != version:
+        versions = versions + [version]
+    return versions[-settings.DATA_VERSIONS:]
+
+
+def split_years(value):
+    """Разбивает значение с упорядоченным индексом из дат на части по календарным годам
+
+    Returns
+    -------
+    list or None
+        Пары (год, часть значения) по возрастанию лет. Для значений, которые нельзя разбить по годам, - None
+    """
+    if not isinstance(value, (pd.Series, pd.DataFrame)) or not isinstance(value.index, pd.DatetimeIndex):
+        return None
+    if not len(value) or not value.index.is_monotonic_increasing:
+        return None
+    years = value.index.year
+    return [(int(year), value[years == year]) for year in years.unique()]
+
+
+def make_metadata(data_format, codec, data: Data, data_bytes: bytes):
+    """Формирует словарь с метаданными для сохраненного объекта Data
+
+    Parameters
+    ----------
+    data_format
+        Формат, в котором сохранены данные
+    codec
+        Алгоритм сжатия, которым сжаты данные
+    data
+        Сохраненный объект Data
+    data_bytes
+        Сохраненные байты, для которых рассчитывается хэш
+
+    Returns
+    -------
+    dict
+        Формат, сжатие, время обновления, количество строк, первое и последнее значение индекса и хэш содержимого
+    """
+    value = data.value
+    rows, first, last = None, None, None
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        rows = len(value)
+        if rows:
+            first, last = index_bound(value.index[0]), index_bound(value.index[-1])
+    return dict(format=data_format.name,
+                compression=codec.name,
+                last_update=data.last_update,
+                rows=rows,
+                first=first,
+                last=last,
+                hash=hashlib.sha1(data_bytes).hexdigest(),
+                segments=[])
 
 
 class DataFile:
@@ -14,7 +172,26 @@ class DataFile:
 
     Данные хранятся в каталоге установленном в глобальных настройках
     Каждая наименование данных в отдельной подкаталоге
-    Каждый категория данных в отдельном файле в формате Pickle
+    Каждый категория данных в отдельном файле в формате и со сжатием, установленными для категории в глобальных
+    настройках
+    Рядом с файлом данных хранятся метаданные в формате json, поэтому при создании объекта загружаются только они,
+    а значение загружается при первом обращении к нему. Колоночные форматы позволяют загрузить только часть колонок
+    Для категорий с журналом новые строки дописываются в отдельные файлы-сегменты, которые при загрузке склеиваются с
+    основными данными и периодически объединяются с ними
+    Файлы записываются атомарно под исключительной блокировкой серии, а значение загружается под разделяемой
+    блокировкой по актуальным метаданным, поэтому несколько процессов могут безопасно работать с одной директорией
+    Загруженные значения хранятся в общем для процесса кэше series_cache.CACHE вместе с версией данных и обновляются
+    в нем при записи
+    При каждом изменении метаданных обновляется запись серии в каталоге данных utils.catalog
+    Для каждого обновления запоминается время и количество строк, поэтому пока данные только дописываются, любая
+    предыдущая версия является началом текущего значения. При перезаписи с изменением существующих строк для категорий
+    из settings.DATA_SNAPSHOTS предыдущее значение сохраняется в отдельный файл-снимок, что позволяет загрузить
+    данные на любой момент в прошлом
+    Для категорий из settings.DATA_PARTITIONS значения с индексом из дат хранятся по календарным годам - основной файл
+    содержит последний год, а предыдущие годы хранятся в отдельных файлах, которые перезаписываются только при
+    изменении. При загрузке диапазона дат файлы годов вне диапазона не читаются
+    Для категорий из settings.DATA_COMPACT_DTYPES значения хранятся в компактном представлении utils.compact_dtypes, а
+    при загрузке приводятся к исходным типам
     """
 
     def __init__(self, data_category, data_name: str):
@@ -29,17 +206,15 @@ class DataFile:
         """
         self._data_category = data_category
         self._data_name = data_name
-        if self.data_path.exists():
-            with open(self.data_path, 'rb') as data_file:
-                self._data = pickle.load(data_file)
-        else:
-            self._data = Data()
+        self._data = None
+        self._appended = []
+        self._metadata = self._load_metadata()
 
     def __str__(self):
         return (f'{self.__class__.__name__}('
                 f'data_category={self.data_category}, '
                 f'data_name={self.data_name}, '
-                f'data={self._data})')
+                f'data={self._loaded_data})')
 
     @property
     def data_category(self):
@@ -52,38 +227,873 @@ class DataFile:
         return self._data_name
 
     @property
-    def data_path(self):
-        """Возвращает путь к файлу и при необходимости создает необходимые директории
+    def storage_key(self):
+        """Ключ для настроек хранения - категория данных, а для данных в корне каталога их название"""
+        if self._data_category is None:
+            return self._data_name
+        return self._data_category
 
-        Директории создаются в глобальной директории данных из файла настроек
-        """
+    @property
+    def data_format(self):
+        """Формат хранения данных, установленный для категории в глобальных настройках"""
+        name = settings.DATA_FORMATS.get(self.storage_key, data_formats.PICKLE)
+        return data_formats.get_format(name)
+
+    @property
+    def codec(self):
+        """Алгоритм сжатия, установленный для категории в глобальных настройках"""
+        return compression.get_codec(settings.DATA_COMPRESSION.get(self.storage_key))
+
+    def _format_for(self, value):
+        """Формат из настроек, а если он не поддерживает значение - Pickle"""
+        data_format = self.data_format
+        if not data_format.is_supported(value):
+            data_format = data_formats.get_format(data_formats.PICKLE)
+        return data_format
+
+    def _folder(self):
+        """Директория с данными"""
         folder = settings.DATA_PATH
         if self._data_category is not None:
             folder = folder / self._data_name
-        if not folder.exists():
-            folder.mkdir(parents=True)
+        return folder
+
+    def _file_stem(self):
+        """Название файла без расширения"""
         if self._data_category:
-            file = f'{self._data_category}{DATA_FILE_EXTENSION}'
-        else:
-            file = f'{self._data_name}{DATA_FILE_EXTENSION}'
-        return folder / file
+            return self._data_category
+        return self._data_name
+
+    def _path(self, data_format, codec=compression.CODECS[None]):
+        """Путь к файлу в заданном формате и с заданным сжатием"""
+        return self._folder() / f'{self._file_stem()}{data_format.extension}{codec.extension}'
+
+    def _segment_path(self, number: int, data_format, codec):
+        """Путь к файлу сегмента с дописанными строками"""
+        file = f'{self._file_stem()}{SEGMENT_MARKER}{number:04d}{data_format.extension}{codec.extension}'
+        return self._folder() / file
+
+    @property
+    def _saved_path(self):
+        """Путь к файлу с сохраненными основными данными"""
+        return self._path(self._saved_format, self._saved_codec)
+
+    def _partition_path(self, year: int, data_format, codec):
+        """Путь к файлу с данными за год"""
+        file = f'{self._file_stem()}{PARTITION_MARKER}{year}{data_format.extension}{codec.extension}'
+        return self._folder() / file
+
+    def _saved_paths(self):
+        """Пути ко всем файлам с сохраненными данными - основными, годами и сегментами"""
+        if self._metadata is None:
+            return []
+        items = self._partitions + self._segments
+        return [self._saved_path] + [self._folder() / item['file'] for item in items]
+
+    @property
+    def is_journaled(self):
+        """Дописываются ли новые строки в отдельные сегменты"""
+        return self.storage_key in settings.DATA_JOURNALS
+
+    @property
+    def is_partitioned(self):
+        """Хранятся ли данные категории по календарным годам"""
+        return self.storage_key in settings.DATA_PARTITIONS
+
+    @property
+    def _partitions(self):
+        """Описание файлов с данными за предыдущие годы"""
+        if self._metadata is None:
+            return []
+        return self._metadata.get('partitions', [])
+
+    @property
+    def has_snapshots(self):
+        """Сохраняются ли снимки предыдущих значений при изменении существующих строк"""
+        return self.storage_key in settings.DATA_SNAPSHOTS
+
+    @property
+    def _versions(self):
+        """Время обновления и количество строк для версий, которые являются началом текущего значения"""
+        if self._metadata is None:
+            return []
+        return self._metadata.get('versions') or [[self._metadata['last_update'], self._metadata['rows']]]
+
+    @property
+    def _snapshots(self):
+        """Описание снимков предыдущих значений"""
+        if self._metadata is None:
+            return []
+        return self._metadata.get('snapshots', [])
+
+    @property
+    def versions(self):
+        """Время всех сохраненных версий данных по возрастанию - epoch"""
+        versions = [version for snapshot in self._snapshots for version in snapshot['versions']] + self._versions
+        return [last_update for last_update, _ in versions]
+
+    @property
+    def _segments(self):
+        """Описание сегментов с дописанными строками"""
+        if self._metadata is None:
+            return []
+        return self._metadata.get('segments', [])
+
+    @property
+    def metadata_path(self):
+        """Путь к файлу с метаданными"""
+        return self._folder() / f'{self._file_stem()}{METADATA_EXTENSION}'
+
+    @property
+    def lock_path(self):
+        """Путь к файлу блокировки серии данных"""
+        return self._folder() / f'{self._file_stem()}{atomic.LOCK_EXTENSION}'
+
+    def lock(self, shared: bool = False):
+        """Блокировка серии данных для согласованной работы нескольких процессов
+
+        Повторно входима внутри процесса, поэтому под ней можно вызывать методы записи
+
+        Parameters
+        ----------
+        shared
+            Разделяемая блокировка для чтения или исключительная для записи
+        """
+        return atomic.lock(self.lock_path, shared)
+
+    def _read_metadata(self):
+        """Читает файл с метаданными или None, если его нет"""
+        try:
+            with open(self.metadata_path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def _load_metadata(self):
+        """Загружает метаданные
+
+        Если файла с метаданными нет, но есть данные, сохраненные до появления метаданных, то данные загружаются и
+        метаданные для них создаются. Если данных нет, то None
+        """
+        metadata = self._read_metadata()
+        if metadata is not None or self._find_saved_format() is None:
+            return metadata
+        with self.lock():
+            metadata = self._read_metadata()
+            if metadata is not None:
+                return metadata
+            saved_format = self._find_saved_format()
+            path = self._path(saved_format)
+            self._data = saved_format.load(path)
+            metadata = make_metadata(saved_format, compression.CODECS[None], self._data, path.read_bytes())
+            self._save_metadata(metadata)
+        return metadata
+
+    def _refresh_metadata(self):
+        """Перечитывает метаданные с диска - если их изменил другой процесс, то загруженное значение сбрасывается"""
+        metadata = self._read_metadata()
+        if metadata != self._metadata:
+            self._metadata = metadata
+            self._data = None
+
+    def reload(self):
+        """Перечитывает метаданные с диска, а значение будет загружено заново при следующем обращении"""
+        self._metadata = self._load_metadata()
+        self._data = None
+
+    def _save_metadata(self, metadata: dict):
+        """Атомарно сохраняет метаданные и обновляет запись в каталоге данных"""
+        atomic.write_json(self.metadata_path, metadata)
+        catalog.record(self._data_category, self._data_name, metadata, self._disk_size(metadata))
+
+    def register(self):
+        """Обновляет запись серии в каталоге данных по сохраненным метаданным"""
+        if self._metadata is not None:
+            catalog.record(self._data_category, self._data_name, self._metadata, self._disk_size(self._metadata))
+
+    def _disk_size(self, metadata: dict):
+        """Суммарный размер основных данных, сегментов и снимков в байтах"""
+        return sum(path.stat().st_size for path, _ in self.files(metadata) if path.exists())
+
+    def files(self, metadata: dict = None):
+        """Пути и хэши всех файлов серии - основных данных, годов, сегментов и снимков"""
+        if metadata is None:
+            metadata = self._metadata
+        if metadata is None:
+            return []
+        data_format = data_formats.get_format(metadata['format'])
+        codec = compression.get_codec(metadata.get('compression'))
+        files = [(self._path(data_format, codec), metadata['hash'])]
+        for item in metadata.get('partitions', []) + metadata.get('segments', []) + metadata.get('snapshots', []):
+            files.append((self._folder() / item['file'], item['hash']))
+        return files
+
+    def _find_saved_format(self):
+        """Формат сохраненных без сжатия данных, для которых нет метаданных
+
+        В первую очередь проверяется формат из настроек, а потом остальные форматы, что позволяет прочитать данные,
+        сохраненные до изменения настроек. Если данных нет, то None
+        """
+        formats = [self.data_format] + [data_format for data_format in data_formats.FORMATS.values()
+                                        if data_format is not self.data_format]
+        for data_format in formats:
+            if self._path(data_format).exists():
+                return data_format
+        return None
+
+    @property
+    def _saved_format(self):
+        """Формат сохраненных данных или None, если данных нет"""
+        if self._metadata is None:
+            return None
+        return data_formats.get_format(self._metadata['format'])
+
+    @property
+    def _saved_codec(self):
+        """Алгоритм сжатия сохраненных данных"""
+        return compression.get_codec(self._metadata.get('compression'))
+
+    @property
+    def metadata(self):
+        """Метаданные сохраненных данных
+
+        Формат, сжатие, время обновления, количество строк, первое и последнее значение индекса, хэш содержимого и
+        описание дописанных сегментов. Если данных нет, то None
+        """
+        return self._metadata
+
+    @property
+    def data_path(self):
+        """Возвращает путь к файлу данных
+
+        Для сохраненных данных возвращается путь к существующему файлу, а для несохраненных - путь, по которому они
+        будут сохранены. Директории создаются только при записи данных
+        """
+        if self._metadata is None:
+            return self._path(self.data_format, self.codec)
+        return self._saved_path
+
+    def _load_value(self, columns=None, start=None, end=None):
+        """Загружает значение основных данных и склеивает его с данными за предыдущие годы и дописанными сегментами
+
+        Загрузка осуществляется под разделяемой блокировкой по перечитанным метаданным, поэтому файлы соответствуют
+        друг другу, даже если данные были изменены другим процессом после создания объекта. Файлы годов вне диапазона
+        от start до end не загружаются, поэтому значение может содержать лишние даты только из основного файла и
+        сегментов. Время загрузки запоминается в каталоге данных
+        """
+        with self.lock(shared=True):
+            self._metadata = self._read_metadata() or self._metadata
+            parts = [self._decode_item(partition, columns) for partition in self._partitions
+                     if _is_year_in_range(partition['year'], start, end)]
+            parts.append(decode_value(self._saved_path, self._saved_format, self._saved_codec,
+                                      self._metadata.get('compact'), columns))
+            parts.extend(self._decode_item(segment, columns) for segment in self._segments)
+        catalog.touch(self._data_category, self._data_name)
+        if len(parts) == 1:
+            return parts[0]
+        return pd.concat(parts)
+
+    def _decode_item(self, item: dict, columns=None):
+        """Загружает значение из дополнительного файла серии по его описанию в метаданных"""
+        data_format = data_formats.get_format(item['format'])
+        codec = compression.get_codec(item.get('compression'))
+        return decode_value(self._folder() / item['file'], data_format, codec, item.get('compact'), columns)
+
+    @property
+    def version(self):
+        """Версия содержимого сохраненных данных - меняется только при изменении файлов данных, но не при обновлении без
+        новых строк. Если данных нет, то None"""
+        if self._metadata is None:
+            return None
+        return self._cache_version
+
+    @property
+    def _cache_key(self):
+        """Ключ серии в кэше загруженных значений"""
+        return str(self.metadata_path)
+
+    @property
+    def _cache_version(self):
+        """Версия сохраненных данных - хэши основных данных, годов и сегментов"""
+        return (self._metadata['hash'],
+                tuple(partition['hash'] for partition in self._partitions),
+                tuple(segment['hash'] for segment in self._segments))
+
+    def _cached_value(self):
+        """Значение из кэша, если оно соответствует версии сохраненных данных, иначе None"""
+        return series_cache.CACHE.get(self._cache_key, self._cache_version)
+
+    def _cache(self, value):
+        """Сохраняет в кэше значение для текущей версии данных"""
+        series_cache.CACHE.put(self._cache_key, self._cache_version, value)
+
+    @property
+    def _loaded_data(self):
+        """Объект Data, который при необходимости загружается из кэша или с диска"""
+        if self._data is None:
+            self._appended = []
+            if self._metadata is None:
+                self._data = Data()
+            else:
+                value = self._cached_value()
+                if value is None:
+                    value = self._load_value()
+                    self._cache(value)
+                self._data = Data(value, self.last_update)
+        elif self._appended:
+            value = pd.concat([self._data.value] + self._appended)
+            self._appended = []
+            self._data = Data(value, self.last_update)
+            self._cache(value)
+        return self._data
 
     @property
     def value(self):
         """Возвращает сохраненное значение данных. Если сохраненного значения нет, то None"""
-        return self._data.value
+        return self._loaded_data.value
 
     @value.setter
     def value(self, value):
-        """Сохраняет новое значение данных"""
-        self._data.value = value
-        with open(self.data_path, 'wb') as data_file:
-            pickle.dump(self._data, data_file, protocol=PICKLE_VERSION)
+        """Сохраняет новое значение данных
+
+        Если формат из настроек не поддерживает значение, то используется Pickle
+        Файлы с предыдущей версией этих данных в других форматах удаляются
+        """
+        self._save(Data(value))
+
+    def _save(self, data: Data):
+        """Сохраняет объект Data и метаданные и удаляет файлы предыдущей версии данных и сегменты
+
+        Для категорий с хранением по годам в основной файл записывается последний год, а файлы предыдущих лет
+        перезаписываются, только если их содержимое изменилось
+        """
+        years = split_years(data.value) if self.is_partitioned else None
+        base = data if years is None else Data(years[-1][1], data.last_update)
+        data_format, codec, data_bytes, info = self._encode(base)
+        path = self._path(data_format, codec)
+        with self.lock():
+            self._refresh_metadata()
+            versions, snapshots = self._versions_after_save(data)
+            old_paths = self._saved_paths()
+            partitions = self._save_partitions(years[:-1]) if years else []
+            atomic.write_bytes(path, data_bytes)
+            self._metadata = make_metadata(data_format, codec, data, data_bytes)
+            if self.is_partitioned:
+                self._metadata['partitions'] = partitions
+            self._metadata['versions'] = versions
+            self._metadata['snapshots'] = snapshots
+            self._metadata['content'] = content_digest(data.value)
+            self._set_compact(self._metadata, info)
+            self._save_metadata(self._metadata)
+            new_paths = [path] + [self._folder() / partition['file'] for partition in partitions]
+            for old_path in old_paths:
+                if old_path not in new_paths and old_path.exists():
+                    old_path.unlink()
+        self._data = data
+        self._appended = []
+        self._cache(data.value)
+
+    def _encode(self, data: Data):
+        """Сериализует объект Data в формате и со сжатием из настроек
+
+        Для категорий из settings.DATA_COMPACT_DTYPES значение предварительно преобразуется в компактное представление
+
+        Returns
+        -------
+        tuple
+            Формат, алгоритм сжатия, сохраняемые байты и описание компактного представления или None
+        """
+        value, info = data.value, None
+        if self.is_compact:
+            value, info = compact_dtypes.compact(value)
+            data = Data(value, data.last_update)
+        data_format = self._format_for(value)
+        codec = self.codec
+        return data_format, codec, encode(data_format, codec, data), info
+
+    @property
+    def is_compact(self):
+        """Хранятся ли данные категории в компактном представлении"""
+        return self.storage_key in settings.DATA_COMPACT_DTYPES
+
+    def _set_compact(self, metadata: dict, info):
+        """Добавляет в метаданные файла описание компактного представления для категорий, которые его используют"""
+        if self.is_compact:
+            metadata['compact'] = info
+
+    def _save_partitions(self, years: list):
+        """Сохраняет данные за предыдущие годы и возвращает описание их файлов
+
+        Время обновления в файле года - последняя дата года, поэтому одинаковые данные всегда дают одинаковые байты, и
+        неизмененные годы не перезаписываются
+        """
+        saved = {partition['file']: partition['hash'] for partition in self._partitions}
+        partitions = []
+        for year, value in years:
+            data = Data(value, value.index[-1].timestamp())
+            data_format, codec, data_bytes, info = self._encode(data)
+            path = self._partition_path(year, data_format, codec)
+            partition = make_metadata(data_format, codec, data, data_bytes)
+            del partition['last_update'], partition['segments']
+            partition['file'] = path.name
+            partition['year'] = year
+            self._set_compact(partition, info)
+            if saved.get(path.name) != partition['hash'] or not path.exists():
+                atomic.write_bytes(path, data_bytes)
+            partitions.append(partition)
+        return partitions
+
+    def _versions_after_save(self, data: Data):
+        """Версии и снимки после сохранения нового значения
+
+        Если новое значение не является продолжением сохраненного, то история версий начинается заново, а для
+        категорий со снимками сохраненное значение записывается в файл-снимок. Хранится не больше
+        settings.DATA_VERSIONS последних версий
+        """
+        rows = len(data.value) if isinstance(data.value, (pd.Series, pd.DataFrame)) else None
+        version = [data.last_update, rows]
+        if self._metadata is None:
+            return [version], []
+        versions = self._versions
+        snapshots = self._snapshots
+        if not self._is_saved_prefix(data.value):
+            if self.has_snapshots:
+                old_value = self._loaded_data.value
+                snapshots = snapshots + [self._save_snapshot(old_value, versions, len(snapshots) + 1)]
+            versions = []
+        return add_version(versions, version), snapshots
+
+    def _is_saved_prefix(self, value):
+        """Являются ли сохраненные данные начальными строками нового значения
+
+        Сравниваются количество строк и хэш содержимого из метаданных, поэтому сохраненные данные не загружаются.
+        Сохраненные данные загружаются и сравниваются целиком, только если в метаданных нет хэша содержимого -
+        для данных, сохраненных до его появления, и значений, которые не являются pd.Series или pd.DataFrame
+        """
+        if self._metadata.get('content') is None:
+            return is_prefix(self._loaded_data.value, value)
+        rows = self._metadata['rows']
+        if not isinstance(value, (pd.Series, pd.DataFrame)) or rows > len(value):
+            return False
+        return content_digest(value.iloc[:rows]) == self._metadata['content']
+
+    def _snapshot_path(self, number: int, data_format, codec):
+        """Путь к файлу снимка предыдущего значения"""
+        file = f'{self._file_stem()}{SNAPSHOT_MARKER}{number:04d}{data_format.extension}{codec.extension}'
+        return self._folder() / file
+
+    def _save_snapshot(self, value, versions: list, number: int):
+        """Сохраняет предыдущее значение в файл-снимок и возвращает его описание"""
+        data_format, codec, data_bytes, info = self._encode(Data(value, versions[-1][0]))
+        path = self._snapshot_path(number, data_format, codec)
+        atomic.write_bytes(path, data_bytes)
+        snapshot = dict(file=path.name,
+                        format=data_format.name,
+                        compression=codec.name,
+                        hash=hashlib.sha1(data_bytes).hexdigest(),
+                        versions=versions)
+        self._set_compact(snapshot, info)
+        return snapshot
+
+    def append(self, value):
+        """Дописывает новые строки в конец сохраненных данных
+
+        Для категорий с журналом строки сохраняются в отдельный сегмент, а основные данные не перезаписываются. После
+        накопления MAX_SEGMENTS сегментов они объединяются с основными данными. Для категорий с хранением по годам
+        перезаписывается только основной файл с последним годом и добавляются файлы новых лет. Для остальных категорий
+        данные перезаписываются целиком. Загруженное значение не копируется - новые строки склеиваются с ним только
+        при следующем обращении к значению
+
+        Parameters
+        ----------
+        value
+            pd.DataFrame или pd.Series с новыми строками, индекс которых больше индекса сохраненных данных
+        """
+        with self.lock():
+            self._refresh_metadata()
+            if self._metadata is None:
+                self.value = value
+                return
+            if not len(value):
+                self._touch()
+                return
+            if self.is_journaled:
+                self._append_segment(value)
+                if len(self._segments) >= MAX_SEGMENTS:
+                    self.compact()
+            elif not (self.is_partitioned and self._append_years(value)):
+                self.value = pd.concat([self.value, value])
+
+    def _append_segment(self, value):
+        """Сохраняет новые строки в сегмент и добавляет его в метаданные"""
+        data = Data(value)
+        data_format, codec, data_bytes, info = self._encode(data)
+        segments = self._segments
+        path = self._segment_path(len(segments) + 1, data_format, codec)
+        atomic.write_bytes(path, data_bytes)
+        segment = make_metadata(data_format, codec, data, data_bytes)
+        del segment['segments']
+        segment['file'] = path.name
+        self._set_compact(segment, info)
+        metadata = dict(self._metadata)
+        metadata['segments'] = segments + [segment]
+        metadata['last_update'] = data.last_update
+        metadata['content'] = appended_digest(self._metadata, value)
+        metadata['rows'] = (metadata['rows'] or 0) + segment['rows']
+        metadata['last'] = segment['last']
+        metadata['versions'] = add_version(self._versions, [data.last_update, metadata['rows']])
+        self._metadata = metadata
+        self._save_metadata(metadata)
+        self._remember_appended(value, data.last_update)
+
+    def _append_years(self, value):
+        """Дописывает новые строки в категорию с хранением по годам без чтения и перезаписи файлов предыдущих лет
+
+        Новые строки склеиваются с последним годом из основного файла. Если они начинают новые годы, то последний
+        сохраненный год и промежуточные годы записываются в файлы лет, а в основной файл - последний год
+
+        Returns
+        -------
+        bool
+            False, если данные сохранены не по годам или новые строки нельзя разбить по годам, - тогда значение нужно
+            перезаписать целиком
+        """
+        if 'partitions' not in self._metadata or split_years(value) is None:
+            return False
+        old_path = self._saved_path
+        last_year = decode_value(old_path, self._saved_format, self._saved_codec, self._metadata.get('compact'))
+        years = split_years(pd.concat([last_year, value]))
+        if years is None:
+            return False
+        data = Data(years[-1][1])
+        data_format, codec, data_bytes, info = self._encode(data)
+        path = self._path(data_format, codec)
+        partitions = self._partitions + self._save_partitions(years[:-1])
+        atomic.write_bytes(path, data_bytes)
+        metadata = make_metadata(data_format, codec, data, data_bytes)
+        rows = self._metadata['rows'] + len(value)
+        metadata.update(rows=rows, first=self._metadata['first'], partitions=partitions,
+                        versions=add_version(self._versions, [data.last_update, rows]), snapshots=self._snapshots,
+                        content=appended_digest(self._metadata, value))
+        self._set_compact(metadata, info)
+        self._metadata = metadata
+        self._save_metadata(metadata)
+        if old_path != path and old_path.exists():
+            old_path.unlink()
+        self._remember_appended(value, data.last_update)
+        return True
+
+    def _remember_appended(self, value, last_update: float):
+        """Запоминает дописанные строки для загруженного значения или сбрасывает значение в кэше"""
+        if self._data is None:
+            series_cache.CACHE.invalidate(self._cache_key)
+        else:
+            self._appended.append(value)
+            self._data = Data(self._data.value, last_update)
+
+    def _touch(self):
+        """Обновляет время последнего обновления данных без их изменения"""
+        with self.lock():
+            self._refresh_metadata()
+            metadata = dict(self._metadata)
+            metadata['last_update'] = time.time()
+            self._metadata = metadata
+            self._save_metadata(metadata)
+        if self._data is not None:
+            self._data = Data(self._data.value, metadata['last_update'])
+
+    def compact(self):
+        """Объединяет дописанные сегменты с основными данными без изменения времени обновления
+
+        Returns
+        -------
+        bool
+            True, если были сегменты для объединения
+        """
+        with self.lock():
+            self._refresh_metadata()
+            if not self._segments:
+                return False
+            self._save(self._loaded_data)
+        return True
+
+    def remove(self):
+        """Удаляет все файлы серии и ее запись в каталоге данных"""
+        with self.lock():
+            self._refresh_metadata()
+            for path, _ in self.files():
+                if path.exists():
+                    path.unlink()
+            if self.metadata_path.exists():
+                self.metadata_path.unlink()
+            catalog.remove(self._data_category, self._data_name)
+            series_cache.CACHE.invalidate(self._cache_key)
+            self._metadata = None
+            self._data = None
+
+    def tail(self, start):
+        """Строки данных с возрастающим индексом, начиная со значения индекса start включительно
+
+        Если значение загружено или есть в кэше, то строки выбираются из него. Иначе с конца загружаются только
+        сегменты, которые могут содержать такие строки, а основные данные и данные за предыдущие годы - только если
+        строки начинаются раньше первого сегмента. При обновлении данных это обычно только последний сегмент
+
+        Returns
+        -------
+        pd.DataFrame or pd.Series
+            Строки данных, начиная с start. Если сохраненного значения нет, то None
+        """
+        if self._metadata is None:
+            return None
+        value = None if self._data is None else self.value
+        if value is None:
+            value = self._cached_value()
+        if value is None:
+            value = self._load_tail(start)
+        return value.iloc[value.index.searchsorted(start):]
+
+    def _load_tail(self, start):
+        """Загружает с конца сегменты до первого, который начинается не позже start, или значение целиком"""
+        with self.lock(shared=True):
+            self._metadata = self._read_metadata() or self._metadata
+            parts = []
+            for segment in reversed(self._segments):
+                parts.append(self._decode_item(segment))
+                if _bound_value(segment['first'], start) <= start:
+                    return pd.concat(parts[::-1]) if len(parts) > 1 else parts[0]
+        start_date = start if isinstance(start, pd.Timestamp) else None
+        return self._load_value(start=start_date)
+
+    def read(self, columns=None, as_of=None, start=None, end=None):
+        """Загружает значение данных или только часть его колонок и строк
+
+        Для колоночных форматов загружаются только указанные колонки и индекс без загрузки всего значения. Для данных,
+        хранящихся по годам, загружаются только годы из диапазона дат. Если значение уже загружено или есть в кэше, то
+        колонки и строки выбираются из него. Для pd.Series колонки игнорируются
+
+        Parameters
+        ----------
+        columns
+            Список колонок для загрузки - если None, то загружается все значение
+        as_of
+            Момент времени - epoch. Если указан, то загружается последняя версия данных, обновленная не позднее него
+        start
+            Первая дата диапазона строк включительно - если None, то с начала данных
+        end
+            Последняя дата диапазона строк включительно - если None, то до конца данных
+
+        Returns
+        -------
+        pd.DataFrame or pd.Series
+            Сохраненное значение или его часть. Если сохраненного значения нет, то None
+        """
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+        if as_of is not None:
+            return _slice(self._read_as_of(columns, as_of), start, end)
+        if self._data is None and self._metadata is not None:
+            value = self._cached_value()
+            if value is None:
+                return _slice(self._load_value(columns, start, end), start, end)
+        else:
+            value = self.value
+        return _slice(_select(value, columns), start, end)
+
+    def _read_as_of(self, columns, as_of: float):
+        """Загружает последнюю версию данных, обновленную не позднее заданного момента"""
+        for last_update, rows in reversed(self._versions):
+            if last_update <= as_of:
+                return _head(self.read(columns), rows)
+        for snapshot in reversed(self._snapshots):
+            for last_update, rows in reversed(snapshot['versions']):
+                if last_update <= as_of:
+                    return _head(_select(self._load_snapshot(snapshot), columns), rows)
+        raise ValueError(f'Нет сохраненной версии данных {self.data_category} -> {self.data_name} '
+                         f'на {time.ctime(as_of)}')
+
+    def _load_snapshot(self, snapshot: dict):
+        """Загружает значение из файла-снимка с использованием кэша"""
+        path = self._folder() / snapshot['file']
+        value = series_cache.CACHE.get(str(path), snapshot['hash'])
+        if value is None:
+            value = self._decode_item(snapshot)
+            series_cache.CACHE.put(str(path), snapshot['hash'], value)
+        return value
+
+    def convert(self):
+        """Пересохраняет данные в формате, со сжатием, компактным представлением и разбиением по годам из глобальных
+        настроек без изменения времени обновления
+
+        Returns
+        -------
+        bool
+            True, если данные были пересохранены
+        """
+        if self._metadata is None:
+            return False
+        is_same = (self._saved_codec is self.codec
+                   and ('compact' in self._metadata) == self.is_compact
+                   and ('partitions' in self._metadata) == self.is_partitioned)
+        if is_same and self._saved_format is self.data_format:
+            return False
+        data = self._loaded_data
+        if is_same and self._saved_format is self._format_for(data.value):
+            return False
+        self._save(data)
+        return True
 
     @property
     def last_update(self):
         """Время обновления данных - epoch. Если сохраненного значения нет, то None"""
-        return self._data.last_update
+        if self._metadata is None:
+            return None
+        return self._metadata['last_update']
+
+
+def _select(value, columns):
+    """Выбирает колонки из значения - для pd.Series и при columns None значение возвращается целиком"""
+    if columns is None or value is None or not hasattr(value, 'columns'):
+        return value
+    return value[list(columns)]
+
+
+def _head(value, rows):
+    """Начальные строки значения - при rows None значение возвращается целиком"""
+    if rows is None:
+        return value
+    return value.iloc[:rows]
+
+
+def _slice(value, start, end):
+    """Строки значения в диапазоне дат включительно - при start и end None значение возвращается целиком"""
+    if (start is None and end is None) or not isinstance(value, (pd.Series, pd.DataFrame)):
+        return value
+    return value.loc[start:end]
+
+
+def _bound_value(bound, key):
+    """Приводит границу индекса из метаданных к типу значения индекса для сравнения"""
+    if isinstance(key, pd.Timestamp):
+        return pd.Timestamp(bound)
+    return bound
+
+
+def _is_year_in_range(year: int, start, end):
+    """Пересекается ли календарный год с диапазоном дат"""
+    return (start is None or year >= start.year) and (end is None or year <= end.year)
+
+
+def _split_extension(file_name: str):
+    """Разделяет название файла на основу и формат - если формат не известен, то формат None
+
+    Расширение алгоритма сжатия отбрасывается
+    """
+    for codec in compression.CODECS.values():
+        if codec.extension and file_name.endswith(codec.extension):
+            file_name = file_name[:-len(codec.extension)]
+            break
+    for data_format in data_formats.FORMATS.values():
+        if file_name.endswith(data_format.extension):
+            return file_name[:-len(data_format.extension)], data_format
+    return file_name, None
+
+
+def walk_data_specs(data_path=None):
+    """Обходит директорию данных, по умолчанию глобальную, и находит все сохраненные серии"""
+    data_path = data_path or settings.DATA_PATH
+    specs = set()
+    if not data_path.exists():
+        return []
+    for path in data_path.iterdir():
+        if path.is_dir():
+            for file in path.iterdir():
+                category, data_format = _split_extension(file.name)
+                if data_format is not None and _is_main_file(category):
+                    specs.add((category, path.name))
+        else:
+            name, data_format = _split_extension(path.name)
+            if data_format is not None and _is_main_file(name):
+                specs.add((None, name))
+    return sorted(specs, key=lambda spec: (spec[0] or '', spec[1]))
+
+
+def rebuild_catalog():
+    """Пересоздает каталог данных по метаданным всех серий в глобальной директории данных
+
+    Для данных, сохраненных до появления метаданных, метаданные создаются
+
+    Returns
+    -------
+    int
+        Количество серий в каталоге
+    """
+    catalog.clear()
+    specs = walk_data_specs()
+    for data_category, data_name in specs:
+        DataFile(data_category, data_name).register()
+    catalog.mark_complete()
+    return len(specs)
+
+
+def reconcile_catalog():
+    """Сверяет каталог данных с обходом глобальной директории данных и отмечает его полноту
+
+    Серии, которых нет в каталоге, например созданные до каталога или скопированные в директорию вручную,
+    регистрируются, а записи о сериях без файлов удаляются. Записи остальных серий не перечитываются
+
+    Returns
+    -------
+    tuple
+        Списки пар (категория данных, название данных) добавленных и удаленных из каталога серий
+    """
+    specs = walk_data_specs()
+    saved = set(catalog.specs(catalog.entries()))
+    added = [spec for spec in specs if spec not in saved]
+    for data_category, data_name in added:
+        DataFile(data_category, data_name).register()
+    found = set(specs)
+    removed = sorted((spec for spec in saved if spec not in found), key=lambda spec: (spec[0] or '', spec[1]))
+    for data_category, data_name in removed:
+        catalog.remove(data_category, data_name)
+    catalog.mark_complete()
+    return added, removed
+
+
+def load_catalog(data_category=None, names: tuple = None):
+    """Записи каталога данных - если каталог не отмечен полным, то он сначала сверяется с директорией данных
+
+    Parameters
+    ----------
+    data_category
+        Категория данных - если None, то записи всех категорий
+    names
+        Названия серий, записи которых нужно загрузить, - по умолчанию все серии
+    """
+    if not catalog.is_complete():
+        reconcile_catalog()
+    if names is None:
+        return catalog.entries(data_category)
+    names = tuple(set(names))
+    return catalog.entries(data_category, f'NAME IN ({", ".join("?" * len(names))})', names)
+
+
+def _is_main_file(stem: str):
+    """Является ли файл основным файлом данных, а не сегментом, снимком или годом"""
+    return all(marker not in stem for marker in (SEGMENT_MARKER, SNAPSHOT_MARKER, PARTITION_MARKER))
+
+
+def yield_data_specs():
+    """Перебирает все серии данных в глобальной директории данных
+
+    Перечень берется из каталога данных без обхода директорий
+
+    Returns
+    -------
+    tuple
+        Пары (категория данных, название данных) для каждой сохраненной серии. Для данных в корне глобальной
+        директории категория None
+    """
+    yield from catalog.specs(load_catalog())
 
 
 if __name__ == '__main__':
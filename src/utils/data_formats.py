@@ -0,0 +1,207 @@
+"""Форматы файлов для хранения локальных данных
+
+Объекты Data сохраняются либо целиком в формате Pickle, либо по колонкам в формате Arrow (Feather) или Parquet
+Колоночные форматы позволяют загружать только необходимые колонки без десериализации всего объекта
+"""
+import json
+import pickle
+
+import pandas as pd
+
+from utils.data import Data
+
+try:
+    import pyarrow
+    from pyarrow import feather
+    from pyarrow import parquet
+except ImportError:
+    pyarrow = None
+
+PICKLE = 'pickle'
+FEATHER = 'feather'
+PARQUET = 'parquet'
+
+# Версия протокола фиксирована, чтобы файлы не зависели от версии интерпретатора
+PICKLE_VERSION = 4
+# Ключ в метаданных схемы Arrow с дополнительной информацией об объекте Data
+METADATA_KEY = b'poptimizer'
+# Название колонки, в которой хранится pd.Series
+SERIES_COLUMN = '__series__'
+
+
+class PickleFormat:
+    """Хранение объекта Data целиком в формате Pickle
+
+    Подходит для любых объектов, но не позволяет загружать данные частично
+    """
+    name = PICKLE
+    extension = f'.pickle{PICKLE_VERSION}'
+    is_columnar = False
+
+    @staticmethod
+    def is_supported(value):
+        """Формат поддерживает любые значения"""
+        return True
+
+    @staticmethod
+    def dumps(data: Data):
+        """Сериализует объект Data в байты"""
+        return pickle.dumps(data, protocol=PICKLE_VERSION)
+
+    @staticmethod
+    def load(path, columns=None):
+        """Загружает объект Data - загружаются все колонки вне зависимости от значения columns"""
+        with open(path, 'rb') as data_file:
+            return pickle.load(data_file)
+
+    @staticmethod
+    def loads(data_bytes: bytes, columns=None):
+        """Восстанавливает объект Data из байтов - загружаются все колонки вне зависимости от значения columns"""
+        return pickle.loads(data_bytes)
+
+
+class ArrowFormat:
+    """Базовый класс для хранения pd.DataFrame и pd.Series по колонкам
+
+    Индекс хранится в отдельной колонке, время обновления и тип объекта - в метаданных схемы
+    """
+    name = None
+    extension = None
+    is_columnar = True
+
+    @staticmethod
+    def is_supported(value):
+        """Поддерживаются pd.Series и pd.DataFrame со строковыми названиями колонок"""
+        if isinstance(value, pd.Series):
+            return True
+        if isinstance(value, pd.DataFrame):
+            return all(isinstance(column, str) for column in value.columns)
+        return False
+
+    @staticmethod
+    def _to_table(data: Data):
+        """Преобразует объект Data в таблицу Arrow"""
+        value = data.value
+        if isinstance(value, pd.Series):
+            info = dict(kind='series', name=value.name)
+            value = value.to_frame(SERIES_COLUMN)
+        else:
+            info = dict(kind='frame')
+        info['last_update'] = data.last_update
+        table = pyarrow.Table.from_pandas(value, preserve_index=True)
+        metadata = dict(table.schema.metadata)
+        metadata[METADATA_KEY] = json.dumps(info).encode()
+        return table.replace_schema_metadata(metadata)
+
+    @staticmethod
+    def _from_table(table, info: dict):
+        """Восстанавливает объект Data из таблицы Arrow"""
+        value = table.to_pandas()
+        if info['kind'] == 'series':
+            value = value[SERIES_COLUMN]
+            value.name = info['name']
+        return Data(value, info['last_update'])
+
+    @classmethod
+    def _columns_to_read(cls, schema, columns):
+        """Колонки, которые нужно прочитать из файла, с учетом колонок индекса"""
+        if columns is None:
+            return None
+        index_columns = [column for column in schema.pandas_metadata['index_columns'] if isinstance(column, str)]
+        info = json.loads(schema.metadata[METADATA_KEY])
+        if info['kind'] == 'series':
+            return [SERIES_COLUMN] + index_columns
+        return list(columns) + index_columns
+
+    @classmethod
+    def dumps(cls, data: Data):
+        """Сериализует объект Data в байты"""
+        sink = pyarrow.BufferOutputStream()
+        cls.write_table(cls._to_table(data), sink)
+        return sink.getvalue().to_pybytes()
+
+    @classmethod
+    def write_table(cls, table, sink):
+        """Записывает таблицу Arrow в поток"""
+        raise NotImplementedError
+
+    @classmethod
+    def read_schema(cls, source):
+        """Загружает схему без загрузки данных из пути к файлу или буфера"""
+        raise NotImplementedError
+
+    @classmethod
+    def read_table(cls, source, columns):
+        """Загружает таблицу с указанными колонками из пути к файлу или буфера"""
+        raise NotImplementedError
+
+    @classmethod
+    def load(cls, path, columns=None):
+        """Загружает объект Data - если указаны колонки, то загружаются только они и индекс"""
+        schema = cls.read_schema(str(path))
+        info = json.loads(schema.metadata[METADATA_KEY])
+        table = cls.read_table(str(path), cls._columns_to_read(schema, columns))
+        return cls._from_table(table, info)
+
+    @classmethod
+    def loads(cls, data_bytes: bytes, columns=None):
+        """Восстанавливает объект Data из байтов - если указаны колонки, то загружаются только они и индекс"""
+        source = pyarrow.BufferReader(data_bytes)
+        schema = cls.read_schema(source)
+        info = json.loads(schema.metadata[METADATA_KEY])
+        source.seek(0)
+        table = cls.read_table(source, cls._columns_to_read(schema, columns))
+        return cls._from_table(table, info)
+
+
+class FeatherFormat(ArrowFormat):
+    """Хранение в формате Arrow IPC (Feather v2) без сжатия, что позволяет отображать файл в память"""
+    name = FEATHER
+    extension = '.feather'
+
+    @classmethod
+    def write_table(cls, table, sink):
+        feather.write_feather(table, sink, compression='uncompressed')
+
+    @classmethod
+    def read_schema(cls, source):
+        if isinstance(source, str):
+            with pyarrow.memory_map(source) as mapped_source:
+                return pyarrow.ipc.open_file(mapped_source).schema
+        return pyarrow.ipc.open_file(source).schema
+
+    @classmethod
+    def read_table(cls, source, columns):
+        return feather.read_table(source, columns=columns, memory_map=True)
+
+
+class ParquetFormat(ArrowFormat):
+    """Хранение в формате Parquet"""
+    name = PARQUET
+    extension = '.parquet'
+
+    @classmethod
+    def write_table(cls, table, sink):
+        parquet.write_table(table, sink)
+
+    @classmethod
+    def read_schema(cls, source):
+        return parquet.read_schema(source)
+
+    @classmethod
+    def read_table(cls, source, columns):
+        return parquet.read_table(source, columns=columns, memory_map=True)
+
+
+FORMATS = {data_format.name: data_format for data_format in (PickleFormat, FeatherFormat, ParquetFormat)}
+
+
+def get_format(name: str):
+    """Возвращает формат по названию и проверяет наличие необходимых библиотек"""
+    try:
+        data_format = FORMATS[name]
+    except KeyError:
+        raise ValueError(f'Неизвестный формат хранения данных {name}')
+    if data_format.is_columnar and pyarrow is None:
+        raise ImportError(f'Для формата {name} необходимо установить pyarrow')
+    return data_format
@@ -1,17 +1,180 @@
 """Абстрактный класс менеджера создания, обновления и предоставления локальных данных"""
-
+import contextlib
+import threading
+import warnings
 from abc import ABC, abstractmethod
 
 import arrow
 import numpy as np
 import pandas as pd
 
+import settings
+from utils import blocking
+from utils import catalog
+from utils import derived
+from utils import telemetry
+from utils import trading_calendar
 from utils.data_file import DataFile
+from utils.data_file import load_catalog
 
 # Часовой пояс MOEX
 MARKET_TIME_ZONE = 'Europe/Moscow'
 # Торги заканчиваются в 19.00, но данные публикуются 19.45
 END_OF_TRADING_DAY = dict(hour=19, minute=45, second=0, microsecond=0)
+# Признак отложенного обновления данных для менеджеров, создаваемых в текущем потоке
+_DEFERRED = threading.local()
+
+
+class StaleDataWarning(UserWarning):
+    """Используются устаревшие локальные данные, так как в автономном режиме они не обновляются"""
+
+
+def next_update(last_update: arrow.Arrow, storage_key: str = None):
+    """Время следующего планового обновления для данных с заданным временем последнего обновления
+
+    Parameters
+    ----------
+    last_update
+        Время последнего обновления в часовом поясе MOEX
+    storage_key
+        Категория данных, а для данных в корне глобальной директории - их название. Используется для выбора срока
+        свежести из settings.DATA_TTL
+
+    Returns
+    -------
+    arrow.Arrow
+        Для категорий со сроком свежести - время последнего обновления, увеличенное на срок, для категорий со сроком
+        None - None, так как данные обновляются только по запросу. Для остальных - ближайшее время публикации итогов
+        торгов после последнего обновления. Дни без торговых сессий по календарю utils.trading_calendar
+        пропускаются, поэтому в выходные и праздники данные не обновляются
+    """
+    if storage_key in settings.DATA_TTL:
+        days = settings.DATA_TTL[storage_key]
+        if days is None:
+            return None
+        return last_update.shift(days=days)
+    end_of_trading_day = last_update.replace(**END_OF_TRADING_DAY)
+    day = pd.Timestamp(end_of_trading_day.date())
+    if last_update > end_of_trading_day or not trading_calendar.is_session(day):
+        day = trading_calendar.next_session(day)
+        end_of_trading_day = end_of_trading_day.replace(year=day.year, month=day.month, day=day.day)
+    return end_of_trading_day
+
+
+def stale_threshold(storage_key: str = None, now: arrow.Arrow = None):
+    """Порог устаревания данных - данные устарели, если время их обновления не больше порога
+
+    Сравнение с порогом эквивалентно проверке наступления next_update, но выполняется сразу для многих серий одной
+    категории без расчета времени следующего обновления для каждой из них
+
+    Parameters
+    ----------
+    storage_key
+        Категория данных, а для данных в корне глобальной директории - их название
+    now
+        Текущее время - по умолчанию arrow.now()
+
+    Returns
+    -------
+    float
+        Для категорий со сроком свежести - текущее время, уменьшенное на срок, для остальных - время публикации итогов
+        последних торгов до текущего времени. Для данных, которые обновляются только по запросу, None. Время в epoch
+    """
+    now = now or arrow.now()
+    if storage_key in settings.DATA_TTL:
+        days = settings.DATA_TTL[storage_key]
+        if days is None:
+            return None
+        return now.shift(days=-days).float_timestamp
+    now = now.to(MARKET_TIME_ZONE)
+    end_of_trading_day = now.replace(**END_OF_TRADING_DAY)
+    day = pd.Timestamp(end_of_trading_day.date())
+    if end_of_trading_day >= now or not trading_calendar.is_session(day):
+        day = trading_calendar.previous_session(day)
+        end_of_trading_day = end_of_trading_day.replace(year=day.year, month=day.month, day=day.day)
+    return end_of_trading_day.float_timestamp
+
+
+def as_of_timestamp(as_of):
+    """Преобразует момент времени в epoch
+
+    Parameters
+    ----------
+    as_of
+        epoch, arrow.Arrow или значение, которое можно преобразовать в pd.Timestamp. Время без часового пояса
+        считается временем MOEX
+
+    Returns
+    -------
+    float
+        Момент времени в формате epoch или None, если момент не указан
+    """
+    if as_of is None or isinstance(as_of, (int, float)):
+        return as_of
+    if isinstance(as_of, arrow.Arrow):
+        return as_of.float_timestamp
+    timestamp = pd.Timestamp(as_of)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize(MARKET_TIME_ZONE)
+    return timestamp.timestamp()
+
+
+def stale_data_specs():
+    """Перечень серий данных в глобальной директории данных, которые необходимо обновить по расписанию
+
+    Для проверки используется только каталог данных без загрузки метаданных и самих данных - время обновления всех
+    серий сравнивается с порогом устаревания их категории. Дополнительные условия обновления, которые реализованы в
+    наследниках AbstractDataManager, не учитываются
+
+    Returns
+    -------
+    list
+        Пары (категория данных, название данных) для серий, время планового обновления которых наступило
+    """
+    now = arrow.now()
+    df = load_catalog()
+    storage_keys = df['CATEGORY'].where(df['CATEGORY'].notna(), df['NAME'])
+    thresholds = {storage_key: stale_threshold(storage_key, now) for storage_key in storage_keys.unique()}
+    thresholds = storage_keys.map(thresholds).astype(float)
+    is_stale = df['LAST_UPDATE'].isna() | (df['LAST_UPDATE'] <= thresholds)
+    return [spec for spec, stale in zip(catalog.specs(df), is_stale) if stale]
+
+
+@contextlib.contextmanager
+def deferred_refresh():
+    """Менеджеры данных, созданные в контексте, не обновляют данные при создании - контексты могут быть вложенными"""
+    active = is_refresh_deferred()
+    _DEFERRED.active = True
+    try:
+        yield
+    finally:
+        _DEFERRED.active = active
+
+
+def is_refresh_deferred():
+    """Отложено ли обновление данных менеджерами, создаваемыми в текущем потоке"""
+    return getattr(_DEFERRED, 'active', False)
+
+
+async def open_async(manager_class, *args):
+    """Создает менеджер данных и асинхронно создает или обновляет его данные при необходимости
+
+    Parameters
+    ----------
+    manager_class
+        Класс менеджера данных - наследник AbstractDataManager
+    args
+        Параметры конструктора менеджера, например тикер
+
+    Returns
+    -------
+    AbstractDataManager
+        Менеджер с актуальными данными
+    """
+    with deferred_refresh():
+        manager = manager_class(*args)
+    await manager.refresh_async()
+    return manager
 
 
 class AbstractDataManager(ABC):
@@ -22,6 +185,8 @@ class AbstractDataManager(ABC):
     is_monotonic = True
     # Нужно ли перезаписать новыми данными с нуля при обновлении
     update_from_scratch = False
+    # Загружаются ли данные из интернета - в автономном режиме settings.DATA_OFFLINE такие данные не обновляются
+    is_remote = True
 
     def __init__(self, data_category, data_name: str):
         """
@@ -34,10 +199,66 @@ class AbstractDataManager(ABC):
             Название серии данных
         """
         self._data = DataFile(data_category, data_name)
+        if not is_refresh_deferred():
+            self.refresh()
+
+    def refresh(self):
+        """Создает или обновляет данные, если время обновления наступило
+
+        Проверка повторяется под блокировкой серии, так как данные могли быть обновлены другим процессом. В автономном
+        режиме вместо обновления выдается предупреждение
+        """
+        if self._is_stale():
+            if self._is_offline():
+                self._warn_stale()
+                return
+            with self._data.lock():
+                self._data.reload()
+                if self._data.last_update is None:
+                    self.create()
+                elif self._is_stale():
+                    self.update()
+
+    async def refresh_async(self):
+        """Асинхронно создает или обновляет данные, если время обновления наступило
+
+        Данные загружаются без блокировки серии, поэтому цикл событий может одновременно загружать данные для многих
+        серий, а сохраняются под блокировкой
+        """
+        if self._is_stale():
+            if self._is_offline():
+                self._warn_stale()
+            elif self._data.last_update is None:
+                await self.create_async()
+            else:
+                await self.update_async()
+
+    def _is_stale(self):
+        """Нужно ли создать или обновить данные
+
+        После захвата блокировки проверка повторяется, так как данные могли быть обновлены другим процессом
+        """
         if self._data.last_update is None:
-            self.create()
-        elif self.next_update < arrow.now():
-            self.update()
+            return True
+        update_time = self.next_update
+        return update_time is not None and update_time < arrow.now()
+
+    def _is_offline(self):
+        """Запрещено ли загружать данные из интернета"""
+        return settings.DATA_OFFLINE and self.is_remote
+
+    def _check_online(self):
+        """Проверяет, что данные можно загрузить"""
+        if self._is_offline():
+            raise ValueError(f'Загрузка данных {self.data_category} -> {self.data_name} невозможна в автономном '
+                             f'режиме')
+
+    def _warn_stale(self):
+        """Предупреждает об использовании устаревших данных, а при их отсутствии вызывает ошибку"""
+        if self._data.last_update is None:
+            self._check_online()
+        warnings.warn(f'Используются устаревшие данные {self.data_category} -> {self.data_name} - последнее '
+                      f'обновление {self.last_update}', StaleDataWarning)
 
     def __str__(self):
         return (f'Последнее обновление - {self.last_update}\n'
@@ -60,19 +281,51 @@ class AbstractDataManager(ABC):
         """Возвращает сохраненное значение данных. Если сохраненного значения нет, то None"""
         return self._data.value
 
+    @property
+    def metadata(self):
+        """Метаданные сохраненных данных - формат, время обновления, количество строк, границы индекса и хэш"""
+        return self._data.metadata
+
+    def read(self, columns=None, as_of=None, start=None, end=None):
+        """Возвращает сохраненное значение данных или только часть его колонок и строк
+
+        Для колоночных форматов хранения загружаются только необходимые колонки, а для хранения по годам - только
+        годы из диапазона дат от start до end включительно. Если указан момент времени as_of, то возвращается версия
+        данных, которая была сохранена на этот момент
+        """
+        return self._data.read(columns, as_of_timestamp(as_of), start, end)
+
+    def tail(self, start):
+        """Строки сохраненных данных с возрастающим индексом, начиная с start включительно - для данных с журналом
+        загружаются только последние сегменты"""
+        return self._data.tail(start)
+
     @property
     def last_update(self):
         """Время обновления данных - arrow в часовом поясе MOEX"""
         return arrow.get(self._data.last_update).to(MARKET_TIME_ZONE)
 
+    @property
+    def version(self):
+        """Версия содержимого сохраненных данных - используется для версий производных данных в utils.derived"""
+        return self._data.version
+
+    @property
+    def versions(self):
+        """Версия содержимого серии по ключу (категория, название) - общий интерфейс с пакетным менеджером данных"""
+        return {(self.data_category, self.data_name): self.version}
+
+    @property
+    def last_index(self):
+        """Последнее значение индекса сохраненных данных с индексом из дат - определяется по метаданным без загрузки
+        значения"""
+        return pd.Timestamp(self._data.metadata['last'])
+
     @property
     def next_update(self):
-        """Время следующего планового обновления данных - arrow в часовом поясе MOEX"""
-        last_update = self.last_update
-        end_of_trading_day = last_update.replace(**END_OF_TRADING_DAY)
-        if last_update > end_of_trading_day:
-            return end_of_trading_day.shift(days=1)
-        return end_of_trading_day
+        """Время следующего планового обновления данных - arrow в часовом поясе MOEX или None, если данные
+        обновляются только по запросу"""
+        return next_update(self.last_update, self._data.storage_key)
 
     @abstractmethod
     def download_all(self):
@@ -88,15 +341,46 @@ class AbstractDataManager(ABC):
         """
         raise NotImplementedError
 
+    async def download_all_async(self):
+        """Асинхронный вариант download_all
+
+        По умолчанию синхронная загрузка выполняется в пуле потоков utils.blocking. Наследники могут переопределить
+        метод для одновременной загрузки нескольких запросов
+        """
+        return await blocking.run(self.download_all)
+
+    async def download_update_async(self):
+        """Асинхронный вариант download_update - по умолчанию выполняется в пуле потоков utils.blocking"""
+        return await blocking.run(self.download_update)
+
     def create(self):
         """Создает локальный файл с нуля или перезаписывает существующий
 
         Индекс данных проверяется на уникальность и монотонность
         """
+        self._check_online()
         print(f'Создание локальных данных с нуля {self._data.data_category} -> {self._data.data_name}')
-        df = self.download_all()
-        self._validate_index(df)
-        self._data.value = df
+        with telemetry.series(self.data_category, self.data_name, 'create'):
+            self._save_created(self.download_all())
+
+    async def create_async(self):
+        """Асинхронный вариант create - данные сохраняются под блокировкой серии после загрузки"""
+        self._check_online()
+        print(f'Создание локальных данных с нуля {self._data.data_category} -> {self._data.data_name}')
+        with telemetry.series(self.data_category, self.data_name, 'create'):
+            df = await self.download_all_async()
+            with self._data.lock():
+                self._save_created(df)
+
+    def _save_created(self, df):
+        """Проверяет индекс и сохраняет данные, загруженные с нуля"""
+        with telemetry.timer('validation'):
+            self._validate_index(df)
+        with telemetry.timer('write'):
+            self._data.value = df
+        if isinstance(df, (pd.Series, pd.DataFrame)):
+            telemetry.add('rows', len(df))
+        derived.invalidate(self.data_category, self.data_name)
 
     def _validate_index(self, df):
         if self.is_unique and not df.index.is_unique:
@@ -111,24 +395,118 @@ class AbstractDataManager(ABC):
         При отсутствии реализации функции частичной загрузки данных будет осуществлена их полная загрузка
         Во время обновления проверяется совпадение новых данных со существующими
         Индекс всех данных проверяется на уникальность и монотонность
+        Если новые строки следуют за существующими, то они дописываются без перезаписи всех данных, а для данных с
+        уникальным и возрастающим индексом проверяется только пересечение новых данных с хвостом существующих
         """
         if self.update_from_scratch:
             self.create()
             return
+        self._check_online()
+        print(f'Обновление локальных данных {self._data.data_category} -> {self._data.data_name}')
+        with telemetry.series(self.data_category, self.data_name, 'update'):
+            try:
+                df_new = self.download_update()
+            except NotImplementedError:
+                df_new = self.download_all()
+            self._save_updated(df_new)
+
+    async def update_async(self):
+        """Асинхронный вариант update
+
+        Данные сохраняются под блокировкой серии после загрузки и сравниваются с перечитанными сохраненными данными
+        """
+        if self.update_from_scratch:
+            await self.create_async()
+            return
+        self._check_online()
         print(f'Обновление локальных данных {self._data.data_category} -> {self._data.data_name}')
-        df_old = self.value
-        try:
-            df_new = self.download_update()
-        except NotImplementedError:
-            df_new = self.download_all()
-        self._validate_new(df_old, df_new)
-        old_elements = df_old.index.difference(df_new.index)
-        df = df_old.loc[old_elements].append(df_new)
-        self._validate_index(df)
-        self._data.value = df
+        with telemetry.series(self.data_category, self.data_name, 'update'):
+            try:
+                df_new = await self.download_update_async()
+            except NotImplementedError:
+                df_new = await self.download_all_async()
+            with self._data.lock():
+                self._data.reload()
+                self._save_updated(df_new)
+
+    def _save_updated(self, df_new):
+        """Проверяет соответствие новых данных существующим и дописывает или перезаписывает их
+
+        Для данных с уникальным и возрастающим индексом используется слияние по хвосту _merge_tail, а для остальных
+        новые данные сравниваются со всеми существующими. Если содержимое изменилось, то из кэша удаляются зависящие от
+        серии производные данные
+        """
+        version = self.version
+        if self.is_unique and self.is_monotonic:
+            self._merge_tail(df_new)
+        else:
+            df_old = self.value
+            with telemetry.timer('validation'):
+                self._validate_new(df_old, df_new)
+                old_elements = df_old.index.difference(df_new.index)
+                df = pd.concat([df_old.loc[old_elements], df_new])
+                self._validate_index(df)
+            with telemetry.timer('write'):
+                self._data.value = df
+            telemetry.add('rows', len(df) - len(df_old))
+        if self.version != version:
+            derived.invalidate(self.data_category, self.data_name)
+
+    def _merge_tail(self, df_new):
+        """Сливает новые данные с существующими за время, пропорциональное количеству новых строк
+
+        Индекс новых данных проверяется целиком, а с существующими данными сравнивается только их хвост, начиная с
+        первой новой строки, - в остальной части существующих данных индекс уже уникален и возрастает. Все строки
+        хвоста должны быть в новых данных, иначе индекс объединенных данных не возрастает. Если новые строки следуют
+        за хвостом, то они дописываются без загрузки и копирования остальных данных, а при вставке строк внутрь
+        хвоста данные перезаписываются
+        """
+        with telemetry.timer('validation'):
+            self._validate_index(df_new)
+            old_tail = self._data.tail(df_new.index[0]) if len(df_new) else df_new
+            if (df_new.index.get_indexer(old_tail.index) == -1).any():
+                raise ValueError('У новых данных индекс не возрастает монотонно')
+            self._validate_new(old_tail, df_new)
+        telemetry.add('rows', len(df_new) - len(old_tail))
+        start = df_new.index.searchsorted(old_tail.index[-1], side='right') if len(old_tail) else 0
+        with telemetry.timer('write'):
+            if start == len(old_tail):
+                self._data.append(df_new.iloc[start:])
+            else:
+                df_old = self.value
+                self._data.value = pd.concat([df_old.iloc[:len(df_old) - len(old_tail)], df_new])
+
+    def splice(self, df_new):
+        """Вставляет новые строки внутрь сохраненных данных, например дозагруженные пропуски истории
+
+        Данные перечитываются под блокировкой серии, новые данные сверяются с ними на пересечении индексов, а индекс
+        объединенных данных проверяется на уникальность и монотонность. Строки, которые уже есть в данных, не
+        перезаписываются
+
+        Returns
+        -------
+        int
+            Количество вставленных строк
+        """
+        with telemetry.series(self.data_category, self.data_name, 'splice'):
+            with self._data.lock():
+                self._data.reload()
+                df_old = self.value
+                with telemetry.timer('validation'):
+                    self._validate_new(df_old, df_new)
+                    added = df_new.index.difference(df_old.index)
+                    if len(added) == 0:
+                        return 0
+                    df = pd.concat([df_old, df_new.loc[added]]).sort_index()
+                    self._validate_index(df)
+                with telemetry.timer('write'):
+                    self._data.value = df
+                telemetry.add('rows', len(added))
+        derived.invalidate(self.data_category, self.data_name)
+        return len(added)
 
     def _validate_new(self, df_old, df_new):
-        """Проверяет соответствие новых данных существующим"""
+        """Проверяет соответствие новых данных существующим на пересечении индексов"""
         common_index = df_old.index.intersection(df_new.index)
         if isinstance(df_old, pd.Series):
             condition = np.allclose(df_old.loc[common_index], df_new.loc[common_index])
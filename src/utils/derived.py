@@ -0,0 +1,117 @@
+"""Граф производных данных с версиями входов
+
+Производные данные - сводные таблицы дивидендов, месячные доходности и другие входы моделей - рассчитываются из
+серий менеджеров данных и других производных данных. Функция регистрируется декоратором dataset вместе с функцией,
+которая по аргументам вызова возвращает входы - менеджеры данных, пакетные менеджеры или пары (производные данные,
+аргументы). Результат хранится в общем кэше серий с версией - версиями содержимого всех серий, от которых он зависит
+напрямую или через другие производные данные. Поэтому после обновления котировок одного тикера пересчитываются только
+результаты, в которые он входит, а остальные остаются в кэше долгоживущего процесса. Кроме того, менеджеры данных
+после записи вызывают invalidate, чтобы сразу освободить память от устаревших результатов
+"""
+import functools
+import threading
+from collections import OrderedDict
+from collections import defaultdict
+
+import settings
+from utils import series_cache
+
+# Зарегистрированные производные данные по названиям
+GRAPH = OrderedDict()
+# Ключи результатов в кэше серий для каждой серии - (категория, название), от которой они зависят
+_DEPENDENTS = defaultdict(set)
+_LOCK = threading.Lock()
+
+
+class Dataset:
+    """Производные данные, которые кэшируются до изменения содержимого любой из входных серий
+
+    Результаты разделяются всеми потребителями и не должны изменяться на месте
+
+    Parameters
+    ----------
+    func
+        Функция расчета производных данных - аргументы должны быть хэшируемыми
+    inputs
+        Функция, которая по тем же аргументам возвращает последовательность входов - менеджеров данных, пакетных
+        менеджеров или пар (производные данные, кортеж аргументов)
+    """
+
+    def __init__(self, func, inputs):
+        functools.update_wrapper(self, func)
+        self._func = func
+        self._inputs = inputs
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        GRAPH[self.name] = self
+
+    def __str__(self):
+        return f'{self.__class__.__name__}({self.name})'
+
+    def __call__(self, *args):
+        sources = self.sources(*args)
+        key = ('derived', str(settings.DATA_PATH), self.name, args)
+        version = tuple(sources.values())
+        value = series_cache.CACHE.get(key, version)
+        if value is None:
+            value = self._func(*args)
+            series_cache.CACHE.put(key, version, value)
+            with _LOCK:
+                for source in sources:
+                    _DEPENDENTS[source].add(key)
+        return value
+
+    def sources(self, *args):
+        """Серии, от которых зависит результат вызова с заданными аргументами
+
+        Returns
+        -------
+        OrderedDict
+            Ключи - (категория, название) серии, значения - версии ее содержимого
+        """
+        sources = OrderedDict()
+        for item in self._inputs(*args):
+            if isinstance(item, tuple):
+                dataset, dataset_args = item
+                sources.update(dataset.sources(*dataset_args))
+            else:
+                sources.update(item.versions)
+        return sources
+
+
+def dataset(inputs):
+    """Декоратор, регистрирующий функцию расчета производных данных в графе
+
+    Parameters
+    ----------
+    inputs
+        Функция, которая по аргументам вызова возвращает входы - менеджеры данных, пакетные менеджеры или пары
+        (производные данные, кортеж аргументов)
+    """
+
+    def decorator(func):
+        return Dataset(func, inputs)
+
+    return decorator
+
+
+def invalidate(data_category, data_name: str):
+    """Удаляет из кэша серий результаты производных данных, которые зависят от заданной серии
+
+    Returns
+    -------
+    int
+        Количество удаленных результатов
+    """
+    with _LOCK:
+        keys = _DEPENDENTS.pop((data_category, data_name), set())
+    for key in keys:
+        series_cache.CACHE.invalidate(key)
+    return len(keys)
+
+
+def dependents(data_category, data_name: str):
+    """Названия производных данных, результаты которых в кэше зависят от заданной серии"""
+    with _LOCK:
+        keys = list(_DEPENDENTS.get((data_category, data_name), ()))
+    return sorted({key[2] for key in keys})
+
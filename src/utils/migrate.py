@@ -0,0 +1,44 @@
+"""Преобразование локальных данных в форматы, установленные для категорий в глобальных настройках
+
+Для смены формата хранения категории необходимо изменить settings.DATA_FORMATS и запустить модуль:
+python -m utils.migrate [категория ...]
+"""
+import argparse
+
+from utils.data_file import DataFile
+from utils.data_file import yield_data_specs
+
+
+def migrate(storage_keys=None):
+    """Пересохраняет все серии данных, формат которых не соответствует глобальным настройкам
+
+    Время последнего обновления данных сохраняется
+
+    Parameters
+    ----------
+    storage_keys
+        Перечень категорий, которые нужно преобразовать. Для данных в корне глобальной директории - их названия.
+        Если None, то преобразуются все данные
+
+    Returns
+    -------
+    list
+        Перечень пар (категория данных, название данных) для преобразованных серий
+    """
+    converted = []
+    for data_category, data_name in yield_data_specs():
+        data_file = DataFile(data_category, data_name)
+        if storage_keys is not None and data_file.storage_key not in storage_keys:
+            continue
+        if data_file.convert():
+            converted.append((data_category, data_name))
+            print(f'Преобразованы данные {data_category} -> {data_name} в формат {data_file.data_format.name}')
+    return converted
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Преобразование локальных данных в форматы из настроек')
+    parser.add_argument('storage_keys', nargs='*', help='категории данных - по умолчанию все')
+    args = parser.parse_args()
+    result = migrate(args.storage_keys or None)
+    print(f'Всего преобразовано серий данных - {len(result)}')
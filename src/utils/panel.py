@@ -0,0 +1,215 @@
+"""Плотные панели значений дата × тикер, отображаемые в память
+
+Каждое поле панели хранится в отдельном бинарном файле с массивом float64, в котором строки соответствуют тикерам, а
+столбцы датам. Для любого набора тикеров с диска читаются только их строки, а непрерывный диапазон тикеров является
+представлением отображенного в память файла. Файлы разделяются процессами через страничный кэш и создаются с запасом
+по количеству тикеров и дат, поэтому новые даты и тикеры обычно записываются на место. Изменение панели происходит
+под исключительной блокировкой, а чтение - под разделяемой
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import settings
+from utils import atomic
+
+# Поддиректория глобальной директории данных, в которой хранятся панели
+PANELS_FOLDER = 'panels'
+DTYPE = np.float64
+# Запас по количеству дат и тикеров, который резервируется при перестроении панели
+DATES_RESERVE = 260
+TICKERS_RESERVE = 64
+
+
+class Panel:
+    """Панель значений нескольких полей для набора тикеров
+
+    Тикер считается торгуемым в дату, если хотя бы одно его поле не NaN. Для каждого тикера хранится версия данных,
+    из которых он загружен, что позволяет определить необходимость обновления
+
+    Parameters
+    ----------
+    name
+        Название панели
+    fields
+        Названия полей
+    """
+
+    def __init__(self, name: str, fields: tuple):
+        self._name = name
+        self._fields = tuple(fields)
+        self._metadata = self._load_metadata()
+
+    def __str__(self):
+        return (f'{self.__class__.__name__}(name={self._name}, '
+                f'tickers={len(self.tickers)}, '
+                f'dates={len(self.dates)})')
+
+    def _path(self, suffix: str):
+        """Путь к файлу панели"""
+        return settings.DATA_PATH / PANELS_FOLDER / f'{self._name}.{suffix}'
+
+    def _load_metadata(self):
+        """Загружает описание панели или создает пустое"""
+        try:
+            with open(self._path('json')) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return dict(tickers=[], versions={}, dates=0, capacity=[0, 0])
+
+    def _save_metadata(self):
+        """Атомарно сохраняет описание панели"""
+        atomic.write_json(self._path('json'), self._metadata)
+
+    def _lock(self, shared: bool = False):
+        """Блокировка панели"""
+        return atomic.lock(self._path('lock'), shared)
+
+    @property
+    def tickers(self):
+        """Тикеры в порядке строк панели"""
+        return tuple(self._metadata['tickers'])
+
+    @property
+    def dates(self):
+        """Даты в порядке столбцов панели"""
+        if not self._metadata['dates']:
+            return pd.DatetimeIndex([])
+        dates = np.load(str(self._path('dates.npy')), mmap_mode='r')
+        return pd.DatetimeIndex(dates[:self._metadata['dates']])
+
+    def version(self, ticker: str):
+        """Версия данных, из которых загружен тикер, или None, если тикера нет в панели"""
+        return self._metadata['versions'].get(ticker)
+
+    def _array(self, field: str, mode: str = 'r'):
+        """Массив поля, отображенный в память"""
+        return np.memmap(str(self._path(f'{field}.bin')), dtype=DTYPE, mode=mode,
+                         shape=tuple(self._metadata['capacity']))
+
+    def update(self, ticker: str, df: pd.DataFrame, version=None):
+        """Записывает значения полей для тикера
+
+        Если даты тикера следуют за датами панели и хватает запаса, то они дописываются, иначе панель перестраивается
+
+        Parameters
+        ----------
+        ticker
+            Тикер
+        df
+            Значения с датами в индексе и полями в столбцах - отсутствующие поля заполняются NaN
+        version
+            Версия данных, из которых получены значения
+        """
+        with self._lock():
+            self._metadata = self._load_metadata()
+            self._update(ticker, df.reindex(columns=self._fields), version)
+
+    def append(self, ticker: str, df: pd.DataFrame, version=None):
+        """Дописывает значения полей тикера за даты из df, не изменяя остальные значения тикера
+
+        Используется для новых строк данных тикера, который уже загружен в панель, поэтому стоимость записи зависит
+        только от количества новых строк
+
+        Parameters
+        ----------
+        ticker
+            Тикер, который есть в панели
+        df
+            Новые значения с датами в индексе и полями в столбцах - отсутствующие поля заполняются NaN
+        version
+            Версия данных, из которых получены все значения тикера после дописывания
+        """
+        with self._lock():
+            self._metadata = self._load_metadata()
+            if ticker not in self._metadata['tickers']:
+                raise ValueError(f'Тикера {ticker} нет в панели {self._name}')
+            self._update(ticker, df.reindex(columns=self._fields), version, clear=False)
+
+    def _update(self, ticker: str, df: pd.DataFrame, version, clear: bool = True):
+        """Записывает значения полей для тикера под блокировкой - если clear, то остальные значения тикера стираются"""
+        dates = self.dates
+        new_dates = df.index.difference(dates)
+        n_tickers, n_dates = self._metadata['capacity']
+        is_appendable = (len(new_dates) == 0 or len(dates) == 0 or new_dates[0] > dates[-1])
+        has_space = len(dates) + len(new_dates) <= n_dates
+        has_ticker = ticker in self._metadata['tickers'] or len(self._metadata['tickers']) < n_tickers
+        if not (is_appendable and has_space and has_ticker):
+            self._rebuild(dates.union(df.index), len(self._metadata['tickers']) + 1)
+        elif len(new_dates):
+            self._append_dates(dates.append(new_dates))
+        self._write_row(ticker, df, clear)
+        self._metadata['versions'][ticker] = version
+        self._save_metadata()
+
+    def _append_dates(self, dates: pd.DatetimeIndex):
+        """Сохраняет расширенный перечень дат в пределах запаса"""
+        all_dates = np.full(self._metadata['capacity'][1], np.datetime64('NaT'), dtype='datetime64[ns]')
+        all_dates[:len(dates)] = dates.values
+        np.save(str(self._path('dates.npy')), all_dates)
+        self._metadata['dates'] = len(dates)
+
+    def _write_row(self, ticker: str, df: pd.DataFrame, clear: bool = True):
+        """Записывает значения тикера на место - если clear, то значения за другие даты стираются"""
+        tickers = self._metadata['tickers']
+        if ticker not in tickers:
+            tickers.append(ticker)
+        row = tickers.index(ticker)
+        positions = self.dates.get_indexer(df.index)
+        for field in self._fields:
+            array = self._array(field, 'r+')
+            if clear:
+                array[row, :] = np.nan
+            array[row, positions] = df[field].values
+            array.flush()
+
+    def _rebuild(self, dates: pd.DatetimeIndex, n_tickers: int):
+        """Перестраивает панель для нового набора дат с запасом по датам и тикерам"""
+        old_dates = self.dates
+        old_tickers = len(self._metadata['tickers'])
+        capacity = [n_tickers + TICKERS_RESERVE, len(dates) + DATES_RESERVE]
+        positions = dates.get_indexer(old_dates)
+        settings.DATA_PATH.joinpath(PANELS_FOLDER).mkdir(parents=True, exist_ok=True)
+        for field in self._fields:
+            path = self._path(f'{field}.bin')
+            temp_path = path.with_suffix('.tmp')
+            array = np.memmap(str(temp_path), dtype=DTYPE, mode='w+', shape=tuple(capacity))
+            array[:] = np.nan
+            if old_tickers:
+                array[:old_tickers, positions] = self._array(field)[:old_tickers, :len(old_dates)]
+            array.flush()
+            del array
+            os.replace(temp_path, path)
+        self._metadata['capacity'] = capacity
+        self._append_dates(dates)
+
+    def frame(self, field: str, tickers: tuple):
+        """Значения поля для набора тикеров
+
+        Parameters
+        ----------
+        field
+            Поле панели
+        tickers
+            Тикеры, которые должны быть в панели
+
+        Returns
+        -------
+        pd.DataFrame
+            В строках даты, в которые торговался хотя бы один из тикеров, в столбцах тикеры
+        """
+        with self._lock(shared=True):
+            self._metadata = self._load_metadata()
+            all_tickers = self._metadata['tickers']
+            rows = [all_tickers.index(ticker) for ticker in tickers]
+            if rows and rows == list(range(rows[0], rows[0] + len(rows))):
+                rows = slice(rows[0], rows[0] + len(rows))
+            n_dates = self._metadata['dates']
+            is_traded = np.zeros(n_dates, dtype=bool)
+            for other_field in self._fields:
+                is_traded |= ~np.isnan(self._array(other_field)[rows, :n_dates]).all(axis=0)
+            values = self._array(field)[rows, :n_dates]
+            df = pd.DataFrame(values.T, index=self.dates, columns=list(tickers))
+        return df.loc[is_traded]
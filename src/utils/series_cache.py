@@ -0,0 +1,117 @@
+"""Общий для процесса кэш загруженных серий данных с ограничением по объему памяти
+
+Значения хранятся вместе с версией данных, из которых они загружены, поэтому устаревшее значение не возвращается даже
+без явной инвалидации. При превышении бюджета вытесняются значения, к которым дольше всего не обращались. Значения
+разделяются всеми потребителями и не должны изменяться на месте
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+import settings
+
+
+def size_of(value):
+    """Примерный объем памяти, занимаемый значением, в байтах"""
+    if isinstance(value, (pd.Series, pd.DataFrame, pd.Index)):
+        size = value.memory_usage(deep=True)
+        if isinstance(value, pd.DataFrame):
+            size = size.sum()
+        return int(size)
+    return sys.getsizeof(value)
+
+
+class SeriesCache:
+    """LRU-кэш значений с бюджетом в байтах и счетчиками попаданий, промахов и вытеснений
+
+    Parameters
+    ----------
+    max_bytes
+        Бюджет памяти в байтах - если None, то используется settings.DATA_CACHE_BYTES
+    """
+
+    def __init__(self, max_bytes=None):
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __str__(self):
+        return (f'{self.__class__.__name__}(entries={len(self._entries)}, '
+                f'size={self._size}, '
+                f'max_bytes={self.max_bytes}, '
+                f'hits={self.hits}, '
+                f'misses={self.misses}, '
+                f'evictions={self.evictions})')
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def max_bytes(self):
+        """Бюджет памяти в байтах"""
+        if self._max_bytes is None:
+            return settings.DATA_CACHE_BYTES
+        return self._max_bytes
+
+    @property
+    def size(self):
+        """Объем памяти, занимаемый значениями в кэше, в байтах"""
+        return self._size
+
+    def get(self, key, version):
+        """Значение для ключа, если оно загружено из заданной версии данных, иначе None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, version, value):
+        """Сохраняет значение для ключа и вытесняет давно не используемые значения при превышении бюджета
+
+        Значения, которые больше всего бюджета, не сохраняются
+        """
+        size = size_of(value)
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (version, value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Удаляет значение для ключа"""
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        """Удаляет все значения и обнуляет счетчики"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def _remove(self, key):
+        """Удаляет значение без захвата блокировки"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[2]
+
+
+# Кэш, общий для всех объектов DataFile процесса
+CACHE = SeriesCache()
@@ -0,0 +1,116 @@
+"""Сравнение форматов хранения и алгоритмов сжатия локальных данных
+
+Для выборки серий из каждой категории измеряется время записи, время чтения и размер на диске для всех доступных
+сочетаний формата и сжатия. Результаты используются для выбора settings.DATA_FORMATS и settings.DATA_COMPRESSION:
+python -m utils.storage_benchmark [категория ...]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from utils import compression
+from utils import data_formats
+from utils.data import Data
+from utils.data_file import DataFile
+from utils.data_file import decode_file
+from utils.data_file import encode
+from utils.data_file import yield_data_specs
+
+# Категории по умолчанию - котировки, дивиденды и ML-модели
+STORAGE_KEYS = ('quotes', 'quotes_t2', 'dividends', 'returns_ml', 'dividends_ml')
+# Максимальное количество серий в выборке для каждой категории
+MAX_SERIES = 30
+# Количество повторов замеров - используется лучший результат
+REPEATS = 3
+COLUMNS = ['CATEGORY', 'FORMAT', 'COMPRESSION', 'SERIES', 'WRITE_MS', 'READ_MS', 'SIZE_KB', 'SIZE_RATIO']
+
+
+def sample_values(storage_key: str, max_series: int = MAX_SERIES):
+    """Значения первых max_series серий данных для категории"""
+    values = []
+    for data_category, data_name in yield_data_specs():
+        data_file = DataFile(data_category, data_name)
+        if data_file.storage_key == storage_key:
+            values.append(data_file.value)
+        if len(values) == max_series:
+            break
+    return values
+
+
+def measure(values: list, data_format, codec, folder: Path, repeats: int = REPEATS):
+    """Суммарные время записи, время чтения и размер для серий в заданном формате и со сжатием
+
+    Returns
+    -------
+    tuple
+        Время записи в секундах, время чтения в секундах и размер в байтах
+    """
+    write_time, read_time, size = 0, 0, 0
+    for number, value in enumerate(values):
+        path = folder / f'{number}{data_format.extension}{codec.extension}'
+        data = Data(value)
+        best_write, best_read = float('inf'), float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            path.write_bytes(encode(data_format, codec, data))
+            middle = time.perf_counter()
+            decode_file(path, data_format, codec)
+            end = time.perf_counter()
+            best_write = min(best_write, middle - start)
+            best_read = min(best_read, end - middle)
+        write_time += best_write
+        read_time += best_read
+        size += path.stat().st_size
+        path.unlink()
+    return write_time, read_time, size
+
+
+def benchmark(storage_keys=STORAGE_KEYS, max_series: int = MAX_SERIES, repeats: int = REPEATS):
+    """Сравнивает все доступные сочетания формата и сжатия для категорий данных
+
+    Parameters
+    ----------
+    storage_keys
+        Категории данных. Для данных в корне глобальной директории - их названия
+    max_series
+        Максимальное количество серий в выборке для каждой категории
+    repeats
+        Количество повторов замеров
+
+    Returns
+    -------
+    pd.DataFrame
+        В строках категория, формат и сжатие
+        В столбцах количество серий, время записи и чтения в миллисекундах, размер в килобайтах и его доля от размера
+        в формате Pickle без сжатия. Если ни в одной категории нет серий, то пустой DataFrame с тем же индексом
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as folder:
+        for storage_key in storage_keys:
+            values = sample_values(storage_key, max_series)
+            if not values:
+                continue
+            base_size = None
+            for data_format in data_formats.FORMATS.values():
+                if data_format.is_columnar and data_formats.pyarrow is None:
+                    continue
+                if not all(data_format.is_supported(value) for value in values):
+                    continue
+                for codec in compression.available_codecs():
+                    write_time, read_time, size = measure(values, data_format, codec, Path(folder), repeats)
+                    if base_size is None:
+                        base_size = size
+                    rows.append((storage_key, data_format.name, codec.name or '-', len(values), write_time * 1000,
+                                 read_time * 1000, size / 1024, size / base_size))
+    return pd.DataFrame(rows, columns=COLUMNS).set_index(COLUMNS[:3])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Сравнение форматов хранения и алгоритмов сжатия')
+    parser.add_argument('storage_keys', nargs='*', help='категории данных - по умолчанию котировки, дивиденды и ML')
+    parser.add_argument('--series', type=int, default=MAX_SERIES, help='количество серий в каждой категории')
+    args = parser.parse_args()
+    print(benchmark(args.storage_keys or STORAGE_KEYS, args.series).round(3))
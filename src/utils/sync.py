@@ -0,0 +1,157 @@
+"""Синхронизация локальных данных между директориями
+
+Источником и приемником может быть любая директория с данными в формате DataFile - глобальная директория данных,
+сетевая папка или смонтированное объектное хранилище. Серии сравниваются по каталогам, а неполные каталоги
+дополняются обходом директории, поэтому неизмененные серии не читаются. Для измененных серий переносятся только
+файлы, хэши которых отличаются, - обычно это новые сегменты с дописанными строками и метаданные. Время работы
+пропорционально объему изменений:
+python -m utils.sync источник [приемник]
+"""
+import argparse
+import json
+from pathlib import Path
+
+import settings
+from utils import atomic
+from utils import catalog
+from utils.data_file import DataFile
+from utils.data_file import load_catalog
+from utils.data_file import walk_data_specs
+
+# Поля каталога, совпадение которых означает совпадение серий
+COMPARED_COLUMNS = ['HASH', 'LAST_UPDATE', 'SEGMENTS', 'SNAPSHOTS']
+# Результаты синхронизации серии
+FULL = 'full'
+APPEND = 'append'
+METADATA = 'metadata'
+
+
+def _catalog(data_path: Path):
+    """Сравниваемые поля каталога директории данных для каждой пары (категория данных, название данных)
+
+    Каталог глобальной директории при необходимости сверяется с ней. Если каталог другой директории не отмечен
+    полным, то перечень серий берется из обхода директории, а для серий, которых нет в каталоге, поля равны None
+    """
+    if data_path == settings.DATA_PATH:
+        df = load_catalog()
+    elif catalog.exists(data_path):
+        df = catalog.entries(data_path=data_path)
+    else:
+        raise ValueError(f'В директории {data_path} нет каталога данных')
+    values = dict(zip(catalog.specs(df), df[COMPARED_COLUMNS].itertuples(index=False, name=None)))
+    if data_path == settings.DATA_PATH or catalog.is_complete(data_path):
+        return values
+    return {spec: values.get(spec) for spec in walk_data_specs(data_path)}
+
+
+def changed_specs(source: Path, target: Path):
+    """Серии, которые отсутствуют в приемнике или отличаются от источника по каталогу
+
+    Серии, которых нет в неполном каталоге одной из директорий, считаются измененными - их метаданные сравниваются
+    при синхронизации
+    """
+    source_catalog = _catalog(source)
+    try:
+        target_catalog = _catalog(target)
+    except ValueError:
+        target_catalog = dict()
+    return [spec for spec, values in source_catalog.items() if values is None or target_catalog.get(spec) != values]
+
+
+def _read_metadata(path: Path):
+    """Метаданные серии или None, если их нет"""
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def sync_series(data_category, data_name: str, source: Path, target: Path):
+    """Переносит изменения одной серии из источника в приемник
+
+    Серия блокируется в обеих директориях. Измененные файлы записываются атомарно, метаданные - последними, а
+    файлы, которых нет в источнике, удаляются
+
+    Returns
+    -------
+    tuple
+        Результат - FULL, APPEND, METADATA или None, если серии совпадают, и количество перенесенных байт
+    """
+    data_file = DataFile(data_category, data_name)
+    metadata_path = data_file.metadata_path.relative_to(settings.DATA_PATH)
+    lock_path = data_file.lock_path.relative_to(settings.DATA_PATH)
+    with atomic.lock(source / lock_path, shared=True), atomic.lock(target / lock_path):
+        source_metadata = _read_metadata(source / metadata_path)
+        target_metadata = _read_metadata(target / metadata_path)
+        if source_metadata == target_metadata:
+            return None, 0
+        source_files = _relative_files(data_file, source_metadata)
+        target_files = _relative_files(data_file, target_metadata)
+        transferred = 0
+        for path, file_hash in source_files.items():
+            if target_files.get(path) != file_hash:
+                data = (source / path).read_bytes()
+                (target / path).parent.mkdir(parents=True, exist_ok=True)
+                atomic.write_bytes(target / path, data)
+                transferred += len(data)
+        atomic.write_json(target / metadata_path, source_metadata)
+        for path in target_files:
+            if path not in source_files and (target / path).exists():
+                (target / path).unlink()
+        size = sum((target / path).stat().st_size for path in source_files)
+        catalog.record(data_category, data_name, source_metadata, size, target)
+    if transferred == 0:
+        return METADATA, transferred
+    if target_metadata is not None and target_metadata['hash'] == source_metadata['hash']:
+        return APPEND, transferred
+    return FULL, transferred
+
+
+def _relative_files(data_file: DataFile, metadata):
+    """Хэши файлов серии по путям относительно директории данных"""
+    if metadata is None:
+        return dict()
+    return {path.relative_to(settings.DATA_PATH): file_hash for path, file_hash in data_file.files(metadata)}
+
+
+def sync(source, target=None):
+    """Переносит в приемник все серии, которые отличаются от источника
+
+    Серии, которых нет в источнике, в приемнике не удаляются
+
+    Parameters
+    ----------
+    source
+        Директория данных, из которой переносятся изменения. Должна содержать каталог данных
+    target
+        Директория данных, в которую переносятся изменения - по умолчанию глобальная
+
+    Returns
+    -------
+    dict
+        Перечни пар (категория данных, название данных) для каждого результата синхронизации - FULL, APPEND и
+        METADATA, а также количество перенесенных байт
+    """
+    source = Path(source)
+    target = Path(target or settings.DATA_PATH)
+    result = {FULL: [], APPEND: [], METADATA: [], 'bytes': 0}
+    for spec in changed_specs(source, target):
+        kind, transferred = sync_series(*spec, source, target)
+        if kind is not None:
+            result[kind].append(spec)
+        result['bytes'] += transferred
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Синхронизация локальных данных между директориями')
+    parser.add_argument('source', help='директория, из которой переносятся изменения')
+    parser.add_argument('target', nargs='?', help='директория, в которую переносятся изменения - по умолчанию '
+                                                  'глобальная директория данных')
+    args = parser.parse_args()
+    report = sync(args.source, args.target)
+    print(f'Полностью перенесено серий - {len(report[FULL])}\n'
+          f'Дописано строк в серий - {len(report[APPEND])}\n'
+          f'Обновлены только метаданные серий - {len(report[METADATA])}\n'
+          f'Перенесено байт - {report["bytes"]}')
@@ -0,0 +1,247 @@
+"""Телеметрия создания и обновления локальных данных
+
+Менеджеры данных измеряют для каждой серии время работы, проверки и записи, а также количество добавленных строк, а
+функции загрузки из интернета - количество запросов и загруженных байт. Измерения относятся к серии, которая
+обновляется в текущем потоке или задаче asyncio, и после обновления записываются строкой JSON в файл телеметрии в
+глобальной директории данных. Сводка с самыми медленными сериями и итогами последнего запуска:
+python -m utils.telemetry [--top количество] [--run запуск]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import threading
+import time
+import weakref
+
+import pandas as pd
+
+import settings
+
+# Файл телеметрии в глобальной директории данных
+TELEMETRY_FILE = 'telemetry.jsonl'
+# Размер файла, после которого он переименовывается в файл с суффиксом .old, а записи начинаются в новом файле
+MAX_BYTES = 16 * 2 ** 20
+# Идентификатор запуска - общий для всех серий, обновленных одним процессом
+RUN_ID = f'{int(time.time())}-{os.getpid()}'
+# Счетчики серии и их описания
+COUNTERS = dict(seconds='общее время, с',
+                requests='запросов',
+                bytes='загружено байт',
+                rows='добавлено строк',
+                validation='время проверки, с',
+                write='время записи, с')
+COLUMNS = ['run', 'time', 'category', 'name', 'action', *COUNTERS, 'error']
+# Сборщики для обновлений в потоках и в задачах asyncio
+_LOCAL = threading.local()
+_TASKS = weakref.WeakKeyDictionary()
+_WRITE_LOCK = threading.Lock()
+
+
+class Collector:
+    """Счетчики телеметрии одной серии данных
+
+    Счетчики могут увеличиваться одновременно из нескольких потоков, например при загрузке данных в пуле потоков
+    цикла событий
+    """
+
+    def __init__(self, data_category, data_name: str, action: str):
+        self._record = dict(run=RUN_ID, time=time.time(), category=data_category, name=data_name, action=action)
+        self._record.update((counter, 0) for counter in COUNTERS)
+        self._record['error'] = None
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return f'{self.__class__.__name__}({self._record})'
+
+    def add(self, counter: str, value):
+        """Увеличивает счетчик"""
+        with self._lock:
+            self._record[counter] += value
+
+    def fail(self, error: Exception):
+        """Запоминает ошибку обновления"""
+        with self._lock:
+            self._record['error'] = repr(error)
+
+    @property
+    def record(self):
+        """Запись телеметрии - словарь с полями COLUMNS"""
+        with self._lock:
+            return dict(self._record)
+
+
+def _current_task():
+    """Текущая задача asyncio или None, если код выполняется вне цикла событий"""
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+def current():
+    """Сборщик серии, которая обновляется в текущей задаче asyncio или текущем потоке, или None"""
+    task = _current_task()
+    if task is not None and task in _TASKS:
+        return _TASKS[task]
+    return getattr(_LOCAL, 'collector', None)
+
+
+def _activate(collector):
+    """Делает сборщик текущим и возвращает предыдущий"""
+    task = _current_task()
+    if task is not None:
+        previous = _TASKS.get(task)
+        if collector is None:
+            _TASKS.pop(task, None)
+        else:
+            _TASKS[task] = collector
+        return previous
+    previous = getattr(_LOCAL, 'collector', None)
+    _LOCAL.collector = collector
+    return previous
+
+
+@contextlib.contextmanager
+def series(data_category, data_name: str, action: str):
+    """Собирает телеметрию создания или обновления серии и записывает ее после завершения
+
+    Parameters
+    ----------
+    data_category
+        Категория данных
+    data_name
+        Название серии данных
+    action
+        Действие - create или update
+    """
+    collector = Collector(data_category, data_name, action)
+    previous = _activate(collector)
+    start = time.perf_counter()
+    try:
+        yield collector
+    except Exception as error:
+        collector.fail(error)
+        raise
+    finally:
+        collector.add('seconds', time.perf_counter() - start)
+        _activate(previous)
+        write(collector.record)
+
+
+def add(counter: str, value):
+    """Увеличивает счетчик текущей серии - вне обновления серии ничего не происходит"""
+    collector = current()
+    if collector is not None:
+        collector.add(counter, value)
+
+
+def count_request(size: int):
+    """Учитывает запрос к внешнему сайту и размер ответа в байтах"""
+    add('requests', 1)
+    add('bytes', size)
+
+
+@contextlib.contextmanager
+def timer(counter: str):
+    """Добавляет время выполнения блока к счетчику текущей серии"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(counter, time.perf_counter() - start)
+
+
+def bind(func):
+    """Функция, которая при вызове в другом потоке относит измерения к текущей серии - для пула потоков"""
+    collector = current()
+
+    def bound(*args, **kwargs):
+        previous = getattr(_LOCAL, 'collector', None)
+        _LOCAL.collector = collector
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _LOCAL.collector = previous
+
+    return bound
+
+
+async def gather(*coroutines):
+    """Вариант asyncio.gather, в котором измерения дочерних задач относятся к текущей серии"""
+    collector = current()
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    if collector is not None:
+        for task in tasks:
+            _TASKS[task] = collector
+    return await asyncio.gather(*tasks)
+
+
+def path():
+    """Путь к файлу телеметрии в глобальной директории данных"""
+    return settings.DATA_PATH / TELEMETRY_FILE
+
+
+def write(record: dict):
+    """Дописывает запись в файл телеметрии, если телеметрия включена в settings.DATA_TELEMETRY"""
+    if not settings.DATA_TELEMETRY:
+        return
+    file_path = path()
+    line = json.dumps(record, ensure_ascii=False) + '\n'
+    with _WRITE_LOCK:
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        if file_path.exists() and file_path.stat().st_size > MAX_BYTES:
+            os.replace(str(file_path), str(file_path.with_name(file_path.name + '.old')))
+        with open(file_path, 'a', encoding='utf-8') as file:
+            file.write(line)
+
+
+def load():
+    """Все записи телеметрии - в строках серии в порядке записи, в столбцах COLUMNS"""
+    if not path().exists():
+        return pd.DataFrame(columns=COLUMNS)
+    with open(path(), encoding='utf-8') as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    return pd.DataFrame(records, columns=COLUMNS)
+
+
+def summary(top: int = 10, run: str = None):
+    """Сводка телеметрии запуска
+
+    Parameters
+    ----------
+    top
+        Количество самых медленных серий
+    run
+        Идентификатор запуска - по умолчанию последний запуск в файле телеметрии
+
+    Returns
+    -------
+    tuple
+        Идентификатор запуска, самые медленные серии по убыванию времени и итоги по всем сериям запуска - количество
+        серий, ошибок и суммы счетчиков
+    """
+    df = load()
+    if df.empty:
+        return None, df, pd.Series(dtype=float)
+    if run is None:
+        run = df['run'].iloc[-1]
+    df = df[df['run'] == run]
+    slowest = df.sort_values('seconds', ascending=False).head(top)
+    totals = df[list(COUNTERS)].sum()
+    totals['series'] = len(df)
+    totals['errors'] = int(df['error'].notna().sum())
+    return run, slowest.reset_index(drop=True), totals
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Сводка телеметрии обновления локальных данных')
+    parser.add_argument('--top', type=int, default=10, help='количество самых медленных серий')
+    parser.add_argument('--run', help='идентификатор запуска - по умолчанию последний')
+    args = parser.parse_args()
+    run_id, slowest_series, run_totals = summary(args.top, args.run)
+    if run_id is None:
+        print('Нет записей телеметрии')
+    else:
+        print(f'Запуск {run_id}\n\nСамые медленные серии:\n{slowest_series}\n\nИтого:\n{run_totals}')
@@ -0,0 +1,69 @@
+import multiprocessing
+import time
+
+import pytest
+
+from utils import atomic
+
+
+def hold_lock(path, started, seconds):
+    with atomic.lock(path):
+        started.set()
+        time.sleep(seconds)
+
+
+def test_write_bytes(tmp_path):
+    path = tmp_path / 'file.bin'
+    atomic.write_bytes(path, b'data')
+    atomic.write_bytes(path, b'new data')
+    assert path.read_bytes() == b'new data'
+    assert [file.name for file in tmp_path.iterdir()] == ['file.bin']
+
+
+def test_write_bytes_error(tmp_path):
+    path = tmp_path / 'file.bin'
+    atomic.write_bytes(path, b'data')
+    with pytest.raises(TypeError):
+        atomic.write_bytes(path, 'not bytes')
+    assert path.read_bytes() == b'data'
+    assert [file.name for file in tmp_path.iterdir()] == ['file.bin']
+
+
+def test_write_json(tmp_path):
+    path = tmp_path / 'file.json'
+    atomic.write_json(path, dict(a=[1, 2]))
+    assert path.read_text() == '{"a": [1, 2]}'
+
+
+def test_reentrant_lock(tmp_path):
+    path = tmp_path / 'sub' / 'file.lock'
+    with atomic.lock(path):
+        with atomic.lock(path, shared=True):
+            with atomic.lock(path):
+                assert path.exists()
+
+
+def test_no_upgrade(tmp_path):
+    path = tmp_path / 'file.lock'
+    with atomic.lock(path, shared=True):
+        with pytest.raises(RuntimeError):
+            with atomic.lock(path):
+                pass
+        with atomic.lock(path, shared=True):
+            pass
+    with atomic.lock(path):
+        pass
+
+
+@pytest.mark.skipif(atomic.fcntl is None, reason='блокировки между процессами требуют fcntl')
+def test_lock_between_processes(tmp_path):
+    path = tmp_path / 'file.lock'
+    started = multiprocessing.Event()
+    process = multiprocessing.Process(target=hold_lock, args=(path, started, 0.5))
+    process.start()
+    started.wait()
+    start = time.perf_counter()
+    with atomic.lock(path, shared=True):
+        waited = time.perf_counter() - start
+    process.join()
+    assert waited > 0.3
@@ -0,0 +1,104 @@
+from pathlib import Path
+
+import arrow
+import pandas as pd
+import pytest
+
+import settings
+from utils import catalog
+from utils import data_manager
+from utils import series_cache
+from utils.batch_manager import BatchDataManager
+from utils.data_file import load_catalog
+
+CREATED = []
+
+
+@pytest.fixture(autouse=True)
+def make_temp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_PATH', Path(tmp_path))
+    CREATED.clear()
+
+
+class DataManager(data_manager.AbstractDataManager):
+    def __init__(self, ticker):
+        CREATED.append(ticker)
+        super().__init__('batch', ticker)
+
+    def download_all(self):
+        size = len(self.data_name)
+        index = pd.date_range('2018-01-01', periods=size)
+        return pd.DataFrame({'A': range(size), 'B': [float(size)] * size}, index=index, dtype='float64')
+
+    def download_update(self):
+        return self.download_all()
+
+
+def test_refresh_only_stale():
+    batch = BatchDataManager(DataManager, ('X', 'YY', 'X'))
+    assert set(CREATED) == {'X', 'YY'}
+    assert batch.stale == ()
+    CREATED.clear()
+    BatchDataManager(DataManager, ('X', 'YY', 'ZZZ'))
+    assert CREATED == ['X', 'ZZZ']
+    CREATED.clear()
+    week = arrow.now().shift(weeks=1)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(arrow, 'now', lambda: week)
+        assert BatchDataManager(DataManager, ('X', 'YY')).refresh() == ('X', 'YY')
+
+
+def test_deferred():
+    with data_manager.deferred_refresh():
+        batch = BatchDataManager(DataManager, ('X', 'YY'))
+    assert batch.stale == ('X', 'YY')
+    assert batch.last_updates.isna().all()
+    assert batch.refresh() == ('X', 'YY')
+    assert batch.stale == ()
+
+
+def test_frame():
+    batch = BatchDataManager(DataManager, ('YY', 'X'))
+    df = batch.frame('B')
+    assert df.columns.tolist() == ['YY', 'X']
+    assert df.index.tolist() == list(pd.date_range('2018-01-01', periods=2))
+    assert df['YY'].tolist() == [2.0, 2.0]
+    assert df['X'].iloc[0] == 1.0
+    assert pd.isna(df['X'].iloc[1])
+    assert batch.frame('B') is df
+    assert BatchDataManager(DataManager, ('YY', 'X')).frame('B') is df
+    assert batch.frame('A') is not df
+
+
+def test_versions():
+    batch = BatchDataManager(DataManager, ('X', 'YY'))
+    versions = batch.versions
+    assert list(versions) == [('batch', 'X'), ('batch', 'YY')]
+    df = batch.frame('A')
+    data_manager.DataFile('batch', 'X').append(pd.DataFrame({'A': [5.0], 'B': [1.0]},
+                                                            index=[pd.Timestamp('2018-01-05')]))
+    assert batch.versions == versions
+    batch = BatchDataManager(DataManager, ('X', 'YY'))
+    assert batch.versions[('batch', 'X')] != versions[('batch', 'X')]
+    assert batch.versions[('batch', 'YY')] == versions[('batch', 'YY')]
+    assert batch.frame('A')['X'].dropna().tolist() == [0.0, 5.0]
+    assert series_cache.CACHE.get(('batch', str(settings.DATA_PATH), 'batch', 'A', ('X', 'YY')),
+                                  tuple(versions.values())) is None
+    assert df['X'].dropna().tolist() == [0.0]
+
+
+def test_empty_tickers():
+    with pytest.raises(ValueError) as error:
+        BatchDataManager(DataManager, ())
+    assert 'Пустой набор тикеров' in str(error.value)
+
+
+def test_register_missing_in_catalog():
+    BatchDataManager(DataManager, ('X', 'YY'))
+    catalog.remove('batch', 'YY')
+    CREATED.clear()
+    batch = BatchDataManager(DataManager, ('X', 'YY'))
+    assert CREATED == ['X']
+    assert batch.last_updates.notna().all()
+    assert batch.versions[('batch', 'YY')][0] is not None
+    assert load_catalog('batch', ('YY',))['NAME'].tolist() == ['YY']
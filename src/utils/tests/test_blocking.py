@@ -0,0 +1,30 @@
+import asyncio
+import threading
+
+import settings
+from utils import blocking
+
+
+def test_executor_size(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_ASYNC_REQUESTS', 3)
+    monkeypatch.setattr(blocking, '_EXECUTOR', None)
+    executor = blocking.executor()
+    assert executor._max_workers == 3
+    assert blocking.executor() is executor
+    executor.shutdown()
+
+
+def test_run(monkeypatch):
+    monkeypatch.setattr(blocking, '_EXECUTOR', None)
+
+    def request(size):
+        return size, threading.current_thread().name
+
+    loop = asyncio.new_event_loop()
+    try:
+        size, name = loop.run_until_complete(blocking.run(request, 5))
+    finally:
+        loop.close()
+    assert size == 5
+    assert name.startswith('blocking')
+    blocking.executor().shutdown()
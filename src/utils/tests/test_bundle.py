@@ -0,0 +1,101 @@
+import io
+import tarfile
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import settings
+from utils import bundle
+from utils import catalog
+from utils import compression
+from utils.data_file import DataFile
+
+SERIES = pd.Series([1.0, 2.0], index=pd.DatetimeIndex(['2018-01-01', '2018-01-02']))
+
+
+@pytest.fixture(name='source')
+def make_source(tmpdir, monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat1',))
+    monkeypatch.setattr(settings, 'DATA_PATH', Path(tmpdir) / 'source')
+    DataFile('cat1', 'data1').value = SERIES
+    DataFile('cat1', 'data1').append(pd.Series([3.0], index=pd.DatetimeIndex(['2018-01-03'])))
+    DataFile('cat2', 'data1').value = pd.DataFrame({'col': [1, 2]})
+    DataFile(None, 'root').value = {'a': 1}
+    return Path(tmpdir)
+
+
+def test_export_import(source, monkeypatch):
+    path = source / 'data.tar.xz'
+    manifest = bundle.export_bundle(path, codec_name=compression.LZMA)
+    assert manifest['version'] == bundle.BUNDLE_VERSION
+    assert len(manifest['series']) == 3
+    monkeypatch.setattr(settings, 'DATA_PATH', source / 'target')
+    DataFile('cat2', 'data1').value = pd.DataFrame({'col': [3]})
+    assert len(bundle.import_bundle(path)) == 3
+    appended = pd.Series([3.0], index=pd.DatetimeIndex(['2018-01-03']))
+    assert DataFile('cat1', 'data1').value.equals(pd.concat([SERIES, appended]))
+    assert DataFile('cat2', 'data1').value.equals(pd.DataFrame({'col': [1, 2]}))
+    assert DataFile(None, 'root').value == {'a': 1}
+    assert len(catalog.entries()) == 3
+    assert not list(source.glob('.bundle-*'))
+
+
+def test_export_not_in_catalog(source):
+    catalog.remove('cat2', 'data1')
+    catalog.mark_complete()
+    manifest = bundle.export_bundle(source / 'data.tar', codec_name=None)
+    assert len(manifest['series']) == 3
+    assert len(catalog.entries()) == 3
+
+
+def test_export_categories(source):
+    manifest = bundle.export_bundle(source / 'data.tar', ['cat2'], None)
+    assert [(series['category'], series['name']) for series in manifest['series']] == [('cat2', 'data1')]
+
+
+def test_unsupported_compression(source):
+    with pytest.raises(ValueError):
+        bundle.export_bundle(source / 'data.tar', codec_name=compression.ZSTD)
+
+
+def rewrite_bundle(path, name, data):
+    """Заменяет содержимое файла в архиве"""
+    with tarfile.open(str(path)) as tar:
+        files = {member.name: tar.extractfile(member).read() for member in tar}
+    files[name] = data
+    with tarfile.open(str(path), 'w') as tar:
+        for file_name, file_data in files.items():
+            info = tarfile.TarInfo(file_name)
+            info.size = len(file_data)
+            tar.addfile(info, io.BytesIO(file_data))
+
+
+def test_corrupted_bundle(source, monkeypatch):
+    path = source / 'data.tar'
+    manifest = bundle.export_bundle(path, codec_name=None)
+    rewrite_bundle(path, manifest['series'][0]['files'][0]['file'], b'broken')
+    monkeypatch.setattr(settings, 'DATA_PATH', source / 'target')
+    with pytest.raises(ValueError) as error_info:
+        bundle.import_bundle(path)
+    assert 'Поврежден файл архива' in str(error_info.value)
+    assert list(settings.DATA_PATH.iterdir()) == []
+
+
+def test_newer_bundle(source):
+    path = source / 'data.tar'
+    bundle.export_bundle(path, codec_name=None)
+    rewrite_bundle(path, bundle.MANIFEST, b'{"version": 100, "series": []}')
+    with pytest.raises(ValueError) as error_info:
+        bundle.import_bundle(path)
+    assert 'Версия архива 100 новее поддерживаемой' in str(error_info.value)
+
+
+def test_unsafe_bundle(source):
+    path = source / 'data.tar'
+    bundle.export_bundle(path, codec_name=None)
+    rewrite_bundle(path, '../evil', b'evil')
+    with pytest.raises(ValueError) as error_info:
+        bundle.import_bundle(path)
+    assert 'Недопустимый файл в архиве ../evil' == str(error_info.value)
+    assert not (source / 'evil').exists()
@@ -0,0 +1,112 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import settings
+from utils import catalog
+from utils import data_file
+from utils import series_cache
+from utils import verify
+from utils.data_file import DataFile
+from utils.data_file import load_catalog
+from utils.data_file import rebuild_catalog
+from utils.data_file import yield_data_specs
+
+
+@pytest.fixture(autouse=True)
+def make_temp_dir(tmpdir):
+    saved_path = settings.DATA_PATH
+    settings.DATA_PATH = Path(tmpdir)
+    yield
+    settings.DATA_PATH = saved_path
+
+
+def make_data():
+    DataFile('cat1', 'data1').value = pd.Series([1, 2], index=pd.DatetimeIndex(['2018-01-01', '2018-01-02']))
+    DataFile('cat1', 'data2').value = pd.Series([3])
+    DataFile(None, 'root').value = {'a': 1}
+
+
+def test_record_on_write():
+    assert not catalog.exists()
+    make_data()
+    df = catalog.entries()
+    assert catalog.specs(df) == [(None, 'root'), ('cat1', 'data1'), ('cat1', 'data2')]
+    row = df.iloc[1]
+    data_file = DataFile('cat1', 'data1')
+    assert row['ROWS'] == 2
+    assert row['FIRST'] == '2018-01-01T00:00:00'
+    assert row['LAST_UPDATE'] == data_file.last_update
+    assert row['HASH'] == data_file.metadata['hash']
+    assert row['SIZE'] == data_file.data_path.stat().st_size
+    assert pd.isna(df.iloc[0]['ROWS'])
+
+
+def test_query():
+    make_data()
+    assert catalog.specs(catalog.entries('cat1', 'ROWS = ?', (1,))) == [('cat1', 'data2')]
+    catalog.remove('cat1', 'data2')
+    assert catalog.specs(catalog.entries('cat1')) == [('cat1', 'data1')]
+
+
+def test_rebuild():
+    make_data()
+    catalog.path().unlink()
+    assert list(yield_data_specs()) == [(None, 'root'), ('cat1', 'data1'), ('cat1', 'data2')]
+    catalog.clear()
+    assert rebuild_catalog() == 3
+    assert verify.verify(deep=True) == []
+
+
+def test_verify():
+    make_data()
+    load_catalog()
+    catalog.remove('cat1', 'data2')
+    DataFile('cat1', 'data1').data_path.write_bytes(b'broken')
+    DataFile(None, 'root').data_path.unlink()
+    DataFile(None, 'root').metadata_path.unlink()
+    problems = verify.verify()
+    assert ('cat1', 'data2', 'серия отсутствует в каталоге') in problems
+    assert (None, 'root', 'в каталоге есть серия без данных') in problems
+    assert [problem for problem in problems if problem[:2] == ('cat1', 'data1')] == [
+        ('cat1', 'data1', f'размер файлов 6 не совпадает с каталогом {catalog.entries("cat1")["SIZE"][0]}')]
+    deep_problems = verify.verify(deep=True)
+    assert ('cat1', 'data1', 'хэш файла cat1.pickle4 не совпадает с метаданными') in deep_problems
+
+
+def test_last_access():
+    make_data()
+    assert catalog.entries()['LAST_ACCESS'].isna().all()
+    series_cache.CACHE.clear()
+    DataFile('cat1', 'data1').value
+    catalog.touch(None, 'root', 100.0)
+    df = catalog.entries()
+    assert df['LAST_ACCESS'].tolist()[0] == 100.0
+    assert df['LAST_ACCESS'].tolist()[1] > 100.0
+    assert pd.isna(df['LAST_ACCESS'].tolist()[2])
+    rebuild_catalog()
+    assert catalog.entries()['LAST_ACCESS'].tolist()[0] == 100.0
+    catalog.remove(None, 'root')
+    assert catalog.specs(catalog.entries()) == [('cat1', 'data1'), ('cat1', 'data2')]
+
+
+def test_partial_catalog_reconciled():
+    make_data()
+    for spec in [('cat1', 'data1'), ('cat1', 'data2'), (None, 'root')]:
+        DataFile(*spec).metadata_path.unlink()
+    catalog.path().unlink()
+    DataFile('cat1', 'data1')
+    assert catalog.specs(catalog.entries()) == [('cat1', 'data1')]
+    assert not catalog.is_complete()
+    assert catalog.specs(load_catalog()) == [(None, 'root'), ('cat1', 'data1'), ('cat1', 'data2')]
+    assert catalog.is_complete()
+    DataFile(None, 'root').data_path.unlink()
+    DataFile(None, 'root').metadata_path.unlink()
+    DataFile('cat2', 'data3').value = pd.Series([4])
+    catalog.remove('cat2', 'data3')
+    assert len(load_catalog()) == 3
+    assert data_file.reconcile_catalog() == ([('cat2', 'data3')], [(None, 'root')])
+    assert catalog.specs(load_catalog()) == [('cat1', 'data1'), ('cat1', 'data2'), ('cat2', 'data3')]
+    catalog.clear()
+    assert not catalog.is_complete()
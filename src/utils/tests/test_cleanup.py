@@ -0,0 +1,70 @@
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import settings
+from utils import bundle
+from utils import catalog
+from utils import cleanup
+from utils.data_file import DataFile
+
+SERIES = pd.Series([1.0, 2.0], index=pd.DatetimeIndex(['2018-01-01', '2018-01-02']))
+OLD = time.time() - 100 * cleanup.DAY
+
+
+@pytest.fixture(autouse=True)
+def make_temp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_PATH', Path(tmp_path) / 'data')
+    monkeypatch.setattr(settings, 'DATA_ARCHIVE_PATH', Path(tmp_path) / 'archive')
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('quotes',))
+    DataFile(None, 'securities_info').value = pd.DataFrame({'LOT_SIZE': [1, 10]}, index=['AKRN', 'GAZP'])
+    for ticker in ('AKRN', 'GAZP', 'DELISTED'):
+        DataFile('quotes', ticker).value = SERIES
+    DataFile('quotes', 'GAZP').append(pd.Series([3.0], index=pd.DatetimeIndex(['2018-01-03'])))
+    DataFile('dohod.ru', 'AKRN').value = SERIES
+    DataFile('dohod.ru', 'GAZP').value = SERIES
+    DataFile(None, 'cpi').value = SERIES
+    for spec in [('quotes', 'DELISTED'), ('dohod.ru', 'AKRN'), (None, 'cpi'), ('quotes', 'AKRN')]:
+        catalog.touch(*spec, OLD)
+        catalog.record(*spec, dict(DataFile(*spec).metadata, last_update=OLD), 0)
+
+
+def test_dead_specs():
+    assert cleanup.dead_specs() == [('dohod.ru', 'AKRN'), ('quotes', 'DELISTED')]
+    assert cleanup.dead_specs(days=200) == []
+
+
+def test_no_securities_info():
+    DataFile(None, 'securities_info').remove()
+    assert cleanup.dead_specs() == [('dohod.ru', 'AKRN')]
+
+
+def test_dry_run():
+    result = cleanup.collect(dry_run=True)
+    assert result['archived'] == [('dohod.ru', 'AKRN'), ('quotes', 'DELISTED')]
+    assert result['compacted'] == [('quotes', 'GAZP')]
+    assert result['archive'] is None
+    assert (settings.DATA_PATH / 'DELISTED').exists()
+
+
+def test_dry_run_partial_catalog():
+    catalog.remove('quotes', 'GAZP')
+    catalog.mark_complete()
+    result = cleanup.collect(dry_run=True)
+    assert result['compacted'] == [('quotes', 'GAZP')]
+    sizes = [path.stat().st_size for spec in result['archived'] for path, _ in DataFile(*spec).files()]
+    assert result['reclaimed'] == sum(sizes) > 0
+
+
+def test_collect():
+    result = cleanup.collect()
+    assert result['reclaimed'] > 0
+    assert not (settings.DATA_PATH / 'DELISTED').exists()
+    assert DataFile('dohod.ru', 'AKRN').value is None
+    assert DataFile('quotes', 'AKRN').value.equals(SERIES)
+    assert DataFile('quotes', 'GAZP').metadata['segments'] == []
+    assert ('quotes', 'DELISTED') not in catalog.specs(catalog.entries())
+    assert bundle.import_bundle(result['archive']) == [('dohod.ru', 'AKRN'), ('quotes', 'DELISTED')]
+    assert DataFile('quotes', 'DELISTED').value.equals(SERIES)
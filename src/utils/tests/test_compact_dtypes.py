@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import settings
+from utils import compact_dtypes
+from utils import data_formats
+from utils.data_file import DataFile
+
+
+@pytest.fixture(name='data_path')
+def make_temp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_PATH', Path(tmp_path))
+    return tmp_path
+
+
+def make_quotes():
+    index = pd.DatetimeIndex(['2018-01-10', '2018-01-11', '2018-01-12'], name='DATE')
+    return pd.DataFrame(data={'CLOSE_PRICE': [1234.56, 1240.1, 1238.7], 'VOLUME': [10, 0, 5]}, index=index)
+
+
+def test_compact_frame():
+    df = make_quotes()
+    value, info = compact_dtypes.compact(df)
+    assert value['CLOSE_PRICE'].dtype == np.float32
+    assert value['VOLUME'].dtype == np.uint32
+    assert value[compact_dtypes.DAYS_COLUMN].dtype == np.int32
+    assert isinstance(value.index, pd.RangeIndex)
+    assert 0 < info['max_error'] < settings.DATA_COMPACT_TOLERANCE
+    restored = compact_dtypes.restore(value, info)
+    assert restored.dtypes.tolist() == df.dtypes.tolist()
+    assert restored.index.equals(df.index)
+    assert restored.index.name == 'DATE'
+    assert np.allclose(restored.values, df.values, rtol=settings.DATA_COMPACT_TOLERANCE)
+
+
+def test_precision_guard():
+    df = pd.DataFrame(data={'PRICE': [1.000000001, 1e300], 'NEGATIVE': [-1.1, 2]})
+    value, info = compact_dtypes.compact(df, tolerance=1e-12)
+    assert value['PRICE'].dtype == np.float64
+    assert value['NEGATIVE'].dtype == np.float64
+    assert info is None
+    value, info = compact_dtypes.compact(df)
+    assert value['NEGATIVE'].dtype == np.float32
+    assert value['PRICE'].dtype == np.float64
+
+
+def test_integers():
+    df = pd.DataFrame(data={'SIGNED': [-1, 2], 'LARGE': [0, 2 ** 40], 'WHOLE': [1.0, 3.0]})
+    value, info = compact_dtypes.compact(df)
+    assert value['SIGNED'].dtype == np.int32
+    assert value['LARGE'].dtype == np.uint64
+    assert value['WHOLE'].dtype == np.uint32
+    assert info['max_error'] == 0
+    assert compact_dtypes.restore(value, info).equals(df)
+
+
+def test_series_and_partial_restore():
+    series = pd.Series([1.5, np.nan, 2.5], index=pd.DatetimeIndex(['2018-01-10', '2018-01-11', '2018-01-12']),
+                       name='AKRN')
+    value, info = compact_dtypes.compact(series)
+    assert isinstance(value, pd.DataFrame)
+    assert compact_dtypes.columns_to_read(info, ['X']) is None
+    assert compact_dtypes.restore(value, info).equals(series)
+    value, info = compact_dtypes.compact(make_quotes())
+    columns = compact_dtypes.columns_to_read(info, ['VOLUME'])
+    assert columns == ['VOLUME', compact_dtypes.DAYS_COLUMN]
+    assert compact_dtypes.restore(value[columns], info).equals(make_quotes()[['VOLUME']])
+
+
+def test_not_compacted():
+    assert compact_dtypes.compact(1) == (1, None)
+    series = pd.Series(['a', 'b'])
+    value, info = compact_dtypes.compact(series)
+    assert value is series
+    assert info is None
+
+
+def test_report(data_path, monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_FORMATS', dict(quotes=data_formats.FEATHER))
+    index = pd.date_range('2018-01-01', periods=100, name='DATE')
+    DataFile('quotes', 'AKRN').value = pd.DataFrame(data={'CLOSE_PRICE': np.linspace(100.1, 200.2, 100),
+                                                          'VOLUME': np.arange(100)}, index=index)
+    DataFile('dividends', 'AKRN').value = pd.Series([1.0])
+    result = compact_dtypes.report()
+    assert result.index.tolist() == ['quotes']
+    assert result.loc['quotes', 'SERIES'] == 1
+    assert result.loc['quotes', 'MAX_ERROR'] < settings.DATA_COMPACT_TOLERANCE
+    assert result.loc['quotes', 'RATIO'] < 1
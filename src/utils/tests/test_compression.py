@@ -0,0 +1,32 @@
+import pytest
+
+from utils import compression
+
+DATA = b'poptimizer' * 1000
+
+
+@pytest.mark.parametrize('codec', compression.available_codecs(), ids=str)
+def test_round_trip(codec):
+    compressed = codec.compress(DATA)
+    assert codec.decompress(compressed) == DATA
+    if codec.name is not None:
+        assert len(compressed) < len(DATA)
+
+
+def test_standard_library_codecs():
+    for name in [None, compression.GZIP, compression.BZ2, compression.LZMA]:
+        assert compression.get_codec(name).is_available
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError) as error_info:
+        compression.get_codec('rar')
+    assert 'Неизвестный алгоритм сжатия rar' == str(error_info.value)
+
+
+def test_unavailable_codec(monkeypatch):
+    codec = compression.Codec('fake', '.fake', None, None, False)
+    monkeypatch.setitem(compression.CODECS, 'fake', codec)
+    with pytest.raises(ImportError):
+        compression.get_codec('fake')
+    assert codec not in compression.available_codecs()
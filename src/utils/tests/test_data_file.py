@@ -1,10 +1,16 @@
 import time
 from pathlib import Path
 
+import pandas as pd
 import pytest
 
 import settings
+from utils import compression
+from utils import data_file
+from utils import data_formats
+from utils import series_cache
 from utils.data_file import DataFile
+from utils.data_file import yield_data_specs
 
 DATA_SPEC = (None, 'test')
 
@@ -53,3 +59,427 @@ def test_data_path_no_cat():
 def test_str():
     result = 'DataFile(data_category=cat2, data_name=data3, data=Data(value=None, last_update=None))'
     assert str(DataFile('cat2', 'data3')) == result
+
+
+def test_columnar(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_FORMATS', dict(cat3=data_formats.FEATHER))
+    df = pd.DataFrame(data={'col1': [1, 2], 'col2': [3.0, 4.0]})
+    data = DataFile('cat3', 'data1')
+    data.value = df
+    assert data.data_path.name == 'cat3.feather'
+    data = DataFile('cat3', 'data1')
+    assert data._data is None
+    assert data.read(['col2']).equals(df[['col2']])
+    assert data._data is None
+    assert data.value.equals(df)
+    assert data.read(['col1']).equals(df[['col1']])
+
+
+def test_format_fallback(monkeypatch):
+    DataFile('cat4', 'data1').value = pd.Series([1, 2])
+    monkeypatch.setattr(settings, 'DATA_FORMATS', dict(cat4=data_formats.PARQUET))
+    data = DataFile('cat4', 'data1')
+    assert data.data_path.name == 'cat4.pickle4'
+    assert data.value.equals(pd.Series([1, 2]))
+    data.value = pd.Series([1, 2, 3])
+    assert data.data_path.name == 'cat4.parquet'
+    assert not (settings.DATA_PATH / 'data1' / 'cat4.pickle4').exists()
+
+
+def test_unsupported_value(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_FORMATS', dict(data5=data_formats.FEATHER))
+    data = DataFile(None, 'data5')
+    data.value = {'a': 1}
+    assert data.data_path.name == 'data5.pickle4'
+    assert DataFile(None, 'data5').value == {'a': 1}
+
+
+def test_yield_data_specs():
+    specs = list(yield_data_specs())
+    assert (None, 'test') in specs
+    assert ('cat3', 'data1') in specs
+    assert ('cat4', 'data1') in specs
+
+
+def test_metadata():
+    df = pd.DataFrame(data={'col1': [1, 2, 3]}, index=pd.DatetimeIndex(['2018-01-01', '2018-01-02', '2018-01-05']))
+    data = DataFile('cat5', 'data1')
+    assert data.metadata is None
+    data.value = df
+    data = DataFile('cat5', 'data1')
+    assert data._data is None
+    metadata = data.metadata
+    assert metadata['format'] == data_formats.PICKLE
+    assert metadata['rows'] == 3
+    assert metadata['first'] == '2018-01-01T00:00:00'
+    assert metadata['last'] == '2018-01-05T00:00:00'
+    assert metadata['last_update'] == data.last_update
+    assert len(metadata['hash']) == 40
+    assert data._data is None
+    assert data.value.equals(df)
+
+
+def test_legacy_without_metadata():
+    data = DataFile('cat6', 'data1')
+    data.value = pd.Series([1, 2])
+    last_update = data.last_update
+    data.metadata_path.unlink()
+    data = DataFile('cat6', 'data1')
+    assert data.metadata_path.exists()
+    assert data.last_update == last_update
+    assert data.metadata['rows'] == 2
+
+
+def test_append_journal(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat7',))
+    df = pd.DataFrame(data={'col1': [1, 2]}, index=[1, 2])
+    data = DataFile('cat7', 'data1')
+    data.append(df)
+    base_hash = data.metadata['hash']
+    data.append(pd.DataFrame(data={'col1': [3]}, index=[3]))
+    data.append(pd.DataFrame(data={'col1': [4, 5]}, index=[4, 5]))
+    assert data.value.equals(pd.DataFrame(data={'col1': [1, 2, 3, 4, 5]}, index=[1, 2, 3, 4, 5]))
+    data = DataFile('cat7', 'data1')
+    assert data.metadata['hash'] == base_hash
+    assert len(data.metadata['segments']) == 2
+    assert data.metadata['rows'] == 5
+    assert data.metadata['last'] == 5
+    assert data.read(['col1']).equals(pd.DataFrame(data={'col1': [1, 2, 3, 4, 5]}, index=[1, 2, 3, 4, 5]))
+    assert (settings.DATA_PATH / 'data1' / 'cat7.delta-0002.pickle4').exists()
+    assert ('cat7', 'data1') in list(yield_data_specs())
+    assert ('cat7.delta-0001', 'data1') not in list(yield_data_specs())
+
+
+def test_tail_loads_last_segments(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat7',))
+    series_cache.CACHE.clear()
+    data = DataFile('cat7', 'data1')
+    loaded = []
+    decode_value = data_file.decode_value
+
+    def fake_decode_value(path, *args, **kwargs):
+        loaded.append(path.name)
+        return decode_value(path, *args, **kwargs)
+
+    monkeypatch.setattr(data_file, 'decode_value', fake_decode_value)
+    assert data.tail(4).equals(pd.DataFrame(data={'col1': [4, 5]}, index=[4, 5]))
+    assert loaded == ['cat7.delta-0002.pickle4']
+    assert data.tail(3).equals(pd.DataFrame(data={'col1': [3, 4, 5]}, index=[3, 4, 5]))
+    assert data.tail(2).equals(pd.DataFrame(data={'col1': [2, 3, 4, 5]}, index=[2, 3, 4, 5]))
+    assert 'cat7.pickle4' in loaded
+    assert data.tail(6).empty
+
+
+def test_append_does_not_copy_loaded_value(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat7',))
+    data = DataFile('cat7', 'data9')
+    data.value = pd.Series([1, 2], index=[1, 2])
+    value = data.value
+    data.append(pd.Series([3], index=[3]))
+    data.append(pd.Series([4], index=[4]))
+    assert data._data.value is value
+    assert data.tail(3).equals(pd.Series([3, 4], index=[3, 4]))
+    assert data.value.equals(pd.Series([1, 2, 3, 4], index=[1, 2, 3, 4]))
+    assert DataFile('cat7', 'data9').value.equals(data.value)
+
+
+def test_append_empty(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat7',))
+    data = DataFile('cat7', 'data1')
+    last_update = data.last_update
+    data.append(pd.DataFrame(data={'col1': []}))
+    assert data.last_update > last_update
+    assert len(data.metadata['segments']) == 2
+
+
+def test_compact(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat7',))
+    data = DataFile('cat7', 'data1')
+    last_update = data.last_update
+    assert data.compact()
+    assert not data.compact()
+    data = DataFile('cat7', 'data1')
+    assert data.metadata['segments'] == []
+    assert data.last_update == last_update
+    assert not (settings.DATA_PATH / 'data1' / 'cat7.delta-0001.pickle4').exists()
+    assert data.value.equals(pd.DataFrame(data={'col1': [1, 2, 3, 4, 5]}, index=[1, 2, 3, 4, 5]))
+
+
+def test_auto_compact(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat7',))
+    monkeypatch.setattr(data_file, 'MAX_SEGMENTS', 2)
+    data = DataFile('cat7', 'data2')
+    data.append(pd.Series([1], index=[1]))
+    data.append(pd.Series([2], index=[2]))
+    assert len(data.metadata['segments']) == 1
+    data.append(pd.Series([3], index=[3]))
+    assert data.metadata['segments'] == []
+    assert DataFile('cat7', 'data2').value.equals(pd.Series([1, 2, 3], index=[1, 2, 3]))
+
+
+def test_append_not_journaled():
+    data = DataFile('cat7', 'data3')
+    data.append(pd.Series([1], index=[1]))
+    data.append(pd.Series([2], index=[2]))
+    assert data.metadata['segments'] == []
+    assert DataFile('cat7', 'data3').value.equals(pd.Series([1, 2], index=[1, 2]))
+
+
+def test_compression(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_COMPRESSION', dict(cat8=compression.GZIP))
+    monkeypatch.setattr(settings, 'DATA_FORMATS', dict(cat8=data_formats.FEATHER))
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat8',))
+    df = pd.DataFrame(data={'col1': [1, 2], 'col2': [3.0, 4.0]}, index=[1, 2])
+    data = DataFile('cat8', 'data1')
+    data.value = df
+    data.append(pd.DataFrame(data={'col1': [5], 'col2': [6.0]}, index=[3]))
+    assert data.data_path.name == 'cat8.feather.gz'
+    assert (settings.DATA_PATH / 'data1' / 'cat8.delta-0001.feather.gz').exists()
+    data = DataFile('cat8', 'data1')
+    assert data.metadata['compression'] == compression.GZIP
+    assert data.read(['col2'])['col2'].tolist() == [3.0, 4.0, 6.0]
+    assert ('cat8', 'data1') in list(yield_data_specs())
+    monkeypatch.setattr(settings, 'DATA_COMPRESSION', dict())
+    assert data.convert()
+    assert data.data_path.name == 'cat8.feather'
+    assert not (settings.DATA_PATH / 'data1' / 'cat8.feather.gz').exists()
+    assert DataFile('cat8', 'data1').value['col1'].tolist() == [1, 2, 5]
+
+
+def test_stale_object_reads_fresh_files(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat9',))
+    writer = DataFile('cat9', 'data1')
+    writer.value = pd.Series([1, 2], index=[1, 2])
+    writer.append(pd.Series([3], index=[3]))
+    reader = DataFile('cat9', 'data1')
+    writer.compact()
+    assert reader.value.equals(pd.Series([1, 2, 3], index=[1, 2, 3]))
+    assert reader.metadata['segments'] == []
+
+
+def test_writers_do_not_lose_segments(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat9',))
+    first = DataFile('cat9', 'data2')
+    first.value = pd.Series([1], index=[1])
+    second = DataFile('cat9', 'data2')
+    first.append(pd.Series([2], index=[2]))
+    second.append(pd.Series([3], index=[3]))
+    data = DataFile('cat9', 'data2')
+    assert len(data.metadata['segments']) == 2
+    assert data.value.equals(pd.Series([1, 2, 3], index=[1, 2, 3]))
+    files = sorted(path.name for path in (settings.DATA_PATH / 'data2').glob('cat9*'))
+    assert files == ['cat9.delta-0001.pickle4', 'cat9.delta-0002.pickle4', 'cat9.lock', 'cat9.meta.json',
+                     'cat9.pickle4']
+
+
+def test_series_cache(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat10',))
+    monkeypatch.setattr(series_cache, 'CACHE', series_cache.SeriesCache(2 ** 20))
+    data = DataFile('cat10', 'data1')
+    data.value = pd.Series([1, 2], index=[1, 2])
+    assert DataFile('cat10', 'data1').value is data.value
+    assert series_cache.CACHE.hits == 1
+    DataFile('cat10', 'data1').append(pd.Series([3], index=[3]))
+    assert series_cache.CACHE.get(data._cache_key, data._cache_version) is None
+    value = DataFile('cat10', 'data1').value
+    assert value.equals(pd.Series([1, 2, 3], index=[1, 2, 3]))
+    assert DataFile('cat10', 'data1').value is value
+    assert DataFile('cat10', 'data1').read(['col']) is value
+    assert series_cache.CACHE.hits == 3
+
+
+def test_versions_of_appended_rows(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat11',))
+    data = DataFile('cat11', 'data1')
+    data.value = pd.Series([1, 2], index=[1, 2])
+    data.append(pd.Series([3], index=[3]))
+    data.append(pd.Series([4], index=[4]))
+    data.compact()
+    data = DataFile('cat11', 'data1')
+    versions = data.versions
+    assert len(versions) == 3
+    assert data.read(as_of=versions[0]).equals(pd.Series([1, 2], index=[1, 2]))
+    assert data.read(as_of=versions[1] + 0.0001).equals(pd.Series([1, 2, 3], index=[1, 2, 3]))
+    assert data.read(as_of=versions[2]).equals(data.value)
+    with pytest.raises(ValueError) as error_info:
+        data.read(as_of=versions[0] - 1)
+    assert 'Нет сохраненной версии данных cat11 -> data1' in str(error_info.value)
+
+
+def test_versions_limit(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat11',))
+    monkeypatch.setattr(settings, 'DATA_VERSIONS', 2)
+    data = DataFile('cat11', 'data4')
+    data.value = pd.Series([1], index=[1])
+    for row in range(2, 5):
+        data.append(pd.Series([row], index=[row]))
+    assert [rows for _, rows in data.metadata['versions']] == [3, 4]
+    data.compact()
+    assert [rows for _, rows in data.metadata['versions']] == [3, 4]
+
+
+def test_prefix_without_loading(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_SNAPSHOTS', ('cat11',))
+    DataFile('cat11', 'data5').value = pd.Series([1.0, 2.0], index=[1, 2])
+    loads = []
+    load_value = DataFile._load_value
+    monkeypatch.setattr(DataFile, '_load_value', lambda self, *args: loads.append(args) or load_value(self, *args))
+    series_cache.CACHE.clear()
+    data = DataFile('cat11', 'data5')
+    data.value = pd.Series([1.0, 2.0, 3.0], index=[1, 2, 3])
+    assert loads == []
+    assert len(data.versions) == 2
+    series_cache.CACHE.clear()
+    data = DataFile('cat11', 'data5')
+    data.value = pd.Series([1.0, 5.0, 3.0], index=[1, 2, 3])
+    assert len(loads) == 1
+    assert data.metadata['snapshots'][0]['versions'][-1][1] == 3
+
+
+def test_snapshots(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_SNAPSHOTS', ('cat11',))
+    monkeypatch.setattr(settings, 'DATA_FORMATS', dict(cat11=data_formats.FEATHER))
+    df = pd.DataFrame(data={'col1': [1, 2], 'col2': [3.0, 4.0]}, index=[1, 2])
+    data = DataFile('cat11', 'data2')
+    data.value = df
+    data.append(pd.DataFrame(data={'col1': [5], 'col2': [6.0]}, index=[3]))
+    data.value = pd.DataFrame(data={'col1': [7], 'col2': [8.0]}, index=[1])
+    data = DataFile('cat11', 'data2')
+    versions = data.versions
+    assert len(versions) == 3
+    assert data.read(['col2'], as_of=versions[0]).equals(df[['col2']])
+    assert data.read(as_of=versions[1])['col1'].tolist() == [1, 2, 5]
+    assert data.read(as_of=versions[2]).equals(data.value)
+    assert data.metadata['snapshots'][0]['file'] == 'cat11.snapshot-0001.feather'
+    assert (settings.DATA_PATH / 'data2' / 'cat11.snapshot-0001.feather').exists()
+    assert ('cat11.snapshot-0001', 'data2') not in list(yield_data_specs())
+
+
+def test_no_snapshots():
+    data = DataFile('cat11', 'data3')
+    data.value = pd.Series([1, 2], index=[1, 2])
+    first_version = data.last_update
+    data.value = pd.Series([3], index=[1])
+    assert data.versions == [data.last_update]
+    assert data.metadata['snapshots'] == []
+    with pytest.raises(ValueError):
+        data.read(as_of=first_version)
+
+
+def test_compact_dtypes(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_COMPACT_DTYPES', ('cat12',))
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat12',))
+    monkeypatch.setattr(settings, 'DATA_FORMATS', dict(cat12=data_formats.FEATHER))
+    index = pd.DatetimeIndex(['2018-01-10', '2018-01-11'], name='DATE')
+    df = pd.DataFrame(data={'CLOSE': [101.5, 102.25], 'VOLUME': [1000, 2000]}, index=index)
+    data = DataFile('cat12', 'data1')
+    data.value = df
+    data.append(pd.DataFrame(data={'CLOSE': [103.75], 'VOLUME': [3000]},
+                             index=pd.DatetimeIndex(['2018-01-12'], name='DATE')))
+    assert data.metadata['compact']['dtypes'] == dict(CLOSE='float64', VOLUME='int64')
+    assert data.metadata['segments'][0]['compact']['index'] == 'days'
+    series_cache.CACHE.clear()
+    data = DataFile('cat12', 'data1')
+    value = data.value
+    assert value.dtypes.tolist() == df.dtypes.tolist()
+    assert value.index.name == 'DATE'
+    assert value['CLOSE'].tolist() == [101.5, 102.25, 103.75]
+    assert value['VOLUME'].tolist() == [1000, 2000, 3000]
+    series_cache.CACHE.clear()
+    volume = DataFile('cat12', 'data1').read(['VOLUME'])
+    assert volume.columns.tolist() == ['VOLUME']
+    assert volume.index.equals(value.index)
+
+
+def test_convert_compact(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_FORMATS', dict(cat13=data_formats.FEATHER))
+    series = pd.Series([1.5, 2.5], index=pd.DatetimeIndex(['2018-01-10', '2018-01-11']), name='AKRN')
+    data = DataFile('cat13', 'data1')
+    data.value = series
+    assert 'compact' not in data.metadata
+    monkeypatch.setattr(settings, 'DATA_COMPACT_DTYPES', ('cat13',))
+    data = DataFile('cat13', 'data1')
+    assert data.convert()
+    assert data.metadata['compact']['kind'] == 'series'
+    assert not data.convert()
+    series_cache.CACHE.clear()
+    assert DataFile('cat13', 'data1').value.equals(series)
+
+
+def make_years_frame(start, periods):
+    index = pd.date_range(start, periods=periods, freq='MS', name='DATE')
+    return pd.DataFrame(data={'CLOSE': [float(i) for i in range(periods)], 'VOLUME': list(range(periods))},
+                        index=index)
+
+
+def test_partitions(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_PARTITIONS', ('cat14',))
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat14',))
+    monkeypatch.setattr(settings, 'DATA_FORMATS', dict(cat14=data_formats.FEATHER))
+    df = make_years_frame('2016-01-01', 30)
+    data = DataFile('cat14', 'data1')
+    data.value = df
+    folder = settings.DATA_PATH / 'data1'
+    assert sorted(path.name for path in folder.glob('cat14*.feather')) == ['cat14.feather',
+                                                                           'cat14.year-2016.feather',
+                                                                           'cat14.year-2017.feather']
+    assert [partition['year'] for partition in data.metadata['partitions']] == [2016, 2017]
+    assert data.metadata['rows'] == 30
+    assert ('cat14.year-2016', 'data1') not in data_file.walk_data_specs()
+    stat_2016 = (folder / 'cat14.year-2016.feather').stat()
+    data.append(make_years_frame('2018-07-01', 1))
+    data.compact()
+    assert (folder / 'cat14.year-2016.feather').stat().st_mtime_ns == stat_2016.st_mtime_ns
+    series_cache.CACHE.clear()
+    data = DataFile('cat14', 'data1')
+    assert data.value.equals(pd.concat([df, make_years_frame('2018-07-01', 1)]))
+    series_cache.CACHE.clear()
+    (folder / 'cat14.year-2016.feather').unlink()
+    data = DataFile('cat14', 'data1')
+    recent = data.read(['CLOSE'], start='2017-06-01')
+    assert recent.index[0] == pd.Timestamp('2017-06-01')
+    assert recent['CLOSE'].tolist() == [float(i) for i in range(17, 30)] + [0.0]
+    assert data.read(start='2017-01-01', end='2017-02-01')['VOLUME'].tolist() == [12, 13]
+
+
+def test_append_partitions(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_PARTITIONS', ('cat16',))
+    monkeypatch.setattr(settings, 'DATA_FORMATS', dict(cat16=data_formats.FEATHER))
+    df = make_years_frame('2016-01-01', 18)
+    data = DataFile('cat16', 'data1')
+    data.value = df
+    folder = settings.DATA_PATH / 'data1'
+    stat_2016 = (folder / 'cat16.year-2016.feather').stat()
+    encoded = []
+    encode = data_file.encode
+    monkeypatch.setattr(data_file, 'encode', lambda *args: encoded.append(len(args[2].value)) or encode(*args))
+    series_cache.CACHE.clear()
+    data.append(make_years_frame('2017-07-01', 2))
+    assert (folder / 'cat16.year-2016.feather').stat().st_mtime_ns == stat_2016.st_mtime_ns
+    assert [partition['year'] for partition in data.metadata['partitions']] == [2016]
+    data.append(make_years_frame('2017-09-01', 6))
+    assert (folder / 'cat16.year-2016.feather').stat().st_mtime_ns == stat_2016.st_mtime_ns
+    assert encoded == [8, 2, 12]
+    assert [partition['year'] for partition in data.metadata['partitions']] == [2016, 2017]
+    assert data.metadata['rows'] == 26
+    assert data.metadata['first'] == data_file.index_bound(df.index[0])
+    expected = pd.concat([df, make_years_frame('2017-07-01', 2), make_years_frame('2017-09-01', 6)])
+    assert data.value.equals(expected)
+    series_cache.CACHE.clear()
+    assert DataFile('cat16', 'data1').value.equals(expected)
+
+
+def test_convert_partitions(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_FORMATS', dict(cat15=data_formats.FEATHER))
+    df = make_years_frame('2016-01-01', 14)
+    data = DataFile('cat15', 'data1')
+    data.value = df
+    assert 'partitions' not in data.metadata
+    monkeypatch.setattr(settings, 'DATA_PARTITIONS', ('cat15',))
+    data = DataFile('cat15', 'data1')
+    assert data.convert()
+    assert len(data.metadata['partitions']) == 1
+    assert not data.convert()
+    assert len(data.files()) == 2
+    series_cache.CACHE.clear()
+    assert DataFile('cat15', 'data1').value.equals(df)
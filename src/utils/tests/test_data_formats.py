@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+from utils import data_formats
+from utils.data import Data
+
+FRAME = pd.DataFrame(data={'CLOSE_PRICE': [1.5, 2.5, 3.5], 'VOLUME': [10, 20, 30]},
+                     index=pd.DatetimeIndex(['2018-01-01', '2018-01-02', '2018-01-03'], name='DATE'))
+SERIES = pd.Series(data=[1.0, 2.0], index=pd.DatetimeIndex(['2018-01-01', '2018-01-02'], name='DATE'), name='AKRN')
+
+
+@pytest.mark.parametrize('name', [data_formats.FEATHER, data_formats.PARQUET, data_formats.PICKLE])
+def test_frame(tmpdir, name):
+    data_format = data_formats.get_format(name)
+    path = tmpdir / f'test{data_format.extension}'
+    path.write_binary(data_format.dumps(Data(FRAME, 42.0)))
+    data = data_format.load(path)
+    assert data.value.equals(FRAME)
+    assert data.value.index.name == 'DATE'
+    assert data.last_update == 42.0
+
+
+@pytest.mark.parametrize('name', [data_formats.FEATHER, data_formats.PARQUET])
+def test_columns(tmpdir, name):
+    data_format = data_formats.get_format(name)
+    path = tmpdir / f'test{data_format.extension}'
+    path.write_binary(data_format.dumps(Data(FRAME, 42.0)))
+    df = data_format.load(path, ['VOLUME']).value
+    assert list(df.columns) == ['VOLUME']
+    assert df.index.equals(FRAME.index)
+
+
+@pytest.mark.parametrize('name', [data_formats.FEATHER, data_formats.PARQUET])
+def test_series(tmpdir, name):
+    data_format = data_formats.get_format(name)
+    path = tmpdir / f'test{data_format.extension}'
+    path.write_binary(data_format.dumps(Data(SERIES, 24.0)))
+    value = data_format.load(path, ['AKRN']).value
+    assert value.equals(SERIES)
+    assert value.name == 'AKRN'
+
+
+def test_is_supported():
+    assert data_formats.FeatherFormat.is_supported(FRAME)
+    assert data_formats.FeatherFormat.is_supported(SERIES)
+    assert not data_formats.FeatherFormat.is_supported(pd.DataFrame([[1, 2]]))
+    assert not data_formats.FeatherFormat.is_supported(42)
+    assert data_formats.PickleFormat.is_supported(42)
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError) as error_info:
+        data_formats.get_format('csv')
+    assert 'Неизвестный формат хранения данных csv' == str(error_info.value)
@@ -1,3 +1,5 @@
+import asyncio
+import time
 from pathlib import Path
 
 import arrow
@@ -6,6 +8,9 @@ import pytest
 
 import settings
 from utils import data_manager
+from utils import series_cache
+from utils import telemetry
+from utils import trading_calendar
 
 
 @pytest.fixture(scope='module', autouse=True)
@@ -40,7 +45,7 @@ def test_data_manager_create(data_manager_class):
 
 
 def test_data_manager_update(monkeypatch, data_manager_class):
-    time = arrow.now().shift(days=1).replace(hour=20)
+    time = arrow.now().shift(weeks=1).replace(hour=20)
 
     def fake_now():
         return time
@@ -51,6 +56,7 @@ def test_data_manager_update(monkeypatch, data_manager_class):
 
 
 def test_this_day_update(monkeypatch, data_manager_class):
+    monkeypatch.setattr(trading_calendar, 'is_session', lambda date: True)
     data = data_manager_class('cat8', 'data5')
     fake_end_of_trading_day = dict(hour=data.last_update.hour,
                                    minute=59,
@@ -61,6 +67,8 @@ def test_this_day_update(monkeypatch, data_manager_class):
 
 
 def test_next_day_update(monkeypatch, data_manager_class):
+    monkeypatch.setattr(trading_calendar, 'is_session', lambda date: True)
+    monkeypatch.setattr(trading_calendar, 'next_session', lambda date: date + pd.Timedelta(days=1))
     data = data_manager_class('cat8', 'data5')
     fake_end_of_trading_day = dict(hour=data.last_update.hour,
                                    minute=0,
@@ -143,3 +151,242 @@ def test_utcoffset(data_manager_class):
     data = data_manager_class('cat8', 'data5')
     assert data.last_update.utcoffset().seconds == 10800
     assert data.next_update.utcoffset().seconds == 10800
+
+
+def test_stale_data_specs(monkeypatch, data_manager_class):
+    data_manager_class('cat8', 'data5')
+    assert ('cat8', 'data5') not in data_manager.stale_data_specs()
+    fake_now = arrow.now().shift(weeks=1).replace(hour=20)
+    monkeypatch.setattr(arrow, 'now', lambda: fake_now)
+    assert ('cat8', 'data5') in data_manager.stale_data_specs()
+
+
+def test_journaled_update(monkeypatch, data_manager_class):
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat9',))
+    data = data_manager_class('cat9', 'data5')
+    data.update()
+    assert data.value.equals(pd.DataFrame(data={'col1': [1, 2, 5], 'col2': ['a', 'f', 't']}))
+    assert len(data._data.metadata['segments']) == 1
+    time0 = data.last_update
+    data.update()
+    assert len(data._data.metadata['segments']) == 1
+    assert data.last_update > time0
+    assert data_manager_class('cat9', 'data5').value.equals(data.value)
+
+
+def test_recheck_after_lock(monkeypatch, data_manager_class):
+    data_manager_class('cat10', 'data5')
+    data_file = data_manager.DataFile('cat10', 'data5')
+    metadata = dict(data_file.metadata)
+    metadata['last_update'] = 0
+    data_file._save_metadata(metadata)
+    other_process = data_manager.DataFile('cat10', 'data5')
+    lock = data_manager.DataFile.lock
+
+    def lock_after_other_process_update(self, shared=False):
+        if self is not other_process:
+            other_process._touch()
+        return lock(self, shared)
+
+    def download(self):
+        raise AssertionError('Данные уже обновлены другим процессом')
+
+    monkeypatch.setattr(data_manager.DataFile, 'lock', lock_after_other_process_update)
+    monkeypatch.setattr(data_manager_class, 'download_all', download)
+    monkeypatch.setattr(data_manager_class, 'download_update', download)
+    data = data_manager_class('cat10', 'data5')
+    assert data.last_update > arrow.now().shift(minutes=-1)
+
+
+def test_as_of_timestamp():
+    assert data_manager.as_of_timestamp(None) is None
+    assert data_manager.as_of_timestamp(123.5) == 123.5
+    assert data_manager.as_of_timestamp(arrow.get(100)) == 100
+    moscow = pd.Timestamp('2018-09-01 03:00', tz='UTC').timestamp()
+    assert data_manager.as_of_timestamp('2018-09-01 06:00') == moscow
+    assert data_manager.as_of_timestamp(pd.Timestamp('2018-09-01 03:00', tz='UTC')) == moscow
+
+
+def test_read_as_of(data_manager_class):
+    data = data_manager_class('cat11', 'data5')
+    assert data.read(as_of=arrow.now()).equals(data.value)
+    with pytest.raises(ValueError):
+        data.read(as_of='2000-01-01')
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_deferred_refresh(data_manager_class):
+    with data_manager.deferred_refresh():
+        data = data_manager_class('cat10', 'data1')
+    assert data.value is None
+    assert data_manager_class('cat10', 'data2').value is not None
+
+
+def test_open_async(monkeypatch, data_manager_class):
+    data = run(data_manager.open_async(data_manager_class, 'cat10', 'data3'))
+    assert data.value.equals(pd.DataFrame(data={'col1': [1, 2], 'col2': ['a', 'f']}))
+    tomorrow = arrow.now().shift(weeks=1).replace(hour=20)
+    monkeypatch.setattr(arrow, 'now', lambda: tomorrow)
+    data = run(data_manager.open_async(data_manager_class, 'cat10', 'data3'))
+    assert data.value.equals(pd.DataFrame(data={'col1': [1, 2, 5], 'col2': ['a', 'f', 't']}))
+
+
+def test_async_download_in_parallel(data_manager_class):
+    class SlowDataManager(data_manager_class):
+        async def download_all_async(self):
+            await asyncio.sleep(0.2)
+            return await super().download_all_async()
+
+    async def open_all():
+        managers = [data_manager.open_async(SlowDataManager, 'cat11', f'data{i}') for i in range(10)]
+        return await asyncio.gather(*managers)
+
+    start = time.perf_counter()
+    managers = run(open_all())
+    assert time.perf_counter() - start < 1
+    assert all(manager.value['col1'].tolist() == [1, 2] for manager in managers)
+
+
+def test_tail_merge(monkeypatch):
+    class DataManager(data_manager.AbstractDataManager):
+        def download_all(self):
+            return pd.Series(data=[1.0, 2.0, 3.0], index=[1, 3, 5])
+
+        def download_update(self):
+            return pd.Series(data=[2.0, 2.5, 3.0, 4.0], index=[3, 4, 5, 6])
+
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat12',))
+    data = DataManager('cat12', 'data1')
+    data.update()
+    assert data.value.equals(pd.Series(data=[1.0, 2.0, 2.5, 3.0, 4.0], index=[1, 3, 4, 5, 6]))
+    assert data.metadata['segments'] == []
+
+
+def test_tail_merge_appends_without_old_rows(monkeypatch):
+    class DataManager(data_manager.AbstractDataManager):
+        def download_all(self):
+            return pd.Series(data=[0, 1], index=[0, 1])
+
+        def download_update(self):
+            last = self.metadata['last']
+            return pd.Series(data=[last, last + 1], index=[last, last + 1])
+
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat12',))
+    data = DataManager('cat12', 'data2')
+    data.update()
+    data._data.reload()
+    series_cache.CACHE.clear()
+    with monkeypatch.context() as patch:
+        patch.setattr(data_manager.DataFile, '_load_value', None)
+        data.update()
+        data.update()
+    assert len(data.metadata['segments']) == 3
+    assert data.value.equals(pd.Series(data=[0, 1, 2, 3, 4], index=[0, 1, 2, 3, 4]))
+
+
+def test_tail_merge_missing_old_row():
+    class DataManager(data_manager.AbstractDataManager):
+        def download_all(self):
+            return pd.Series(data=[1, 2, 3], index=[1, 2, 3])
+
+        def download_update(self):
+            return pd.Series(data=[2, 4], index=[2, 4])
+
+    data = DataManager('cat12', 'data3')
+    with pytest.raises(ValueError) as error_info:
+        data.update()
+    assert 'У новых данных индекс не возрастает монотонно' == str(error_info.value)
+
+
+def test_offline_stale_warning(monkeypatch, data_manager_class):
+    data_manager_class('cat13', 'data1')
+    monkeypatch.setattr(settings, 'DATA_OFFLINE', True)
+    tomorrow = arrow.now().shift(weeks=1).replace(hour=20)
+    monkeypatch.setattr(arrow, 'now', lambda: tomorrow)
+    monkeypatch.setattr(data_manager_class, 'download_update', None)
+    with pytest.warns(data_manager.StaleDataWarning):
+        data = data_manager_class('cat13', 'data1')
+    assert data.value.equals(pd.DataFrame(data={'col1': [1, 2], 'col2': ['a', 'f']}))
+    with pytest.warns(data_manager.StaleDataWarning):
+        run(data_manager.open_async(data_manager_class, 'cat13', 'data1'))
+    with pytest.raises(ValueError) as error_info:
+        data.update()
+    assert 'невозможна в автономном режиме' in str(error_info.value)
+
+
+def test_offline_no_data(monkeypatch, data_manager_class):
+    monkeypatch.setattr(settings, 'DATA_OFFLINE', True)
+    with pytest.raises(ValueError) as error_info:
+        data_manager_class('cat13', 'data2')
+    assert 'Загрузка данных cat13 -> data2 невозможна в автономном режиме' == str(error_info.value)
+
+
+def test_offline_local_data(monkeypatch, data_manager_class):
+    monkeypatch.setattr(settings, 'DATA_OFFLINE', True)
+    monkeypatch.setattr(data_manager_class, 'is_remote', False)
+    assert data_manager_class('cat13', 'data3').value is not None
+
+
+def test_ttl(monkeypatch, data_manager_class):
+    monkeypatch.setattr(settings, 'DATA_TTL', dict(cat14=3, data2=None))
+    data = data_manager_class('cat14', 'data1')
+    assert data.next_update == data.last_update.shift(days=3)
+    other = data_manager.DataFile(None, 'data2')
+    other.value = pd.Series([1])
+    two_days = arrow.now().shift(days=2)
+    monkeypatch.setattr(arrow, 'now', lambda: two_days)
+    stale = data_manager.stale_data_specs()
+    assert ('cat14', 'data1') not in stale
+    assert (None, 'data2') not in stale
+    month = arrow.now().shift(days=30)
+    monkeypatch.setattr(arrow, 'now', lambda: month)
+    stale = data_manager.stale_data_specs()
+    assert ('cat14', 'data1') in stale
+    assert (None, 'data2') not in stale
+    assert ('cat8', 'data5') in stale
+
+
+def test_splice(data_manager_class):
+    data = data_manager_class('cat15', 'data1')
+    assert data.splice(pd.DataFrame(data={'col1': [2], 'col2': ['f']}, index=[1])) == 0
+    data.splice(pd.DataFrame(data={'col1': [2, 7], 'col2': ['f', 'x']}, index=[1, 5]))
+    new = pd.DataFrame(data={'col1': [3, 4], 'col2': ['b', 'c']}, index=[2, 3])
+    assert data.splice(new) == 2
+    expected = pd.DataFrame(data={'col1': [1, 2, 3, 4, 7], 'col2': ['a', 'f', 'b', 'c', 'x']}, index=[0, 1, 2, 3, 5])
+    assert data.value.equals(expected)
+    assert data_manager_class('cat15', 'data1').value.equals(expected)
+    with pytest.raises(ValueError) as error:
+        data.splice(pd.DataFrame(data={'col1': [5, 6], 'col2': ['b', 'y']}, index=[2, 4]))
+    assert 'существующие данные не соответствуют новым' in str(error.value)
+
+
+class Model:
+    """Значение без длины, как у ML-моделей"""
+
+
+def test_create_not_pandas_value(monkeypatch):
+    class ModelDataManager(data_manager.AbstractDataManager):
+        is_unique = False
+        is_monotonic = False
+        update_from_scratch = True
+
+        def download_all(self):
+            return Model()
+
+        def download_update(self):
+            super().download_update()
+
+    monkeypatch.setattr(settings, 'DATA_TELEMETRY', True)
+    data = ModelDataManager(None, 'model')
+    assert isinstance(data.value, Model)
+    record = telemetry.load().iloc[-1]
+    assert (record['name'], record['action']) == ('model', 'create')
+    assert record['rows'] == 0
+    assert pd.isna(record['error'])
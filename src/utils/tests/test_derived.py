@@ -0,0 +1,83 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import settings
+from utils import data_manager
+from utils import derived
+
+ROWS = dict()
+CALLS = []
+
+
+@pytest.fixture(autouse=True)
+def make_temp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_PATH', Path(tmp_path))
+    ROWS.clear()
+    CALLS.clear()
+
+
+class DataManager(data_manager.AbstractDataManager):
+    def __init__(self, ticker):
+        super().__init__('derived', ticker)
+
+    def download_all(self):
+        return pd.Series(range(ROWS.setdefault(self.data_name, 2)), dtype='float64')
+
+    def download_update(self):
+        return self.download_all()
+
+
+def _total_inputs(tickers: tuple):
+    return [DataManager(ticker) for ticker in tickers]
+
+
+@derived.dataset(_total_inputs)
+def total(tickers: tuple):
+    CALLS.append(('total', tickers))
+    return pd.Series([DataManager(ticker).value.sum() for ticker in tickers], index=list(tickers))
+
+
+def _scaled_inputs(tickers: tuple, factor: int):
+    return [(total, (tickers,))]
+
+
+@derived.dataset(_scaled_inputs)
+def scaled(tickers: tuple, factor: int):
+    CALLS.append(('scaled', tickers))
+    return total(tickers) * factor
+
+
+def test_cached_until_input_changes():
+    assert total.name in derived.GRAPH
+    assert total(('A', 'B')).tolist() == [1.0, 1.0]
+    assert scaled(('A', 'B'), 2).tolist() == [2.0, 2.0]
+    assert scaled(('A', 'B'), 2).tolist() == [2.0, 2.0]
+    assert total(('C',)).tolist() == [1.0]
+    assert CALLS == [('total', ('A', 'B')), ('scaled', ('A', 'B')), ('total', ('C',))]
+    CALLS.clear()
+    ROWS['A'] = 3
+    DataManager('A').update()
+    assert scaled(('A', 'B'), 2).tolist() == [6.0, 2.0]
+    assert total(('C',)).tolist() == [1.0]
+    assert CALLS == [('scaled', ('A', 'B')), ('total', ('A', 'B'))]
+
+
+def test_update_without_new_rows():
+    total(('A',))
+    DataManager('A').update()
+    total(('A',))
+    assert len(CALLS) == 1
+
+
+def test_invalidate():
+    scaled(('A', 'B'), 3)
+    total(('C',))
+    assert derived.dependents('derived', 'A') == [scaled.name, total.name]
+    assert derived.invalidate('derived', 'A') == 2
+    assert derived.dependents('derived', 'A') == []
+    assert derived.dependents('derived', 'C') == [total.name]
+    ROWS['A'] = 4
+    DataManager('A').update()
+    assert scaled(('A', 'B'), 3).tolist() == [18.0, 3.0]
@@ -0,0 +1,39 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import settings
+from utils import data_formats
+from utils.data_file import DataFile
+from utils.migrate import migrate
+
+
+@pytest.fixture(autouse=True)
+def make_temp_dir(tmpdir, monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_PATH', Path(tmpdir))
+    monkeypatch.setattr(settings, 'DATA_FORMATS', dict())
+
+
+def test_migrate(monkeypatch):
+    DataFile('cat1', 'data1').value = pd.DataFrame(data={'col1': [1, 2]})
+    DataFile('cat2', 'data1').value = pd.DataFrame(data={'col1': [3, 4]})
+    DataFile(None, 'data2').value = 42
+    last_update = DataFile('cat1', 'data1').last_update
+    monkeypatch.setattr(settings, 'DATA_FORMATS', dict(cat1=data_formats.FEATHER, data2=data_formats.FEATHER))
+    assert migrate() == [('cat1', 'data1')]
+    data = DataFile('cat1', 'data1')
+    assert data.data_path.name == 'cat1.feather'
+    assert not (settings.DATA_PATH / 'data1' / 'cat1.pickle4').exists()
+    assert data.last_update == last_update
+    assert data.value.equals(pd.DataFrame(data={'col1': [1, 2]}))
+    assert DataFile('cat2', 'data1').data_path.name == 'cat2.pickle4'
+    assert DataFile(None, 'data2').data_path.name == 'data2.pickle4'
+    assert migrate() == []
+
+
+def test_migrate_selected(monkeypatch):
+    DataFile('cat1', 'data1').value = pd.DataFrame(data={'col1': [1, 2]})
+    DataFile('cat2', 'data1').value = pd.DataFrame(data={'col1': [3, 4]})
+    monkeypatch.setattr(settings, 'DATA_FORMATS', dict(cat1=data_formats.PARQUET, cat2=data_formats.PARQUET))
+    assert migrate(['cat2']) == [('cat2', 'data1')]
@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import settings
+from utils import panel
+from utils.panel import Panel
+
+FIELDS = ('CLOSE', 'VOLUME')
+
+
+@pytest.fixture(autouse=True)
+def make_temp_dir(tmpdir, monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_PATH', Path(tmpdir))
+
+
+def make_df(dates, close, volume):
+    return pd.DataFrame(data={'CLOSE': close, 'VOLUME': volume}, index=pd.DatetimeIndex(dates))
+
+
+def test_update_and_frame():
+    data = Panel('test', FIELDS)
+    data.update('AKRN', make_df(['2018-01-02', '2018-01-03'], [1.0, np.nan], [10, 0]), 1.5)
+    data.update('GMKN', make_df(['2018-01-03', '2018-01-04'], [3.0, 4.0], [30, 40]), 2.5)
+    data = Panel('test', FIELDS)
+    assert data.tickers == ('AKRN', 'GMKN')
+    assert data.version('AKRN') == 1.5
+    assert data.version('LKOH') is None
+    df = data.frame('CLOSE', ('GMKN', 'AKRN'))
+    assert list(df.columns) == ['GMKN', 'AKRN']
+    assert list(df.index) == list(pd.DatetimeIndex(['2018-01-02', '2018-01-03', '2018-01-04']))
+    assert np.isnan(df.loc['2018-01-03', 'AKRN'])
+    assert df.loc['2018-01-04', 'GMKN'] == 4.0
+    df = data.frame('VOLUME', ('AKRN',))
+    assert list(df.index) == list(pd.DatetimeIndex(['2018-01-02', '2018-01-03']))
+    assert df['AKRN'].tolist() == [10, 0]
+
+
+def test_append_in_place(monkeypatch):
+    data = Panel('test', FIELDS)
+    data.update('AKRN', make_df(['2018-01-02'], [1.0], [10]))
+    capacity = data._metadata['capacity']
+
+    def fail_rebuild(*_):
+        raise AssertionError
+
+    monkeypatch.setattr(Panel, '_rebuild', fail_rebuild)
+    data.update('AKRN', make_df(['2018-01-02', '2018-01-03'], [1.0, 2.0], [10, 20]))
+    data.update('GMKN', make_df(['2018-01-03'], [5.0], [50]))
+    assert data._metadata['capacity'] == capacity
+    df = Panel('test', FIELDS).frame('CLOSE', ('AKRN', 'GMKN'))
+    assert df.shape == (2, 2)
+    assert df.loc['2018-01-03', 'AKRN'] == 2.0
+
+
+def test_rebuild(monkeypatch):
+    monkeypatch.setattr(panel, 'TICKERS_RESERVE', 0)
+    monkeypatch.setattr(panel, 'DATES_RESERVE', 0)
+    data = Panel('test', FIELDS)
+    data.update('AKRN', make_df(['2018-01-03'], [1.0], [10]))
+    data.update('GMKN', make_df(['2018-01-04'], [2.0], [20]))
+    data.update('LKOH', make_df(['2018-01-02'], [3.0], [30]))
+    assert data._metadata['capacity'] == [3, 3]
+    df = Panel('test', FIELDS).frame('CLOSE', ('AKRN', 'GMKN', 'LKOH'))
+    assert df.loc['2018-01-03', 'AKRN'] == 1.0
+    assert df.loc['2018-01-04', 'GMKN'] == 2.0
+    assert df.loc['2018-01-02', 'LKOH'] == 3.0
+    assert df.isna().sum().sum() == 6
@@ -0,0 +1,64 @@
+import pandas as pd
+
+from utils.series_cache import SeriesCache
+from utils.series_cache import size_of
+
+VALUE = pd.Series(range(100), dtype='float64')
+SIZE = size_of(VALUE)
+
+
+def test_size_of():
+    assert SIZE == VALUE.memory_usage(deep=True)
+    df = VALUE.to_frame('col')
+    assert size_of(df) == df.memory_usage(deep=True).sum()
+
+
+def test_hit_and_miss():
+    cache = SeriesCache(10 * SIZE)
+    assert cache.get('a', 1) is None
+    cache.put('a', 1, VALUE)
+    assert cache.get('a', 1) is VALUE
+    assert cache.get('a', 2) is None
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 2, 0)
+    assert cache.size == SIZE
+
+
+def test_lru_eviction():
+    cache = SeriesCache(int(2.5 * SIZE))
+    cache.put('a', 1, VALUE)
+    cache.put('b', 1, VALUE)
+    assert cache.get('a', 1) is VALUE
+    cache.put('c', 1, VALUE)
+    assert cache.get('b', 1) is None
+    assert cache.get('a', 1) is VALUE
+    assert cache.get('c', 1) is VALUE
+    assert cache.evictions == 1
+    assert len(cache) == 2
+    assert cache.size == 2 * SIZE
+
+
+def test_replace_and_invalidate():
+    cache = SeriesCache(10 * SIZE)
+    cache.put('a', 1, VALUE)
+    cache.put('a', 2, VALUE)
+    assert cache.size == SIZE
+    assert cache.get('a', 2) is VALUE
+    cache.invalidate('a')
+    cache.invalidate('b')
+    assert cache.get('a', 2) is None
+    assert cache.size == 0
+
+
+def test_too_large_value():
+    cache = SeriesCache(SIZE - 1)
+    cache.put('a', 1, VALUE)
+    assert len(cache) == 0
+    assert cache.evictions == 0
+
+
+def test_clear():
+    cache = SeriesCache(10 * SIZE)
+    cache.put('a', 1, VALUE)
+    cache.get('a', 1)
+    cache.clear()
+    assert (len(cache), cache.size, cache.hits, cache.misses) == (0, 0, 0, 0)
@@ -0,0 +1,35 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import settings
+from utils import compression
+from utils import data_formats
+from utils.data_file import DataFile
+from utils.storage_benchmark import benchmark
+
+
+@pytest.fixture(autouse=True)
+def make_temp_dir(tmpdir, monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_PATH', Path(tmpdir))
+
+
+def test_benchmark():
+    for name in ['AKRN', 'GMKN']:
+        DataFile('cat1', name).value = pd.DataFrame(data={'CLOSE': [1.0, 2.0] * 100})
+    DataFile(None, 'model').value = {'a': 1}
+    df = benchmark(('cat1', 'model', 'no_data'), repeats=1)
+    n_codecs = len(compression.available_codecs())
+    assert df.shape == (n_codecs * (len(data_formats.FORMATS) + 1), 5)
+    assert (df['SERIES'].loc['cat1'] == 2).all()
+    assert df.loc[('cat1', data_formats.PICKLE, '-'), 'SIZE_RATIO'] == 1
+    assert df.loc[('cat1', data_formats.PICKLE, compression.GZIP), 'SIZE_RATIO'] < 1
+    assert list(df.loc['model'].index.get_level_values(0).unique()) == [data_formats.PICKLE]
+
+
+def test_benchmark_no_data():
+    df = benchmark(('no_data',), repeats=1)
+    assert df.empty
+    assert df.index.names == ['CATEGORY', 'FORMAT', 'COMPRESSION']
+    assert df.columns.tolist() == ['SERIES', 'WRITE_MS', 'READ_MS', 'SIZE_KB', 'SIZE_RATIO']
@@ -0,0 +1,76 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import settings
+from utils import catalog
+from utils import sync
+from utils import verify
+from utils.data_file import DataFile
+
+
+@pytest.fixture(name='folders')
+def make_folders(tmpdir, monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_JOURNALS', ('cat1',))
+    source = Path(tmpdir) / 'source'
+    target = Path(tmpdir) / 'target'
+    monkeypatch.setattr(settings, 'DATA_PATH', source)
+    DataFile('cat1', 'data1').value = pd.Series([1.0, 2.0], index=[1, 2])
+    DataFile('cat2', 'data1').value = pd.DataFrame({'col': [1, 2]})
+    DataFile(None, 'root').value = {'a': 1}
+    return source, target
+
+
+def test_first_sync(folders, monkeypatch):
+    source, target = folders
+    report = sync.sync(source, target)
+    assert len(report[sync.FULL]) == 3
+    assert report['bytes'] > 0
+    assert sync.changed_specs(source, target) == []
+    assert sync.sync(source, target)['bytes'] == 0
+    monkeypatch.setattr(settings, 'DATA_PATH', target)
+    assert DataFile('cat1', 'data1').value.equals(pd.Series([1.0, 2.0], index=[1, 2]))
+    assert DataFile(None, 'root').value == {'a': 1}
+    assert verify.verify(deep=True) == []
+
+
+def test_incremental_sync(folders, monkeypatch):
+    source, target = folders
+    sync.sync(source, target)
+    segment = pd.Series([3.0], index=[3])
+    DataFile('cat1', 'data1').append(segment)
+    DataFile('cat2', 'data1').value = pd.DataFrame({'col': [3]})
+    DataFile(None, 'root')._touch()
+    report = sync.sync(source, target)
+    assert report[sync.APPEND] == [('cat1', 'data1')]
+    assert report[sync.FULL] == [('cat2', 'data1')]
+    assert report[sync.METADATA] == [(None, 'root')]
+    segment_size = (source / 'data1' / 'cat1.delta-0001.pickle4').stat().st_size
+    cat2_size = DataFile('cat2', 'data1').data_path.stat().st_size
+    assert report['bytes'] == segment_size + cat2_size
+    assert catalog.entries(data_path=target)['LAST_UPDATE'].tolist() == catalog.entries()['LAST_UPDATE'].tolist()
+    DataFile('cat1', 'data1').compact()
+    assert not (source / 'data1' / 'cat1.delta-0001.pickle4').exists()
+    assert sync.sync(source, target)[sync.FULL] == [('cat1', 'data1')]
+    assert not (target / 'data1' / 'cat1.delta-0001.pickle4').exists()
+    monkeypatch.setattr(settings, 'DATA_PATH', target)
+    assert DataFile('cat1', 'data1').value.equals(pd.Series([1.0, 2.0, 3.0], index=[1, 2, 3]))
+    assert verify.verify(deep=True) == []
+
+
+def test_no_source_catalog(tmpdir):
+    with pytest.raises(ValueError) as error_info:
+        sync.sync(Path(tmpdir) / 'empty', Path(tmpdir) / 'target')
+    assert 'нет каталога данных' in str(error_info.value)
+
+
+def test_partial_source_catalog(folders, monkeypatch):
+    source, target = folders
+    catalog.remove('cat2', 'data1')
+    monkeypatch.setattr(settings, 'DATA_PATH', target)
+    assert sync.changed_specs(source, target) == [(None, 'root'), ('cat1', 'data1'), ('cat2', 'data1')]
+    assert len(sync.sync(source, target)[sync.FULL]) == 3
+    assert sync.changed_specs(source, target) == [('cat2', 'data1')]
+    assert sync.sync(source, target)['bytes'] == 0
+    assert DataFile('cat2', 'data1').value.equals(pd.DataFrame({'col': [1, 2]}))
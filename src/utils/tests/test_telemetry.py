@@ -0,0 +1,132 @@
+import asyncio
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import settings
+from utils import data_manager
+from utils import telemetry
+
+
+@pytest.fixture(autouse=True)
+def make_temp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_PATH', Path(tmp_path))
+    monkeypatch.setattr(settings, 'DATA_TELEMETRY', True)
+
+
+def fake_request(size):
+    telemetry.count_request(size)
+    return size
+
+
+class DataManager(data_manager.AbstractDataManager):
+    def download_all(self):
+        fake_request(100)
+        fake_request(50)
+        return pd.Series([1.0, 2.0], index=[1, 2])
+
+    def download_update(self):
+        fake_request(10)
+        return pd.Series([2.0, 3.0, 4.0], index=[2, 3, 4])
+
+
+def test_series_record():
+    with telemetry.series('cat1', 'data1', 'update') as collector:
+        fake_request(10)
+        telemetry.add('rows', 3)
+        assert telemetry.current() is collector
+    assert telemetry.current() is None
+    fake_request(10)
+    df = telemetry.load()
+    assert len(df) == 1
+    record = df.iloc[0]
+    assert (record['category'], record['name'], record['action']) == ('cat1', 'data1', 'update')
+    assert (record['requests'], record['bytes'], record['rows']) == (1, 10, 3)
+    assert record['run'] == telemetry.RUN_ID
+    assert record['seconds'] >= 0
+    assert record['error'] is None
+
+
+def test_series_error():
+    with pytest.raises(ValueError):
+        with telemetry.series('cat1', 'data1', 'create'):
+            raise ValueError('ошибка')
+    assert telemetry.load()['error'].iloc[0] == "ValueError('ошибка')"
+
+
+def test_disabled(monkeypatch):
+    monkeypatch.setattr(settings, 'DATA_TELEMETRY', False)
+    with telemetry.series('cat1', 'data1', 'create'):
+        pass
+    assert not telemetry.path().exists()
+
+
+def test_manager_telemetry():
+    data = DataManager('cat2', 'data1')
+    data.update()
+    df = telemetry.load()
+    assert df['action'].tolist() == ['create', 'update']
+    assert df['requests'].tolist() == [2, 1]
+    assert df['bytes'].tolist() == [150, 10]
+    assert df['rows'].tolist() == [2, 2]
+    assert (df['write'] > 0).all()
+    assert (df['validation'] > 0).all()
+    assert (df['seconds'] >= df['write'] + df['validation']).all()
+
+
+def test_async_attribution():
+    class AsyncDataManager(DataManager):
+        async def download_all_async(self):
+            sizes = [int(self.data_name[-1])] * 3
+            loop = asyncio.get_event_loop()
+
+            async def fetch(size):
+                await asyncio.sleep(0.01)
+                return await loop.run_in_executor(None, telemetry.bind(fake_request), size)
+
+            await telemetry.gather(*[fetch(size) for size in sizes])
+            return await super().download_all_async()
+
+    async def open_all():
+        managers = [data_manager.open_async(AsyncDataManager, 'cat3', f'data{i}') for i in range(1, 5)]
+        return await asyncio.gather(*managers)
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(open_all())
+    finally:
+        loop.close()
+    df = telemetry.load().set_index('name')
+    for i in range(1, 5):
+        assert df.loc[f'data{i}', 'requests'] == 5
+        assert df.loc[f'data{i}', 'bytes'] == 150 + 3 * i
+
+
+def test_summary(monkeypatch):
+    assert telemetry.summary()[0] is None
+    for seconds, name in [(1.0, 'data1'), (3.0, 'data2')]:
+        record = telemetry.Collector('cat4', name, 'update').record
+        record.update(run='old', seconds=seconds)
+        telemetry.write(record)
+    for seconds, name in [(2.0, 'data1'), (5.0, 'data2'), (0.5, 'data3')]:
+        record = telemetry.Collector('cat4', name, 'update').record
+        record.update(seconds=seconds, requests=2, error='ошибка' if name == 'data3' else None)
+        telemetry.write(record)
+    run, slowest, totals = telemetry.summary(top=2)
+    assert run == telemetry.RUN_ID
+    assert slowest['name'].tolist() == ['data2', 'data1']
+    assert totals['seconds'] == 7.5
+    assert totals['requests'] == 6
+    assert totals['series'] == 3
+    assert totals['errors'] == 1
+    assert telemetry.summary(run='old')[2]['seconds'] == 4.0
+
+
+def test_rotation(monkeypatch):
+    monkeypatch.setattr(telemetry, 'MAX_BYTES', 10)
+    for _ in range(2):
+        with telemetry.series('cat5', 'data1', 'update'):
+            pass
+    assert len(telemetry.load()) == 1
+    assert telemetry.path().with_name(telemetry.TELEMETRY_FILE + '.old').exists()
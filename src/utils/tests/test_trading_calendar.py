@@ -0,0 +1,110 @@
+import warnings
+from pathlib import Path
+
+import arrow
+import pandas as pd
+import pytest
+
+import settings
+from utils import data_manager
+from utils import trading_calendar
+from utils.data_file import DataFile
+
+
+@pytest.fixture(scope='module', autouse=True)
+def make_temp_dir(tmpdir_factory):
+    saved_path = settings.DATA_PATH
+    temp_dir = tmpdir_factory.mktemp('trading_calendar')
+    settings.DATA_PATH = Path(temp_dir)
+    yield
+    settings.DATA_PATH = saved_path
+
+
+def test_planned_sessions():
+    assert trading_calendar.history().empty
+    assert trading_calendar.is_session('2019-01-04')
+    assert not trading_calendar.is_session('2019-01-07')
+    assert not trading_calendar.is_session('2019-01-05')
+    assert trading_calendar.is_session('2018-12-29')
+    assert trading_calendar.next_session('2018-12-28') == pd.Timestamp('2018-12-29')
+    assert trading_calendar.next_session('2018-12-29') == pd.Timestamp('2019-01-03')
+    assert trading_calendar.previous_session('2019-01-08') == pd.Timestamp('2019-01-04')
+
+
+def test_history_sessions():
+    index = pd.DatetimeIndex(['2018-03-06', '2018-03-07', '2018-03-09', '2018-03-12'], name='DATE')
+    DataFile(None, trading_calendar.HISTORY_NAME).value = pd.Series([1.0, 2.0, 3.0, 4.0], index=index)
+    assert trading_calendar.is_session('2018-03-09')
+    assert not trading_calendar.is_session('2018-03-08')
+    assert trading_calendar.next_session('2018-03-07') == pd.Timestamp('2018-03-09')
+    assert trading_calendar.next_session('2018-03-12') == pd.Timestamp('2018-03-13')
+    assert trading_calendar.previous_session('2018-03-06') == pd.Timestamp('2018-03-05')
+    assert trading_calendar.is_session(pd.Timestamp('2018-03-09 12:00', tz='Europe/Moscow'))
+
+
+def test_shift():
+    assert trading_calendar.shift('2018-03-09', -1) == pd.Timestamp('2018-03-07')
+    assert trading_calendar.shift('2018-03-11', -1) == pd.Timestamp('2018-03-07')
+    assert trading_calendar.shift('2018-03-08', 2) == pd.Timestamp('2018-03-12')
+    assert trading_calendar.shift('2019-01-07', -1) == pd.Timestamp('2019-01-03')
+
+
+def test_sessions_range():
+    dates = trading_calendar.sessions_range('2018-03-05', '2018-03-14')
+    expected = pd.DatetimeIndex(['2018-03-05', '2018-03-06', '2018-03-07', '2018-03-09', '2018-03-12', '2018-03-13',
+                                 '2018-03-14'])
+    assert dates.equals(expected)
+
+
+def test_next_update_skips_holidays():
+    friday = arrow.get('2019-01-04T20:00:00+03:00')
+    assert data_manager.next_update(friday) == arrow.get('2019-01-08T19:45:00+03:00')
+    holiday = arrow.get('2019-01-07T12:00:00+03:00')
+    assert data_manager.next_update(holiday) == arrow.get('2019-01-08T19:45:00+03:00')
+    session = arrow.get('2019-01-08T12:00:00+03:00')
+    assert data_manager.next_update(session) == arrow.get('2019-01-08T19:45:00+03:00')
+
+
+def test_stale_threshold_matches_next_update():
+    now = arrow.get('2019-01-08T12:00:00+03:00')
+    threshold = data_manager.stale_threshold(now=now)
+    assert threshold == arrow.get('2019-01-04T19:45:00+03:00').float_timestamp
+    for last_update in ['2019-01-04T19:44:00+03:00', '2019-01-04T19:45:00+03:00', '2019-01-04T19:46:00+03:00',
+                        '2019-01-06T12:00:00+03:00', '2019-01-03T20:00:00+03:00']:
+        last_update = arrow.get(last_update)
+        is_stale = data_manager.next_update(last_update) < now
+        assert is_stale == (last_update.float_timestamp <= threshold)
+    evening = arrow.get('2019-01-08T20:00:00+03:00')
+    assert data_manager.stale_threshold(now=evening) == arrow.get('2019-01-08T19:45:00+03:00').float_timestamp
+
+
+def test_history_loaded_once_per_version(monkeypatch):
+    dates = trading_calendar.history()
+    assert len(dates) == 4
+    created = []
+
+    class CountingDataFile(DataFile):
+        def __init__(self, *args):
+            created.append(args)
+            super().__init__(*args)
+
+    monkeypatch.setattr(trading_calendar, 'DataFile', CountingDataFile)
+    assert trading_calendar.history() is dates
+    assert trading_calendar.is_session('2018-03-09')
+    assert created == []
+    data = DataFile(None, trading_calendar.HISTORY_NAME)
+    data.append(pd.Series([5.0], index=pd.DatetimeIndex(['2018-03-13'], name='DATE')))
+    assert trading_calendar.history()[-1] == pd.Timestamp('2018-03-13')
+    assert len(created) == 1
+
+
+def test_holidays_warning(monkeypatch):
+    monkeypatch.setattr(trading_calendar, '_holidays_warned', False)
+    after_end = trading_calendar.HOLIDAYS_END + pd.offsets.BDay(2)
+    with pytest.warns(trading_calendar.HolidaysWarning):
+        assert trading_calendar.is_session(after_end)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always', trading_calendar.HolidaysWarning)
+        trading_calendar.sessions_range(after_end, after_end + pd.Timedelta(days=10))
+        assert trading_calendar.is_session(after_end)
+    assert not [warning for warning in caught if warning.category is trading_calendar.HolidaysWarning]
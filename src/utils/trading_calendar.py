@@ -0,0 +1,214 @@
+"""Календарь торговых сессий MOEX
+
+Прошедшие сессии определяются по датам сохраненной локально истории индекса MOEX, поэтому календарь не обращается к
+сети. Даты истории загружаются один раз для каждой версии сохраненной истории. Для дат за пределами истории
+используются будние дни без праздников из HOLIDAYS и дополнительные торговые дни из EXTRA_SESSIONS, а для дат после
+последнего года HOLIDAYS один раз за процесс выдается предупреждение HolidaysWarning. Даты сессий на заданный период:
+python -m utils.trading_calendar начало конец
+"""
+import argparse
+import os
+import threading
+import warnings
+
+import pandas as pd
+
+import settings
+from utils.data_file import METADATA_EXTENSION
+from utils.data_file import DataFile
+
+# Серия в корне глобальной директории данных, даты которой считаются прошедшими торговыми сессиями
+HISTORY_NAME = 'MCFTRR'
+# Будние дни без торгов на MOEX - список дополняется по мере публикации календаря торгов биржи
+HOLIDAYS = pd.DatetimeIndex(['2018-01-01', '2018-01-02', '2018-01-08', '2018-02-23', '2018-03-08', '2018-05-01',
+                             '2018-05-09', '2018-06-12', '2018-11-05', '2018-12-31',
+                             '2019-01-01', '2019-01-02', '2019-01-07', '2019-03-08', '2019-05-01', '2019-05-09',
+                             '2019-06-12', '2019-11-04', '2019-12-31',
+                             '2020-01-01', '2020-01-02', '2020-01-07', '2020-02-24', '2020-03-09', '2020-05-01',
+                             '2020-05-11', '2020-06-12', '2020-11-04', '2020-12-31',
+                             '2021-01-01', '2021-01-07', '2021-02-23', '2021-03-08', '2021-05-03', '2021-05-10',
+                             '2021-06-14', '2021-11-04', '2021-12-31',
+                             '2022-01-07', '2022-02-23', '2022-03-08', '2022-05-02', '2022-05-03', '2022-05-09',
+                             '2022-05-10', '2022-06-13', '2022-11-04',
+                             '2023-01-02', '2023-02-23', '2023-03-08', '2023-05-01', '2023-05-09', '2023-06-12',
+                             '2023-11-06',
+                             '2024-01-01', '2024-01-02', '2024-02-23', '2024-03-08', '2024-05-01', '2024-05-09',
+                             '2024-06-12', '2024-11-04', '2024-12-31',
+                             '2025-01-01', '2025-01-02', '2025-01-07', '2025-05-01', '2025-05-09', '2025-06-12',
+                             '2025-11-04', '2025-12-31',
+                             '2026-01-01', '2026-01-02', '2026-01-07', '2026-02-23', '2026-03-09', '2026-05-01',
+                             '2026-05-11', '2026-06-12', '2026-11-04', '2026-12-31'])
+# Выходные дни с торгами на MOEX
+EXTRA_SESSIONS = pd.DatetimeIndex(['2018-04-28', '2018-06-09', '2018-12-29'])
+# Последний день года, до которого включительно заполнен список праздников
+HOLIDAYS_END = pd.Timestamp(year=HOLIDAYS[-1].year, month=12, day=31)
+DAY = pd.Timedelta(days=1)
+# Максимальное количество дней подряд без торгов, после которого поиск сессии прекращается
+MAX_GAP = 31
+
+# Выдавалось ли в процессе предупреждение HolidaysWarning
+_holidays_warned = False
+
+# Загруженные даты истории по директориям данных - состояние файла метаданных, версия истории и даты
+_HISTORY = dict()
+_HISTORY_LOCK = threading.Lock()
+
+
+class HolidaysWarning(UserWarning):
+    """Предупреждение о датах после последнего года в списке праздников HOLIDAYS"""
+
+
+def _metadata_stamp(path):
+    """Состояние файла метаданных истории, которое меняется при каждой его перезаписи, или None, если его нет"""
+    try:
+        stat = os.stat(str(path))
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def history():
+    """Даты сессий из сохраненной истории индекса - пустой индекс, если истории нет
+
+    Пока файл метаданных истории не перезаписан, даты берутся из памяти без чтения файлов, а после перезаписи значение
+    загружается заново только при изменении версии истории
+    """
+    path = settings.DATA_PATH / f'{HISTORY_NAME}{METADATA_EXTENSION}'
+    stamp = _metadata_stamp(path)
+    with _HISTORY_LOCK:
+        cached = _HISTORY.get(str(settings.DATA_PATH))
+    if cached is not None and cached[0] == stamp:
+        return cached[2]
+    data = DataFile(None, HISTORY_NAME)
+    version = data.version
+    if version is None:
+        dates = pd.DatetimeIndex([])
+    elif cached is not None and cached[1] == version:
+        dates = cached[2]
+    else:
+        dates = data.value.index
+    with _HISTORY_LOCK:
+        _HISTORY[str(settings.DATA_PATH)] = (stamp, version, dates)
+    return dates
+
+
+def _day(date):
+    """Дата без времени и часового пояса"""
+    date = pd.Timestamp(date)
+    if date.tzinfo is not None:
+        date = date.tz_localize(None)
+    return date.normalize()
+
+
+def _warn_holidays(date: pd.Timestamp):
+    """Предупреждает, если дата после последнего года в списке праздников, - не чаще одного раза за процесс"""
+    global _holidays_warned
+    if date > HOLIDAYS_END and not _holidays_warned:
+        _holidays_warned = True
+        warnings.warn(f'Список праздников HOLIDAYS заполнен по {HOLIDAYS_END.year} год - будние дни после него '
+                      f'считаются торговыми', HolidaysWarning)
+
+
+def _is_planned(date: pd.Timestamp):
+    """Является ли дата торговой по будним дням и списку праздников"""
+    _warn_holidays(date)
+    return (date.dayofweek < 5 and date not in HOLIDAYS) or date in EXTRA_SESSIONS
+
+
+def is_session(date, dates=None):
+    """Проходила ли или пройдет ли торговая сессия в заданную дату
+
+    Parameters
+    ----------
+    date
+        Дата - время и часовой пояс отбрасываются
+    dates
+        Даты сессий из истории - по умолчанию загружаются из сохраненной истории индекса
+    """
+    date = _day(date)
+    if dates is None:
+        dates = history()
+    if len(dates) and dates[0] <= date <= dates[-1]:
+        return date in dates
+    return _is_planned(date)
+
+
+def next_session(date, dates=None):
+    """Дата первой торговой сессии строго после заданной даты"""
+    return _step(date, 1, dates)
+
+
+def previous_session(date, dates=None):
+    """Дата последней торговой сессии строго до заданной даты"""
+    return _step(date, -1, dates)
+
+
+def _step(date, direction: int, dates=None):
+    """Ближайшая сессия после или до даты в зависимости от направления"""
+    date = _day(date)
+    if dates is None:
+        dates = history()
+    if len(dates) and dates[0] <= date <= dates[-1]:
+        position = dates.searchsorted(date, side='right' if direction > 0 else 'left') + min(direction, 0)
+        if 0 <= position < len(dates):
+            return dates[position]
+    for _ in range(MAX_GAP):
+        date += direction * DAY
+        if is_session(date, dates):
+            return date
+    raise ValueError(f'Нет торговых сессий в течение {MAX_GAP} дней от {date}')
+
+
+def shift(date, sessions: int, dates=None):
+    """Сдвигает дату на заданное количество торговых сессий
+
+    Если в заданную дату сессии нет, то сдвиг отсчитывается от последней сессии до нее
+
+    Parameters
+    ----------
+    date
+        Исходная дата
+    sessions
+        Количество сессий - отрицательное для сдвига в прошлое
+    dates
+        Даты сессий из истории - по умолчанию загружаются из сохраненной истории индекса
+    """
+    if dates is None:
+        dates = history()
+    date = _day(date)
+    if not is_session(date, dates):
+        date = previous_session(date, dates)
+    for _ in range(abs(sessions)):
+        date = _step(date, 1 if sessions > 0 else -1, dates)
+    return date
+
+
+def sessions_range(start, end):
+    """Даты торговых сессий в диапазоне включительно
+
+    Returns
+    -------
+    pd.DatetimeIndex
+        Даты сессий из истории индекса, дополненные плановыми сессиями вне ее
+    """
+    start, end = _day(start), _day(end)
+    dates = history()
+    planned = pd.date_range(start, end).union(EXTRA_SESSIONS)
+    planned = planned[(planned >= start) & (planned <= end)]
+    is_planned = ((planned.dayofweek < 5) & ~planned.isin(HOLIDAYS)) | planned.isin(EXTRA_SESSIONS)
+    planned = planned[is_planned]
+    if len(dates):
+        planned = planned[(planned < dates[0]) | (planned > dates[-1])]
+    if len(planned):
+        _warn_holidays(planned[-1])
+    if len(dates):
+        planned = planned.union(dates[(dates >= start) & (dates <= end)])
+    return planned
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Даты торговых сессий MOEX')
+    parser.add_argument('start', help='первая дата диапазона')
+    parser.add_argument('end', help='последняя дата диапазона')
+    args = parser.parse_args()
+    print(sessions_range(args.start, args.end))
@@ -0,0 +1,87 @@
+"""Проверка целостности локальных данных и их соответствия каталогу
+
+Быстрая проверка сравнивает каталог с метаданными серий и размерами файлов, а полная дополнительно пересчитывает хэши
+содержимого всех файлов:
+python -m utils.verify [--deep] [--rebuild]
+"""
+import argparse
+import hashlib
+
+import pandas as pd
+
+from utils import catalog
+from utils.data_file import DataFile
+from utils.data_file import load_catalog
+from utils.data_file import rebuild_catalog
+from utils.data_file import walk_data_specs
+
+# Поля каталога, которые должны совпадать с метаданными серии
+METADATA_FIELDS = dict(FORMAT='format', ROWS='rows', LAST_UPDATE='last_update', HASH='hash')
+
+
+def _is_same(catalog_value, metadata_value):
+    """Совпадают ли значения в каталоге и метаданных - отсутствующие значения в каталоге могут быть NaN"""
+    if metadata_value is None:
+        return pd.isna(catalog_value)
+    return catalog_value == metadata_value
+
+
+def _check_series(data_file: DataFile, entry: dict, deep: bool):
+    """Проблемы одной серии данных"""
+    metadata = data_file.metadata
+    problems = []
+    for column, key in METADATA_FIELDS.items():
+        if not _is_same(entry[column], metadata[key]):
+            problems.append(f'{column} в каталоге {entry[column]} не совпадает с метаданными {metadata[key]}')
+    size = 0
+    for path, file_hash in data_file.files():
+        if not path.exists():
+            problems.append(f'отсутствует файл {path.name}')
+            continue
+        size += path.stat().st_size
+        if deep and hashlib.sha1(path.read_bytes()).hexdigest() != file_hash:
+            problems.append(f'хэш файла {path.name} не совпадает с метаданными')
+    if size != entry['SIZE']:
+        problems.append(f'размер файлов {size} не совпадает с каталогом {entry["SIZE"]}')
+    return problems
+
+
+def verify(deep: bool = False):
+    """Проверяет соответствие каталога сохраненным данным
+
+    Parameters
+    ----------
+    deep
+        Пересчитывать ли хэши содержимого всех файлов
+
+    Returns
+    -------
+    list
+        Тройки (категория данных, название данных, описание проблемы). Пустой список, если проблем нет
+    """
+    df = load_catalog()
+    entries = {spec: row for spec, row in zip(catalog.specs(df), df.to_dict('records'))}
+    problems = []
+    for spec in walk_data_specs():
+        entry = entries.pop(spec, None)
+        if entry is None:
+            problems.append(spec + ('серия отсутствует в каталоге',))
+            continue
+        for problem in _check_series(DataFile(*spec), entry, deep):
+            problems.append(spec + (problem,))
+    for spec in entries:
+        problems.append(spec + ('в каталоге есть серия без данных',))
+    return problems
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Проверка целостности локальных данных')
+    parser.add_argument('--deep', action='store_true', help='пересчитать хэши содержимого всех файлов')
+    parser.add_argument('--rebuild', action='store_true', help='пересоздать каталог по метаданным серий')
+    args = parser.parse_args()
+    if args.rebuild:
+        print(f'Каталог пересоздан - серий данных {rebuild_catalog()}')
+    result = verify(args.deep)
+    for data_category, data_name, problem in result:
+        print(f'{data_category} -> {data_name}: {problem}')
+    print(f'Всего проблем - {len(result)}')
@@ -0,0 +1,127 @@
+"""Фоновый прогрев данных и ML-моделей портфеля
+
+Первый расчет метрик портфеля тратит основное время на загрузку и обновление локальных данных и на переобучение
+ML-моделей. Прогрев выполняет те же вызовы с теми же аргументами, что и метрики портфеля, в фоновом потоке, поэтому
+данные и производные наборы данных попадают в общие кэши процесса, а устаревшие модели обучаются заново до первого
+обращения оптимизатора. Прогрев включается явно, например в example_and_test.trading(warm_up=True):
+
+    warm_up = WarmUp(POSITIONS, DATE).start()
+    port = Portfolio(date=DATE, cash=CASH, positions=POSITIONS)
+    warm_up.wait()
+    Optimizer(port)
+
+Кэши относятся к процессу, поэтому запуск из командной строки только обновляет данные и сохраняет обученные модели:
+python -m warmup тикер [тикер ...] [--date дата] [--no-models]
+"""
+import argparse
+import threading
+import time
+from collections import OrderedDict
+
+import arrow
+import pandas as pd
+
+import local
+from local import dividends
+from local import moex
+
+COLUMNS = ['STEP', 'SECONDS', 'ERROR']
+
+
+def _models(tickers: tuple, date):
+    """Создает менеджеры ML-моделей, которые при необходимости обучают модели заново"""
+    import ml
+
+    ml.ReturnsMLDataManager(tickers, pd.Timestamp(date))
+    ml.DividendsMLDataManager(tickers, pd.Timestamp(date))
+
+
+# Шаги прогрева по названиям - вызовы повторяют обращения metrics.Portfolio, метрик доходности и дивидендов. Месячная
+# инфляция рассчитывается при каждом обращении, поэтому прогревается исходная серия CPI
+STEPS = OrderedDict(lot_size=lambda tickers, date: moex.lot_size(tickers),
+                    index=lambda tickers, date: moex.index(),
+                    cpi=lambda tickers, date: local.cpi(),
+                    prices=lambda tickers, date: moex.prices(tickers),
+                    volumes=lambda tickers, date: moex.volumes(tickers),
+                    returns=lambda tickers, date: moex.log_returns_with_div(tickers, pd.Timestamp(date)),
+                    dividends=lambda tickers, date: dividends.monthly_dividends(tickers, date),
+                    models=_models)
+
+
+class WarmUp:
+    """Прогрев данных и моделей для портфеля в фоновом потоке
+
+    Ошибка одного шага не прерывает остальные и сохраняется в отчете. Поток является демоном и не задерживает
+    завершение программы
+
+    Parameters
+    ----------
+    positions
+        Тикеры портфеля - словарь с количеством лотов по тикерам, как для metrics.Portfolio, или кортеж тикеров
+    date
+        Дата портфеля
+    models
+        Нужно ли обучать устаревшие ML-модели
+    """
+
+    def __init__(self, positions, date, models: bool = True):
+        self._tickers = tuple(sorted(positions))
+        self._date = pd.to_datetime(date).date()
+        self._steps = [step for step in STEPS if models or step != 'models']
+        self._rows = []
+        self._thread = None
+
+    def __str__(self):
+        return f'{self.__class__.__name__}(tickers={len(self._tickers)}, date={self._date})'
+
+    def run(self):
+        """Выполняет шаги прогрева в текущем потоке
+
+        Returns
+        -------
+        pd.DataFrame
+            В строках шаги, в столбцах название шага, время выполнения в секундах и описание ошибки
+        """
+        for step in self._steps:
+            start = time.perf_counter()
+            error = None
+            try:
+                STEPS[step](self._tickers, self._date)
+            except Exception as exception:
+                error = f'{exception.__class__.__name__}: {exception}'
+            self._rows.append((step, time.perf_counter() - start, error))
+        return self.report
+
+    def start(self):
+        """Запускает прогрев в фоновом потоке, если он еще не запущен"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name='warm-up', daemon=True)
+            self._thread.start()
+        return self
+
+    @property
+    def done(self):
+        """Завершен ли запущенный прогрев"""
+        return self._thread is not None and not self._thread.is_alive()
+
+    def wait(self, timeout: float = None):
+        """Ожидает завершения запущенного прогрева не дольше timeout секунд и возвращает отчет о выполненных шагах"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.report
+
+    @property
+    def report(self):
+        """Отчет о выполненных шагах"""
+        return pd.DataFrame(list(self._rows), columns=COLUMNS)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Обновление данных и обучение ML-моделей портфеля')
+    parser.add_argument('tickers', nargs='+', help='тикеры портфеля')
+    parser.add_argument('--date', help='дата портфеля - по умолчанию сегодня')
+    parser.add_argument('--no-models', action='store_true', help='не обучать ML-модели')
+    args = parser.parse_args()
+    warm_up_report = WarmUp(args.tickers, args.date or arrow.now().date(), not args.no_models).run()
+    print(warm_up_report.to_string())
+    print(f'\nОбщее время - {warm_up_report["SECONDS"].sum():.1f} с')
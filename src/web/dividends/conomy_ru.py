@@ -7,6 +7,7 @@ from selenium.webdriver.firefox import options
 from selenium.webdriver.support import expected_conditions
 from selenium.webdriver.support import wait
 
+from utils import telemetry
 from web.dividends import parser
 from web.dividends.parser import date_parser, div_parser
 from web.labels import DATE
@@ -75,7 +76,9 @@ def get_html(ticker: str):
     with webdriver.Firefox(options=driver_options) as driver:
         load_ticker_page(driver, ticker)
         load_dividends_table(driver)
-        return driver.page_source
+        html = driver.page_source
+    telemetry.count_request(len(html.encode()))
+    return html
 
 
 def is_common(ticker: str):
@@ -5,6 +5,7 @@ import urllib.request
 
 import pandas as pd
 
+from utils import telemetry
 from web.dividends import parser
 from web.labels import DATE
 
@@ -30,7 +31,9 @@ def get_html(url: str):
     """Получает html-код для url"""
     try:
         with urllib.request.urlopen(url, context=ssl.SSLContext()) as response:
-            return response.read()
+            html = response.read()
+        telemetry.count_request(len(html))
+        return html
     except urllib.error.HTTPError as error:
         if error.code == 404:
             raise urllib.error.URLError(f'Неверный url: {url}')
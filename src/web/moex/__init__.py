@@ -1,6 +1,6 @@
 """Данные с http://iss.moex.com"""
-from web.moex.iss_index import index
-from web.moex.iss_quotes import quotes
-from web.moex.iss_quotes_t2 import quotes_t2
-from web.moex.iss_securities_info import securities_info
+from web.moex.iss_index import index, index_async
+from web.moex.iss_quotes import quotes, quotes_async
+from web.moex.iss_quotes_t2 import quotes_t2, quotes_t2_async
+from web.moex.iss_securities_info import securities_info, securities_info_async
 from web.moex.iss_tickers import reg_number_tickers
@@ -49,6 +49,11 @@ def index(start=None):
     return pd.concat(Index(start))[CLOSE_PRICE]
 
 
+async def index_async(start=None):
+    """Асинхронный вариант index - синхронные запросы к ISS выполняются в пуле потоков utils.blocking"""
+    return pd.concat(await Index(start).frames_async())[CLOSE_PRICE]
+
+
 if __name__ == '__main__':
     z = index(start=pd.to_datetime('2017-10-02'))
     print(z.head())
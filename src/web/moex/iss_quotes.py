@@ -4,6 +4,8 @@ from urllib import request, parse
 
 import pandas as pd
 
+from utils import blocking
+from utils import telemetry
 from web.labels import CLOSE_PRICE, DATE, VOLUME
 
 # Время ожидания для повторной загрузки при невозможности получить данные
@@ -14,13 +16,14 @@ class Quotes:
     """Представление ответа сервера по котировкам в виде итератора
 
     При большом запросе сервер ISS возвращает данные блоками обычно по 100 значений, поэтому класс является итератором
-    Если начальная дата не указана, то загружается вся доступная история котировок
+    Если начальная дата не указана, то загружается вся доступная история котировок, а если указана конечная дата, то
+    история загружается до нее включительно
     """
     _BASE_URL = ('https://iss.moex.com/iss/history/engines/stock/markets/shares/securities/'
                  '{ticker}.json?{query}')
 
-    def __init__(self, ticker: str, start_date):
-        self._ticker, self._start_date = ticker, start_date
+    def __init__(self, ticker: str, start_date, end_date=None):
+        self._ticker, self._start_date, self._end_date = ticker, start_date, end_date
 
     def __iter__(self):
         block_position = 0
@@ -35,22 +38,26 @@ class Quotes:
     def url(self, block_position):
         """Создает url для запроса к серверу http://iss.moex.com"""
         query_args = dict(start=block_position)
-        if self._start_date:
-            if not isinstance(self._start_date, pd.Timestamp):
-                raise TypeError(self._start_date)
-            query_args['from'] = self._start_date.date()
+        for arg, date in (('from', self._start_date), ('till', self._end_date)):
+            if date:
+                if not isinstance(date, pd.Timestamp):
+                    raise TypeError(date)
+                query_args[arg] = date.date()
         return self._BASE_URL.format(ticker=self._ticker, query=parse.urlencode(query_args))
 
     def get_json_data(self, block_position):
         """Загружает и проверяет json с данными"""
         with request.urlopen(self.url(block_position), timeout=TIMEOUT) as response:
-            json_data = json.load(response)
+            data = response.read()
+        telemetry.count_request(len(data))
+        json_data = json.loads(data)
         self._validate_response(block_position, json_data)
         return {key: json_data['history'][key] for key in ['data', 'columns']}
 
     def _validate_response(self, block_position, json_data):
-        """Первый запрос должен содержать не нулевое количество строк"""
-        if block_position == 0 and len(json_data['history']['data']) == 0:
+        """Первый запрос должен содержать не нулевое количество строк - кроме запросов за период с конечной датой, в
+        котором может не быть торгов"""
+        if self._end_date is None and block_position == 0 and len(json_data['history']['data']) == 0:
             raise ValueError(f'Пустой ответ. Проверьте запрос: {self.url(block_position)}')
 
     def get_df(self, block_position):
@@ -62,8 +69,29 @@ class Quotes:
         df[VOLUME] = pd.to_numeric(df['VOLUME'])
         return df[[DATE, CLOSE_PRICE, VOLUME]]
 
+    async def get_df_async(self, block_position):
+        """Асинхронно формирует DataFrame для блока - синхронный запрос выполняется в пуле потоков utils.blocking"""
+        return await blocking.run(self.get_df, block_position)
 
-def quotes(ticker, start=None):
+    async def frames_async(self):
+        """Асинхронно загружает все блоки данных
+
+        Блоки загружаются последовательно, так как позиция следующего блока зависит от размера предыдущего, но цикл
+        событий в это время может выполнять запросы по другим тикерам
+        """
+        frames = []
+        block_position = 0
+        while True:
+            df = await self.get_df_async(block_position)
+            df_len = len(df)
+            if df_len == 0:
+                break
+            block_position += df_len
+            frames.append(df)
+        return frames
+
+
+def quotes(ticker, start=None, end=None):
     """
     Возвращает историю котировок тикера начиная с даты start_date
 
@@ -77,15 +105,35 @@ def quotes(ticker, start=None):
     start : pd.Timestamp or None
         Начальная дата котировок
 
+    end : pd.Timestamp or None
+        Конечная дата котировок включительно - по умолчанию последняя доступная
+
     Returns
     -------
     pandas.DataFrame
         В строках даты торгов
         В столбцах [CLOSE, VOLUME] цена закрытия и оборот в штуках
     """
-    gen = Quotes(ticker, start)
-    df = pd.concat(gen, ignore_index=True)
-    # Для каждой даты выбирается режим торгов с максимальным оборотом
+    return make_df(Quotes(ticker, start, end))
+
+
+async def quotes_async(ticker, start=None, end=None):
+    """Асинхронный вариант quotes, позволяющий загружать котировки нескольких тикеров одновременно
+
+    Запросы к ISS остаются синхронными и выполняются в пуле потоков utils.blocking
+    """
+    return make_df(await Quotes(ticker, start, end).frames_async())
+
+
+def make_df(frames):
+    """Объединяет блоки котировок - для каждой даты выбирается режим торгов с максимальным оборотом
+
+    Если блоков нет, то возвращается пустой DataFrame с индексом дат
+    """
+    frames = list(frames)
+    if not frames:
+        return pd.DataFrame(columns=[CLOSE_PRICE, VOLUME], index=pd.DatetimeIndex([], name=DATE), dtype=float)
+    df = pd.concat(frames, ignore_index=True)
     df = df.loc[df.groupby(DATE)[VOLUME].idxmax()]
     df = df.set_index(DATE)
     return df
@@ -19,7 +19,7 @@ class QuotesT2(iss_quotes.Quotes):
         pass
 
 
-def quotes_t2(ticker, start=None):
+def quotes_t2(ticker, start=None, end=None):
     """
     Возвращает историю котировок в режиме TQBR T+2 тикера начиная с даты start_date
 
@@ -33,15 +33,30 @@ def quotes_t2(ticker, start=None):
     start : pd.Timestamp or None
         Начальная дата котировок
 
+    end : pd.Timestamp or None
+        Конечная дата котировок включительно - по умолчанию последняя доступная
+
     Returns
     -------
     pandas.DataFrame
         В строках даты торгов
         В столбцах [CLOSE, VOLUME] цена закрытия и оборот в штуках
     """
-    gen = QuotesT2(ticker, start)
+    return make_df(QuotesT2(ticker, start, end))
+
+
+async def quotes_t2_async(ticker, start=None, end=None):
+    """Асинхронный вариант quotes_t2, позволяющий загружать котировки нескольких тикеров одновременно
+
+    Запросы к ISS остаются синхронными и выполняются в пуле потоков utils.blocking
+    """
+    return make_df(await QuotesT2(ticker, start, end).frames_async())
+
+
+def make_df(frames):
+    """Объединяет блоки котировок - если блоков нет, то возвращается пустой DataFrame"""
     try:
-        df = pd.concat(gen, ignore_index=True)
+        df = pd.concat(frames, ignore_index=True)
     except ValueError:
         return pd.DataFrame()
     else:
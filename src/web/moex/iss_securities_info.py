@@ -4,6 +4,8 @@ from urllib import request
 
 import pandas as pd
 
+from utils import blocking
+from utils import telemetry
 from web.labels import LAST_PRICE, LOT_SIZE, COMPANY_NAME, REG_NUMBER, TICKER
 
 MIN_TICKERS_AMOUNT = 200
@@ -20,7 +22,9 @@ def get_json(tickers: tuple):
     """Загружает и проверяет json"""
     url = make_url(tickers)
     with request.urlopen(url) as response:
-        data = json.load(response)
+        raw_data = response.read()
+    telemetry.count_request(len(raw_data))
+    data = json.loads(raw_data)
     validate_response(data, tickers)
     return data
 
@@ -84,5 +88,11 @@ def securities_info(tickers: tuple = tuple()):
     return make_df(raw_json)
 
 
+async def securities_info_async(tickers: tuple = tuple()):
+    """Асинхронный вариант securities_info - синхронный запрос выполняется в пуле потоков utils.blocking"""
+    raw_json = await blocking.run(get_json, tickers)
+    return make_df(raw_json)
+
+
 if __name__ == "__main__":
     print(securities_info())
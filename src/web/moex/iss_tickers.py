@@ -3,6 +3,8 @@
 import json
 from urllib import request
 
+from utils import telemetry
+
 # Время ожидания для повторной загрузки при невозможности получить данные
 TIMEOUT = 60
 
@@ -11,8 +13,9 @@ def get_json(reg_number: str):
     """Получает json с http://iss.moex.com"""
     url = f'http://iss.moex.com/iss/securities.json?q={reg_number}'
     with request.urlopen(url, timeout=TIMEOUT) as response:
-        data = json.load(response)
-    return data
+        raw_data = response.read()
+    telemetry.count_request(len(raw_data))
+    return json.loads(raw_data)
 
 
 def validate(reg_number: str, tickers: tuple):
@@ -1,9 +1,10 @@
+import asyncio
 from collections import Iterable
 
 import pandas as pd
 
 from web.labels import CLOSE_PRICE, DATE, VOLUME
-from web.moex.iss_quotes import quotes, Quotes
+from web.moex.iss_quotes import quotes, quotes_async, Quotes
 
 
 def test_quotes_none_start_date():
@@ -30,3 +31,24 @@ def test_quotes():
     assert df.shape[0] > 100
     assert df.loc['2018-03-05', CLOSE_PRICE] == 117
     assert df.loc['2018-03-05', VOLUME] == 4553310
+
+
+def test_quotes_async(monkeypatch):
+    blocks = [dict(data=[['2018-01-10', 10.0, 5], ['2018-01-10', 10.5, 7]], columns=['TRADEDATE', 'CLOSE', 'VOLUME']),
+              dict(data=[['2018-01-11', 11.0, 3]], columns=['TRADEDATE', 'CLOSE', 'VOLUME']),
+              dict(data=[], columns=['TRADEDATE', 'CLOSE', 'VOLUME'])]
+    positions = []
+
+    def fake_json_data(self, block_position):
+        positions.append(block_position)
+        return blocks[len(positions) - 1]
+
+    monkeypatch.setattr(Quotes, 'get_json_data', fake_json_data)
+    loop = asyncio.new_event_loop()
+    try:
+        df = loop.run_until_complete(quotes_async('AKRN'))
+    finally:
+        loop.close()
+    assert positions == [0, 2, 3]
+    assert df.index.tolist() == [pd.Timestamp('2018-01-10'), pd.Timestamp('2018-01-11')]
+    assert df[CLOSE_PRICE].tolist() == [10.5, 11.0]
@@ -1,9 +1,12 @@
 """Загрузка данных по месячному индексу потребительских цен сайта www.gks.ru"""
 
+import io
 from datetime import date
+from urllib import request
 
 import pandas as pd
 
+from utils import telemetry
 from web.labels import DATE, CPI
 
 URL_CPI = 'http://www.gks.ru/free_doc/new_site/prices/potr/I_ipc.xlsx'
@@ -28,7 +31,10 @@ def validate(df: pd.DataFrame):
 
 def parse_xls(url: str):
     """Загружает, проверяет и преобразует xls-файл"""
-    df = pd.read_excel(url, **PARSING_PARAMETERS)
+    with request.urlopen(url) as response:
+        data = response.read()
+    telemetry.count_request(len(data))
+    df = pd.read_excel(io.BytesIO(data), **PARSING_PARAMETERS)
     validate(df)
     df = df.transpose().stack()
     first_year = df.index[0][0]